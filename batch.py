@@ -0,0 +1,276 @@
+import numpy as np
+
+from car import Car
+from track import points_in_polygon
+
+
+# -----------------------------
+# ACTION TABLES
+# -----------------------------
+# Same action map as Car.rl_update, as lookup tables:
+# 0: Idle, 1: Accel, 2: Brake
+# 3: Left, 4: Left+Accel, 5: Left+Brake
+# 6: Right, 7: Right+Accel, 8: Right+Brake
+ACTION_TURN = np.array([0, 0, 0, -1, -1, -1, 1, 1, 1])       # -1 left, +1 right
+ACTION_THROTTLE = np.array([0, 1, -1, 0, 1, -1, 0, 1, -1])   # +1 accel, -1 brake, 0 coast
+
+
+def normalize_angle_deg_array(angle):
+    """Vectorized normalize_angle_deg: wrap every angle to [-180, 180] degrees."""
+    angle = np.array(angle, dtype=float)
+    while True:
+        high = angle > 180
+        if not high.any():
+            break
+        angle[high] -= 360
+    while True:
+        low = angle < -180
+        if not low.any():
+            break
+        angle[low] += 360
+    return angle
+
+
+def discretize_states(speed, heading_error, distance, future_heading_error):
+    """Vectorized discretize_state. Returns an (N, 4) int array of (s, h, d, fh) rows."""
+    abs_speed = np.abs(speed)
+    s = np.where(abs_speed < 0.5, 0, np.where(abs_speed < 2.5, 1, 2))
+    h = np.select(
+        [heading_error < -20, heading_error < -5, heading_error < 5, heading_error < 20],
+        [0, 1, 2, 3], default=4)
+    d = np.where(distance < 10, 0, np.where(distance < 30, 1, 2))
+    fh = np.where(future_heading_error < -10, 0, np.where(future_heading_error > 10, 2, 1))
+    return np.stack([s, h, d, fh], axis=1)
+
+
+# -----------------------------
+# BATCHED CAR ENGINE
+# -----------------------------
+class BatchCars:
+    """
+    N cars stepped together with NumPy. Position, heading, speed and the
+    collided flag live in arrays; step() applies one action per car with the
+    same physics and collision response as Car.rl_update, then computes the
+    same four features discretize_state bins, for every car at once.
+
+    For N=1 poses, speeds, collisions and discrete states match Car.rl_update
+    plus the compute_* features exactly; the continuous distance can differ
+    in the last bit because np.hypot and math.hypot round differently.
+
+    A tick is `substeps` physics updates of frame_dt nominal steps each, as
+    in CarEnv (pass env.frame_dt and env.substeps); the defaults are one
+    Car.rl_update per tick. step() runs one tick; to hold an action for
+    several, call tick() for each and observe() after the last.
+    """
+
+    def __init__(self, n, track, index, road_mask=None, x=0.0, y=0.0, heading=0.0, frame_dt=1.0, substeps=1):
+        template = Car(0, 0, font=None)
+        self.width = template.width
+        self.height = template.height
+        self.max_speed = template.max_speed
+        self.acceleration = template.acceleration
+        self.turn_speed = template.turn_speed
+
+        self.n = n
+        self.track = track
+        self.road_mask = road_mask
+        self.frame_dt = frame_dt
+        self.substeps = substeps
+
+        self.x = np.full(n, x, dtype=float)
+        self.y = np.full(n, y, dtype=float)
+        self.heading = np.full(n, heading, dtype=float)
+        self.speed = np.zeros(n)
+        self.collided = np.zeros(n, dtype=bool)
+
+        # centerline geometry as arrays for the feature queries
+        self.lookahead = index.lookahead
+        self.segments = np.array(index.segments, dtype=float)
+        self.midpoints = np.array(index.midpoints, dtype=float)
+        self.points = np.array(index.centerline, dtype=float)
+        self.segment_angles = np.array(index.segment_angles, dtype=float)
+        self.lookahead_angles = np.array(index.lookahead_angles, dtype=float)
+        self._build_candidates(index)
+
+        # car corners in the car's local frame, same order as Car._get_corners
+        w = self.width
+        h = self.height
+        self.local_corners = np.array([(-w/2, -h/2), (w/2, -h/2), (w/2, h/2), (-w/2, h/2)])
+
+        self.observe()
+
+    def corners(self, x, y, heading):
+        """(N, 4) arrays of corner x and y for the given poses."""
+        rad = np.radians(heading)[:, None]
+        cos_t = np.cos(rad)
+        sin_t = np.sin(rad)
+        px = self.local_corners[:, 0]
+        py = self.local_corners[:, 1]
+        return px * cos_t - py * sin_t + x[:, None], px * sin_t + py * cos_t + y[:, None]
+
+    def on_road(self, x, y, heading):
+        """True for every car whose four corners are all inside the road."""
+        cx, cy = self.corners(x, y, heading)
+        if self.road_mask is not None:
+            inside = self.road_mask.contains_many(cx.ravel(), cy.ravel())
+        else:
+            inside = points_in_polygon(cx.ravel(), cy.ravel(), self.track.polygon)
+        return inside.reshape(cx.shape).all(axis=1)
+
+    def step(self, actions):
+        """Apply one action per car for one tick and return the (N, 4) array of next states."""
+        self.tick(actions)
+        return self.observe()
+
+    def tick(self, actions):
+        """
+        Advance every car one tick without computing features. collided is
+        True for the cars that hit the edge in any of the tick's substeps.
+        """
+        actions = np.asarray(actions)
+        turn = ACTION_TURN[actions] * (self.turn_speed * self.frame_dt)
+        throttle = ACTION_THROTTLE[actions]
+        dt = self.frame_dt
+        friction = 0.95 ** dt
+        collided_any = np.zeros(self.n, dtype=bool)
+
+        for _ in range(self.substeps):
+            heading = self.heading + turn
+            speed = np.where(throttle == 1, self.speed + self.acceleration * dt,
+                             np.where(throttle == -1, self.speed - self.acceleration * dt, self.speed * friction))
+
+            # clamp speed
+            speed = np.minimum(speed, self.max_speed)
+            speed = np.maximum(speed, -self.max_speed / 2)
+
+            # tentative move
+            rad = np.radians(heading)
+            x = self.x + speed * np.cos(rad) * dt
+            y = self.y + speed * np.sin(rad) * dt
+
+            # collision check: revert the pose and damp speed for cars that left the road
+            collided = ~self.on_road(x, y, heading)
+            self.x = np.where(collided, self.x, x)
+            self.y = np.where(collided, self.y, y)
+            self.heading = np.where(collided, self.heading, heading)
+            self.speed = np.where(collided, speed * -0.2, speed)
+            collided_any |= collided
+
+        self.collided = collided_any
+
+    def keep(self, mask):
+        """Drop every car where mask is False (e.g. finished ones), so later steps skip them."""
+        self.x = self.x[mask]
+        self.y = self.y[mask]
+        self.heading = self.heading[mask]
+        self.speed = self.speed[mask]
+        self.collided = self.collided[mask]
+        self.heading_error = self.heading_error[mask]
+        self.distance_to_center = self.distance_to_center[mask]
+        self.future_heading_error = self.future_heading_error[mask]
+        self.states = self.states[mask]
+        self.n = len(self.x)
+
+    # Cars are only compared against the few centerline items their
+    # CenterlineIndex cell lists, padded to CANDIDATES per cell by repeating
+    # the last one. Cars outside the index grid, or in one of the rare cells
+    # with longer lists (off the road, across a U-turn), are compared against
+    # everything instead.
+    CANDIDATES = 8
+
+    def _build_candidates(self, index):
+        self.cell_min_x = index.min_x
+        self.cell_min_y = index.min_y
+        self.cell_size = index.cell_size
+        self.cell_cols = index.cols
+        self.cell_rows = index.rows
+        k = self.CANDIDATES
+        tables = [np.zeros((len(index.cells), k), dtype=np.int64) for _ in range(3)]
+        wide = np.zeros(len(index.cells), dtype=bool)
+        for c, entry in enumerate(index.cells):
+            for table, cands in zip(tables, entry):
+                if len(cands) > k:
+                    wide[c] = True
+                else:
+                    cands = list(cands)
+                    table[c] = cands + cands[-1:] * (k - len(cands))
+        mid, seg, pt = tables
+        self.wide_cells = wide
+        # the candidates' coordinates and angles per cell, so a query is one gather per table
+        self.mid_x = self.midpoints[mid, 0]
+        self.mid_y = self.midpoints[mid, 1]
+        self.mid_angle = self.segment_angles[mid]
+        self.seg_x1, self.seg_y1, self.seg_x2, self.seg_y2 = np.moveaxis(self.segments[seg], -1, 0)
+        self.pt_x = self.points[pt, 0]
+        self.pt_y = self.points[pt, 1]
+        self.pt_angle = self.lookahead_angles[pt]
+
+    def observe(self):
+        """Compute the features for every car's pose and return the (N, 4) discrete states."""
+        col = np.floor((self.x - self.cell_min_x) / self.cell_size).astype(np.int64)
+        row = np.floor((self.y - self.cell_min_y) / self.cell_size).astype(np.int64)
+        in_grid = (col >= 0) & (col < self.cell_cols) & (row >= 0) & (row < self.cell_rows)
+        cell = np.where(in_grid, row * self.cell_cols + col, 0)
+        scan_all = ~in_grid | self.wide_cells[cell]
+
+        if scan_all.any():
+            road_angle = np.empty(self.n)
+            distance = np.empty(self.n)
+            lookahead_angle = np.empty(self.n)
+            near = ~scan_all
+            road_angle[near], distance[near], lookahead_angle[near] = self._nearest_candidates(
+                self.x[near], self.y[near], cell[near])
+            road_angle[scan_all], distance[scan_all], lookahead_angle[scan_all] = self._nearest_all(
+                self.x[scan_all], self.y[scan_all])
+        else:
+            road_angle, distance, lookahead_angle = self._nearest_candidates(self.x, self.y, cell)
+
+        self.heading_error = normalize_angle_deg_array(self.heading - road_angle)
+        self.distance_to_center = distance
+        self.future_heading_error = normalize_angle_deg_array(self.heading - lookahead_angle)
+
+        self.states = discretize_states(self.speed, self.heading_error, self.distance_to_center,
+                                        self.future_heading_error)
+        return self.states
+
+    def _nearest_candidates(self, x, y, cell):
+        """Road angle, distance to centerline and lookahead angle from each car's cell candidates."""
+        px = x[:, None]
+        py = y[:, None]
+
+        # heading error: direction of the closest segment by midpoint
+        mid_d = np.hypot(px - self.mid_x[cell], py - self.mid_y[cell])
+        road_angle = self.mid_angle[cell, mid_d.argmin(axis=1)]
+
+        # distance to the closest segment
+        distance = self._segment_distances(px, py, self.seg_x1[cell], self.seg_y1[cell],
+                                           self.seg_x2[cell], self.seg_y2[cell]).min(axis=1)
+
+        # future heading error: lookahead direction from the closest centerline point
+        pt_d = np.hypot(px - self.pt_x[cell], py - self.pt_y[cell])
+        lookahead_angle = self.pt_angle[cell, pt_d.argmin(axis=1)]
+        return road_angle, distance, lookahead_angle
+
+    def _nearest_all(self, x, y):
+        """Same as _nearest_candidates(), comparing every car against the whole centerline."""
+        px = x[:, None]
+        py = y[:, None]
+
+        mid_d = np.hypot(px - self.midpoints[:, 0], py - self.midpoints[:, 1])
+        road_angle = self.segment_angles[mid_d.argmin(axis=1)]
+
+        x1, y1, x2, y2 = self.segments.T
+        distance = self._segment_distances(px, py, x1, y1, x2, y2).min(axis=1)
+
+        pt_d = np.hypot(px - self.points[:, 0], py - self.points[:, 1])
+        lookahead_angle = self.lookahead_angles[pt_d.argmin(axis=1)]
+        return road_angle, distance, lookahead_angle
+
+    @staticmethod
+    def _segment_distances(px, py, x1, y1, x2, y2):
+        dx = x2 - x1
+        dy = y2 - y1
+        len_sq = dx * dx + dy * dy
+        t = ((px - x1) * dx + (py - y1) * dy) / np.where(len_sq == 0, 1.0, len_sq)
+        t = np.where(len_sq == 0, 0.0, np.clip(t, 0.0, 1.0))
+        return np.hypot(px - (x1 + t * dx), py - (y1 + t * dy))
@@ -0,0 +1,80 @@
+"""
+Action repeat (frame skip): training cost and results per simulated tick.
+
+Trains from an empty Q-table for the same number of simulated ticks with each
+action repeat k (k ticks per decision, so 1/k as many decisions and Q
+updates), and once with physics sub-stepping. Every run is repeated with the
+same seed to check it reproduces exactly.
+
+Time inside Car.rl_update (physics and the collision test) is measured
+separately: it is paid per tick whatever k is, and grows when a policy spends
+more ticks scraping the road edge, where the exact polygon test runs. The rest
+(features, Q update, exploration, rewards) is paid per decision.
+
+    python benchmarks/action_repeat.py
+"""
+import io
+import os
+import sys
+import time
+import hashlib
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from main import TrainingSession
+from env import track
+from qtable import QTable
+from car import Car
+
+TICKS = 240000
+SEED = 0
+CONFIGS = [(1, 1), (2, 1), (4, 1), (8, 1), (1, 2)]   # (action_repeat, substeps)
+
+
+def timed_physics():
+    """Wrap Car.rl_update to add up the time spent in it; returns (totals, restore)."""
+    update = Car.rl_update
+    totals = [0.0]
+
+    def rl_update(self, *args, **kwargs):
+        t0 = time.perf_counter()
+        update(self, *args, **kwargs)
+        totals[0] += time.perf_counter() - t0
+
+    Car.rl_update = rl_update
+    return totals, lambda: setattr(Car, "rl_update", update)
+
+
+def train(action_repeat, substeps):
+    session = TrainingSession(track, q=QTable(), seed=SEED, action_repeat=action_repeat, substeps=substeps)
+    decisions = TICKS // action_repeat
+    physics, restore = timed_physics()
+    t0 = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(decisions):
+                session.step()
+    finally:
+        restore()
+    seconds = time.perf_counter() - t0
+    digest = hashlib.sha1(session.q.values.tobytes()).hexdigest()[:12]
+    return session, decisions, seconds, physics[0], digest
+
+
+def main():
+    print(f"{TICKS:,} simulated ticks per run, seed {SEED}")
+    print(f"{'k':>2} {'sub':>4} {'seconds':>8} {'ticks/s':>9} {'physics s':>10} {'rest s':>7} "
+          f"{'rest us/decision':>17} {'laps':>5} {'best lap s':>11} {'reproduced':>11}")
+    for action_repeat, substeps in CONFIGS:
+        session, decisions, seconds, physics, digest = train(action_repeat, substeps)
+        again = train(action_repeat, substeps)[-1]
+        best = f"{session.best_lap:.2f}" if session.best_lap is not None else "-"
+        rest = seconds - physics
+        print(f"{action_repeat:>2} {substeps:>4} {seconds:>8.2f} {TICKS / seconds:>9,.0f} {physics:>10.2f} "
+              f"{rest:>7.2f} {rest / decisions * 1e6:>17.1f} {session.tries:>5} {best:>11} "
+              f"{'yes' if again == digest else 'NO':>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Batched stepping: BatchCars(N) vs Car.rl_update one car at a time.
+
+First replays the same random actions through Car.rl_update (+ the exact
+compute_* features) and BatchCars(1) and checks they stay identical, then
+reports transitions per second for several batch sizes.
+
+    python benchmarks/batch_env.py
+"""
+import os
+import sys
+import time
+import random
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from env import (track, compute_heading_error, compute_distance_to_centerline,
+                  compute_future_heading_error, discretize_state)
+from car import Car
+from track import CenterlineIndex, RoadMask
+from batch import BatchCars
+
+CHECK_STEPS = 20000
+BATCH_SIZES = [1, 64, 1024, 4096]
+
+
+def spawn_pose():
+    centerline = track.centerline
+    return centerline[0][0], centerline[0][1] + 40, 0.0
+
+
+def check_against_car(index, mask):
+    rng = random.Random(0)
+    x, y, heading = spawn_pose()
+    car = Car(x, y, font=None)
+    batch = BatchCars(1, track, index, road_mask=mask, x=x, y=y, heading=heading)
+    collisions = 0
+    for _ in range(CHECK_STEPS):
+        action = rng.randint(0, 8)
+        car.rl_update(action, track.polygon)
+        states = batch.step([action])
+
+        assert (batch.x[0], batch.y[0], batch.heading[0], batch.speed[0]) == (car.x, car.y, car.heading, car.speed)
+        assert bool(batch.collided[0]) == car.collided
+        collisions += car.collided
+
+        heading_error = compute_heading_error(car.x, car.y, car.heading, track.centerline)
+        distance = compute_distance_to_centerline(car.x, car.y, track.centerline)
+        future = compute_future_heading_error(car.x, car.y, car.heading, track.centerline)
+        assert tuple(states[0]) == discretize_state(car.speed, heading_error, distance, future)
+        assert batch.heading_error[0] == heading_error and batch.future_heading_error[0] == future
+        assert abs(batch.distance_to_center[0] - distance) <= 1e-9
+    return collisions
+
+
+def main():
+    index = CenterlineIndex(track.centerline, margin=track.width)
+    mask = RoadMask(track.polygon)
+
+    collisions = check_against_car(index, mask)
+    print(f"BatchCars(1) matched Car.rl_update for {CHECK_STEPS} steps ({collisions} collisions)")
+
+    rng = np.random.default_rng(0)
+    x, y, heading = spawn_pose()
+
+    car = Car(x, y, font=None)
+    steps = 5000
+    actions = rng.integers(0, 9, size=steps)
+    t0 = time.perf_counter()
+    for a in actions:
+        car.rl_update(int(a), track.polygon, mask)
+        compute_heading_error(car.x, car.y, car.heading, track.centerline)
+        compute_distance_to_centerline(car.x, car.y, track.centerline)
+        compute_future_heading_error(car.x, car.y, car.heading, track.centerline)
+    scalar = steps / (time.perf_counter() - t0)
+    print(f"{'Car.rl_update':>16}: {scalar:>12,.0f} transitions/s")
+
+    for n in BATCH_SIZES:
+        batch = BatchCars(n, track, index, road_mask=mask, x=x, y=y, heading=heading)
+        steps = max(20, 20000 // n)
+        actions = rng.integers(0, 9, size=(steps, n))
+        t0 = time.perf_counter()
+        for a in actions:
+            batch.step(a)
+        rate = steps * n / (time.perf_counter() - t0)
+        print(f"{f'BatchCars({n})':>16}: {rate:>12,.0f} transitions/s ({rate / scalar:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Per-step cost of the centerline features: three linear scans vs one
+CenterlineIndex query, as the track gets denser.
+
+    python benchmarks/centerline_index.py
+"""
+import os
+import sys
+import math
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from env import (raw_centerline, smooth_path, fit_centerline_to_screen, compute_heading_error,
+                  compute_distance_to_centerline, compute_future_heading_error, compute_features,
+                  WIDTH, HEIGHT, MARGIN, ROAD_WIDTH)
+from track import CenterlineIndex
+
+SAMPLES = [20, 50, 100, 200, 400]
+N_POINTS = 2000
+
+
+def sample_poses(centerline, n, rng):
+    """Random poses on the road: a point on the centerline pushed sideways up to half the road width."""
+    poses = []
+    for _ in range(n):
+        i = rng.randrange(len(centerline) - 1)
+        (x1, y1), (x2, y2) = centerline[i], centerline[i + 1]
+        a = rng.random()
+        off = rng.uniform(-ROAD_WIDTH / 2, ROAD_WIDTH / 2)
+        angle = math.atan2(y2 - y1, x2 - x1)
+        poses.append((x1 + (x2 - x1) * a - math.sin(angle) * off,
+                      y1 + (y2 - y1) * a + math.cos(angle) * off,
+                      rng.uniform(-180, 180)))
+    return poses
+
+
+def linear(poses, centerline):
+    for x, y, h in poses:
+        compute_heading_error(x, y, h, centerline)
+        compute_distance_to_centerline(x, y, centerline)
+        compute_future_heading_error(x, y, h, centerline)
+
+
+def indexed(poses, index):
+    for x, y, h in poses:
+        compute_features(x, y, h, index)
+
+
+def main():
+    rng = random.Random(0)
+    print(f"{'samples':>8} {'points':>7} {'build s':>8} {'linear us':>10} {'index us':>9} {'speedup':>8}")
+    for samples in SAMPLES:
+        centerline = fit_centerline_to_screen(smooth_path(raw_centerline, samples=samples), WIDTH, HEIGHT, MARGIN)
+        poses = sample_poses(centerline, N_POINTS, rng)
+
+        t0 = time.perf_counter()
+        index = CenterlineIndex(centerline, margin=ROAD_WIDTH)
+        build = time.perf_counter() - t0
+
+        for x, y, h in poses:
+            expected = (compute_heading_error(x, y, h, centerline),
+                        compute_distance_to_centerline(x, y, centerline),
+                        compute_future_heading_error(x, y, h, centerline))
+            assert compute_features(x, y, h, index) == expected, (samples, x, y, h)
+
+        t0 = time.perf_counter()
+        linear(poses, centerline)
+        t_linear = (time.perf_counter() - t0) / N_POINTS * 1e6
+
+        t0 = time.perf_counter()
+        indexed(poses, index)
+        t_index = (time.perf_counter() - t0) / N_POINTS * 1e6
+
+        print(f"{samples:>8} {len(centerline):>7} {build:>8.2f} {t_linear:>10.1f} {t_index:>9.1f} {t_linear / t_index:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Greedy evaluation: batched rollouts (evaluate.py) vs stepping a CarEnv.
+
+Trains a Q-table for a fixed number of seeded steps, checks that the batched
+rollouts finish in the same number of ticks, with the same collisions, as
+driving a CarEnv greedily from the same start poses (with the default
+physics, with action repeat and with substeps), then times evaluate() for
+10,000 starts.
+
+    python benchmarks/evaluate.py
+"""
+import io
+import os
+import sys
+import time
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from main import TrainingSession
+from env import CarEnv, track
+from qtable import QTable
+from evaluate import sample_starts, rollout, evaluate, summarize
+
+TRAIN_STEPS = 300000
+CHECK_STARTS = 30
+MAX_STEPS = 3000
+STARTS = 10000
+PHYSICS = [
+    {},
+    {"action_repeat": 4},
+    {"sim_dt": 1 / 30, "substeps": 2},
+]
+
+
+def train():
+    session = TrainingSession(track, q=QTable(), seed=0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(TRAIN_STEPS):
+            session.step()
+    return session.q.values.copy()
+
+
+def env_rollout(q, env, x, y, heading):
+    """One greedy episode on a CarEnv from the given pose; ticks to finish (0 if not) and collision ticks."""
+    env.reset()
+    car = env.car
+    car.x, car.y, car.heading = x, y, heading
+    state = env.observe()
+    while env.episode_steps < MAX_STEPS:
+        pose = (car.x, car.y, car.heading, car.speed)
+        state, _, done, info = env.step(q.best_action(state))
+        if done:
+            return env.episode_steps, env.episode_collisions
+        if (car.x, car.y, car.heading, car.speed) == pose:
+            break   # stuck for good, as in evaluate.rollout
+    return 0, env.episode_collisions
+
+
+def main():
+    t0 = time.perf_counter()
+    q_values = train()
+    print(f"trained {TRAIN_STEPS:,} steps in {time.perf_counter() - t0:.1f}s")
+    q = QTable(q_values)
+
+    x, y, h = sample_starts(CarEnv(), CHECK_STARTS, seed=1)
+    for physics in PHYSICS:
+        env = CarEnv(**physics)
+        t0 = time.perf_counter()
+        expected = [env_rollout(q, env, *pose) for pose in zip(x.tolist(), y.tolist(), h.tolist())]
+        env_seconds = time.perf_counter() - t0
+        lap_steps, collisions, _ = rollout(q, CarEnv(**physics), x, y, h, MAX_STEPS)
+        mismatches = sum(e != (s, c) for e, s, c in zip(expected, lap_steps.tolist(), collisions.tolist()))
+        print(f"{CHECK_STARTS} starts, physics {physics or 'default'}: batched rollouts match CarEnv on "
+              f"{CHECK_STARTS - mismatches}/{CHECK_STARTS} ({sum(s > 0 for s, _ in expected)} finished); "
+              f"CarEnv took {env_seconds:.1f}s")
+        if not physics:
+            default_seconds = env_seconds
+
+    for workers in sorted({1, os.cpu_count()}):
+        t0 = time.perf_counter()
+        results = evaluate(q_values, starts=STARTS, max_steps=MAX_STEPS, workers=workers)
+        seconds = time.perf_counter() - t0
+        summary = summarize(results)
+        print(f"{STARTS:,} starts on {workers} worker(s): {seconds:.1f}s | finished {summary['completion_rate']:.1%} "
+              f"| stuck {summary['stuck']:,}")
+    print(f"CarEnv at the same rate: ~{default_seconds / CHECK_STARTS * STARTS / 60:.0f} min")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Precomputed FeatureField vs the exact features.
+
+Checks the field against the exact compute_* functions and CenterlineIndex on
+random road poses (distance within half a cell diagonal, how often the
+segment used for progress, the angles and the discrete state differ), then times per-step feature lookup, the build and a cache load.
+
+    python benchmarks/feature_field.py
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from env import (track, compute_heading_error, compute_distance_to_centerline,
+                 compute_future_heading_error, compute_features, discretize_state)
+from track import CenterlineIndex
+from feature_field import FeatureField, load_feature_field
+from centerline_index import sample_poses
+
+N_POSES = 20000
+CELL_SIZES = [1.0, 2.0, 4.0]
+
+
+def check(field, index, poses, speeds):
+    """
+    Compare against the exact functions and index; returns (max distance error,
+    segment mismatch %, angle mismatch %, state mismatch %).
+    """
+    centerline = track.centerline
+    max_error = 0.0
+    segment_mismatches = 0
+    angle_mismatches = 0
+    state_mismatches = 0
+    for (x, y, h), speed in zip(poses, speeds):
+        exact = (compute_heading_error(x, y, h, centerline),
+                 compute_distance_to_centerline(x, y, centerline),
+                 compute_future_heading_error(x, y, h, centerline))
+        approx = compute_features(x, y, h, field)
+        max_error = max(max_error, abs(approx[1] - exact[1]))
+        segment_mismatches += field.query(x, y)[0] != index.query(x, y)[0]
+        angle_mismatches += approx[0] != exact[0] or approx[2] != exact[2]
+        state_mismatches += discretize_state(speed, *approx) != discretize_state(speed, *exact)
+    assert max_error <= field.max_distance_error + 1e-9, (max_error, field.max_distance_error)
+    n = len(poses)
+    return max_error, 100 * segment_mismatches / n, 100 * angle_mismatches / n, 100 * state_mismatches / n
+
+
+def per_step_us(index, poses):
+    t0 = time.perf_counter()
+    for x, y, h in poses:
+        compute_features(x, y, h, index)
+    return (time.perf_counter() - t0) / len(poses) * 1e6
+
+
+def main():
+    rng = random.Random(0)
+    poses = sample_poses(track.centerline, N_POSES, rng)
+    speeds = [rng.uniform(-2.5, 5) for _ in poses]
+
+    index = CenterlineIndex(track.centerline, margin=track.width)
+    print(f"CenterlineIndex (exact): {per_step_us(index, poses):.2f} us/step")
+
+    print(f"{'cell':>5} {'build s':>8} {'max |d err|':>12} {'tolerance':>10} {'segment differs':>16} "
+          f"{'angles differ':>14} {'state differs':>14} {'us/step':>8}")
+    for cell_size in CELL_SIZES:
+        t0 = time.perf_counter()
+        field = FeatureField(track.centerline, cell_size=cell_size, margin=track.width)
+        build = time.perf_counter() - t0
+        max_error, segments, angles, states = check(field, index, poses, speeds)
+        print(f"{cell_size:>5.1f} {build:>8.2f} {max_error:>12.3f} {field.max_distance_error:>10.3f} "
+              f"{segments:>15.2f}% {angles:>13.2f}% {states:>13.2f}% {per_step_us(field, poses):>8.2f}")
+
+    cache_dir = tempfile.mkdtemp()
+    try:
+        load_feature_field(track.centerline, margin=track.width, cache_dir=cache_dir)
+        t0 = time.perf_counter()
+        load_feature_field(track.centerline, margin=track.width, cache_dir=cache_dir)
+        print(f"cached load (cell 2.0): {(time.perf_counter() - t0) * 1000:.1f} ms")
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+if __name__ == "__main__":
+    main()
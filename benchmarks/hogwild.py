@@ -0,0 +1,37 @@
+"""
+Hogwild workers sharing one Q-table: wall time to the first clean lap and
+combined throughput as the number of worker processes K goes up.
+
+Wall time includes starting the worker processes. Each K is run with several
+seeds and the median is reported; runs are capped at MAX_SECONDS.
+
+    python benchmarks/hogwild.py
+"""
+import os
+import sys
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from hogwild import run_hogwild
+
+SEEDS = range(8)
+MAX_SECONDS = 60.0
+
+
+def main():
+    cores = os.cpu_count()
+    ks = sorted({1, 2, 4, cores})
+    print(f"{cores} CPU cores, {len(SEEDS)} seeds per K, capped at {MAX_SECONDS:.0f}s")
+    print(f"{'K':>3} {'1st clean lap s':>16} {'no clean lap':>13} {'steps to it':>12} {'steps/s':>10}")
+    for k in ks:
+        runs = [run_hogwild(k, duration=MAX_SECONDS, until_clean_lap=True, seed=seed, quiet=True) for seed in SEEDS]
+        found = [r for r in runs if r["first_clean_lap_seconds"] is not None]
+        seconds = statistics.median(r["first_clean_lap_seconds"] for r in found) if found else float("nan")
+        steps = statistics.median(r["steps"] for r in found) if found else float("nan")
+        rate = statistics.median(r["steps_per_sec"] for r in runs)
+        print(f"{k:>3} {seconds:>16.2f} {len(runs) - len(found):>13} {steps:>12,.0f} {rate:>10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
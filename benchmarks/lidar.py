@@ -0,0 +1,116 @@
+"""
+Lidar range sensor: accuracy and cost.
+
+Checks Lidar.cast against a plain-Python ray/segment intersection over every
+polygon edge at random poses on the road, then times it for M = 8, 16, 32
+rays: one car per call (what CarEnv does every step), a batch of N cars in
+one call (per car), and a whole CarEnv.step with and without the sensor.
+
+    python benchmarks/lidar.py
+"""
+import os
+import sys
+import math
+import time
+import random
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from env import CarEnv, track
+from lidar import Lidar
+
+RAYS = [8, 16, 32]
+N_POSES = 300
+BATCH = 10000
+SINGLE_CALLS = 5000
+ENV_STEPS = 5000
+
+
+def sample_poses(n, rng):
+    """Random poses on the road: somewhere between matching points of the two road edges."""
+    poses = []
+    for _ in range(n):
+        i = rng.randrange(len(track.centerline))
+        (lx, ly), (rx, ry) = track.left_edge[i], track.right_edge[i]
+        a = rng.uniform(0.02, 0.98)
+        poses.append((lx + (rx - lx) * a, ly + (ry - ly) * a, rng.uniform(-180, 180)))
+    return poses
+
+
+def reference(lidar, x, y, heading):
+    """Every ray against every polygon edge, one at a time."""
+    polygon = track.polygon
+    ranges = []
+    for angle in lidar.angles.tolist():
+        dx = math.cos(math.radians(heading + angle))
+        dy = math.sin(math.radians(heading + angle))
+        best = lidar.max_range
+        for i in range(len(polygon)):
+            (ax, ay), (bx, by) = polygon[i], polygon[(i + 1) % len(polygon)]
+            ex, ey = bx - ax, by - ay
+            denom = dx * ey - dy * ex
+            if denom == 0:
+                continue
+            wx, wy = ax - x, ay - y
+            t = (wx * ey - wy * ex) / denom
+            u = (wx * dy - wy * dx) / denom
+            if t >= 0 and 0 <= u <= 1:
+                best = min(best, t)
+        ranges.append(best)
+    return ranges
+
+
+def env_step_us(lidar_rays):
+    env = CarEnv(lidar_rays=lidar_rays)
+    env.reset()
+    rng = random.Random(0)
+    actions = [rng.randrange(9) for _ in range(ENV_STEPS)]
+    t0 = time.perf_counter()
+    for a in actions:
+        _, _, done, _ = env.step(a)
+        if done:
+            env.reset()
+    return (time.perf_counter() - t0) / ENV_STEPS * 1e6
+
+
+def main():
+    rng = random.Random(0)
+    poses = sample_poses(N_POSES, rng)
+    xs = np.array([p[0] for p in poses])
+    ys = np.array([p[1] for p in poses])
+    hs = np.array([p[2] for p in poses])
+    bx = np.resize(xs, BATCH)
+    by = np.resize(ys, BATCH)
+    bh = np.resize(hs, BATCH)
+
+    print(f"{len(track.polygon)} polygon vertices | error vs reference over {N_POSES} road poses")
+    print(f"{'rays':>5} {'max error':>10} {'walls/cell':>11} {'1 car us':>9} {'batch us/car':>13}")
+    for m in RAYS:
+        lidar = Lidar(track, m)
+        error = max(np.abs(lidar.cast(x, y, h) - reference(lidar, x, y, h)).max() for x, y, h in poses)
+        batch_error = np.abs(lidar.cast(xs, ys, hs) - np.array([lidar.cast(x, y, h) for x, y, h in poses])).max()
+        error = max(error, batch_error)
+
+        t0 = time.perf_counter()
+        for i in range(SINGLE_CALLS):
+            x, y, h = poses[i % N_POSES]
+            lidar.cast(x, y, h)
+        single = (time.perf_counter() - t0) / SINGLE_CALLS * 1e6
+
+        t0 = time.perf_counter()
+        lidar.cast(bx, by, bh)
+        batch = (time.perf_counter() - t0) / BATCH * 1e6
+        print(f"{m:>5} {error:>10.1e} {lidar.cell_walls:>11} {single:>9.1f} {batch:>13.2f}")
+
+    print(f"\nCarEnv.step, {ENV_STEPS:,} random-action steps")
+    base = env_step_us(0)
+    print(f"{'no lidar':>10} {base:>8.1f} us/step")
+    for m in RAYS:
+        us = env_step_us(m)
+        print(f"{m:>4} rays {us:>9.1f} us/step (+{us - base:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Cost of the metrics logger on the training loop.
+
+Times MetricsLogger.log() itself, then the same seeded training run without
+metrics, with a progress record every 1000 and every 10 steps, and every 10
+steps again with a "disk" that stalls 200 ms on every write, to show the
+loop does not wait for it. Checks that every logged record reached the file.
+
+    python benchmarks/metrics.py
+"""
+import io
+import os
+import sys
+import time
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from main import TrainingSession
+from env import track
+from qtable import QTable
+from metrics import MetricsLogger, read_metrics
+
+STEPS = 100000
+LOG_CALLS = 200000
+
+
+class SlowFile:
+    """File wrapper whose every write blocks for `delay` seconds."""
+
+    def __init__(self, f, delay):
+        self.f = f
+        self.delay = delay
+
+    def write(self, data):
+        time.sleep(self.delay)
+        return self.f.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.f, name)
+
+
+def slow_logger(path, delay):
+    logger = MetricsLogger(path, flush_every=0.1)
+    open_file = logger._open
+
+    def _open():
+        f = open_file()
+        return f if isinstance(f, SlowFile) else SlowFile(f, delay)
+
+    logger._open = _open
+    return logger
+
+
+def train(path=None, every=0, delay=0.0):
+    session = TrainingSession(track, q=QTable(), seed=0)
+    if path:
+        session.enable_metrics(path, every, flush_every=0.1)
+        if delay:
+            session.metrics.close()
+            session.metrics = slow_logger(path, delay)
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(STEPS):
+            session.step()
+    seconds = time.perf_counter() - t0
+    logged = session.tries + STEPS // every if path else 0
+    t1 = time.perf_counter()
+    session.close()
+    return seconds, logged, time.perf_counter() - t1
+
+
+def main():
+    tmp = tempfile.mkdtemp()
+    logger = MetricsLogger(os.path.join(tmp, "calls.jsonl"), flush_every=0.1)
+    record = {"kind": "progress", "time": time.time(), "steps": 1, "epsilon": 0.1, "q_coverage": 0.5}
+    t0 = time.perf_counter()
+    for _ in range(LOG_CALLS):
+        logger.log(record)
+    per_call = (time.perf_counter() - t0) / LOG_CALLS
+    logger.close()
+    print(f"log(): {per_call * 1e6:.2f} us per call ({logger.written:,} of {LOG_CALLS:,} records written)")
+
+    print(f"\n{STEPS:,} training steps, seed 0")
+    print(f"{'metrics':<32} {'seconds':>8} {'steps/s':>9} {'records':>8} {'in file':>8} {'close s':>8}")
+    runs = [("none", None, 0, 0.0), ("every 1000 steps", "a.jsonl", 1000, 0.0),
+            ("every 10 steps", "b.jsonl", 10, 0.0), ("every 10 steps, CSV", "c.csv", 10, 0.0),
+            ("every 10 steps, 200 ms writes", "d.jsonl", 10, 0.2)]
+    for name, file_name, every, delay in runs:
+        path = os.path.join(tmp, file_name) if file_name else None
+        seconds, logged, close_seconds = train(path, every, delay)
+        in_file = sum(1 for _ in read_metrics(path)) if path else 0
+        print(f"{name:<32} {seconds:>8.2f} {STEPS / seconds:>9,.0f} {logged:>8,} {in_file:>8,} "
+              f"{close_seconds:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Experience replay vs the plain one-update-per-step loop.
+
+For each number of replayed updates per step, trains from an empty Q-table
+with several seeds until the first finished lap and reports the median
+steps and wall time it took, then the laps finished in a fixed budget.
+
+    python benchmarks/replay.py
+"""
+import io
+import os
+import sys
+import time
+import statistics
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import main
+from env import track
+
+REPLAY_UPDATES = [0, 4, 16, 64]
+SEEDS = range(8)
+MAX_STEPS = 100000
+BUDGET_STEPS = 30000
+
+
+def new_session(replay_updates, seed):
+    return main.TrainingSession(track, q=main.QTable(), seed=seed, replay_updates=replay_updates)
+
+
+def first_lap(replay_updates, seed):
+    """(steps, seconds) until the first finished lap, or (None, seconds) if MAX_STEPS ran out."""
+    session = new_session(replay_updates, seed)
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        while session.tries == 0 and session.steps < MAX_STEPS:
+            session.step()
+    elapsed = time.perf_counter() - t0
+    return (session.steps if session.tries else None), elapsed
+
+
+def laps_in_budget(replay_updates, seed):
+    session = new_session(replay_updates, seed)
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(BUDGET_STEPS):
+            session.step()
+    return session.tries, (time.perf_counter() - t0) / BUDGET_STEPS * 1e6
+
+
+def main_cli():
+    print(f"{len(SEEDS)} seeds, first lap capped at {MAX_STEPS} steps, budget {BUDGET_STEPS} steps")
+    print(f"{'K':>4} {'1st lap steps':>14} {'1st lap s':>10} {'unfinished':>11} {'laps/budget':>12} {'us/step':>8}")
+    for k in REPLAY_UPDATES:
+        runs = [first_lap(k, seed) for seed in SEEDS]
+        finished = [steps for steps, _ in runs if steps is not None]
+        steps = statistics.median(finished) if finished else float("nan")
+        seconds = statistics.median(t for _, t in runs)
+        budget = [laps_in_budget(k, seed) for seed in SEEDS]
+        laps = statistics.mean(l for l, _ in budget)
+        us = statistics.median(u for _, u in budget)
+        print(f"{k:>4} {steps:>14.0f} {seconds:>10.2f} {len(runs) - len(finished):>11} {laps:>12.1f} {us:>8.1f}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,64 @@
+"""
+Collision checks: ray casting against the road polygon vs the RoadMask
+occupancy grid. Also checks the two agree on every sampled point and
+car pose, and exits non-zero if they ever differ.
+
+    python benchmarks/road_mask.py
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from env import track, WIDTH, HEIGHT
+from car import Car
+from track import RoadMask, point_in_polygon
+
+N_POINTS = 200000
+N_POSES = 20000
+
+
+def main():
+    rng = random.Random(0)
+    polygon = track.polygon
+
+    t0 = time.perf_counter()
+    mask = RoadMask(polygon)
+    build = time.perf_counter() - t0
+
+    # Uniform points over the screen, plus points hugging the edges where the fallback kicks in
+    points = [(rng.uniform(-20, WIDTH + 20), rng.uniform(-20, HEIGHT + 20)) for _ in range(N_POINTS // 2)]
+    for _ in range(N_POINTS // 2):
+        x, y = rng.choice(polygon)
+        points.append((x + rng.uniform(-3, 3), y + rng.uniform(-3, 3)))
+
+    mismatches = sum(1 for x, y in points if mask.contains(x, y) != point_in_polygon(x, y, polygon))
+
+    car = Car(0, 0, font=None)
+    poses = [(rng.uniform(0, WIDTH), rng.uniform(0, HEIGHT), rng.uniform(-180, 180)) for _ in range(N_POSES)]
+    pose_mismatches = 0
+    for car.x, car.y, car.heading in poses:
+        if car._all_corners_inside_polygon(polygon) != car._all_corners_inside_polygon(polygon, mask):
+            pose_mismatches += 1
+
+    t0 = time.perf_counter()
+    for car.x, car.y, car.heading in poses:
+        car._all_corners_inside_polygon(polygon)
+    t_poly = (time.perf_counter() - t0) / N_POSES * 1e6
+
+    t0 = time.perf_counter()
+    for car.x, car.y, car.heading in poses:
+        car._all_corners_inside_polygon(polygon, mask)
+    t_mask = (time.perf_counter() - t0) / N_POSES * 1e6
+
+    print(f"polygon vertices: {len(polygon)}, mask {mask.cols}x{mask.rows} cells, built in {build:.3f}s")
+    print(f"point mismatches: {mismatches}/{len(points)}, pose mismatches: {pose_mismatches}/{N_POSES}")
+    print(f"corner check per pose: ray cast {t_poly:.1f}us, mask {t_mask:.1f}us ({t_poly / t_mask:.1f}x)")
+    if mismatches or pose_mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Simplified road polygon vs one vertex per centerline sample.
+
+For each bundled track: polygon vertex counts, the largest distance from a
+dropped edge point to the simplified polygon, collision test mismatches at
+random points, build times of the structures made from the polygon
+(RoadMask, Lidar), and the cost of a CarEnv.step on both polygons with the
+road mask, with exact polygon collision checks and with 8 lidar rays.
+
+    python benchmarks/road_polygon.py
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from env import CarEnv
+from track import build_track, point_in_polygon, distance_point_to_segment, RoadMask
+from tracks import load_track, TRACK_DIR
+from lidar import Lidar
+
+TRACKS = ["default.json", "chicane.csv", "hairpin.json"]
+N_POINTS = 20000
+STEPS = 5000
+CONFIGS = [
+    ("road mask", {}),
+    ("exact polygon", {"use_road_mask": False}),
+    ("lidar 8", {"lidar_rays": 8}),
+]
+
+
+def dense(track):
+    return build_track(track.centerline, track.width, track.start_index, track.finish_index, tolerance=0)
+
+
+def max_deviation(full, simple):
+    """Largest distance from a vertex of `full` to the closed polyline `simple`."""
+    edges = list(zip(simple, simple[1:] + simple[:1]))
+    return max(min(distance_point_to_segment(x, y, x1, y1, x2, y2) for (x1, y1), (x2, y2) in edges)
+               for x, y in full)
+
+
+def mismatches(full, simple, rng):
+    xs = [p[0] for p in full]
+    ys = [p[1] for p in full]
+    count = 0
+    for _ in range(N_POINTS):
+        x = rng.uniform(min(xs) - 10, max(xs) + 10)
+        y = rng.uniform(min(ys) - 10, max(ys) + 10)
+        count += point_in_polygon(x, y, full) != point_in_polygon(x, y, simple)
+    return count
+
+
+def build_ms(make):
+    t0 = time.perf_counter()
+    make()
+    return (time.perf_counter() - t0) * 1000
+
+
+def step_us(track, settings):
+    """Mean CarEnv.step time over the same random actions, plus the final pose to compare runs."""
+    env = CarEnv(track, **settings)
+    env.reset()
+    rng = random.Random(0)
+    actions = [rng.randrange(9) for _ in range(STEPS)]
+    t0 = time.perf_counter()
+    for a in actions:
+        _, _, done, _ = env.step(a)
+        if done:
+            env.reset()
+    us = (time.perf_counter() - t0) / STEPS * 1e6
+    return us, (env.car.x, env.car.y, env.car.heading, env.car.speed)
+
+
+def main():
+    rng = random.Random(0)
+    print(f"{'track':<14} {'points':>6} {'vertices':>14} {'max dev px':>11} {'mismatch':>9} "
+          f"{'mask build ms':>14} {'lidar build ms':>15}")
+    tracks = []
+    for name in TRACKS:
+        simple = load_track(os.path.join(TRACK_DIR, name), cache_dir=None)
+        full = dense(simple)
+        tracks.append((name, full, simple))
+        mask = [build_ms(lambda: RoadMask(t.polygon)) for t in (full, simple)]
+        lidar = [build_ms(lambda: Lidar(t, 8)) for t in (full, simple)]
+        print(f"{name:<14} {len(simple.centerline):>6} {len(full.polygon):>6} -> {len(simple.polygon):>4} "
+              f"{max_deviation(full.polygon, list(simple.polygon)):>11.1e} "
+              f"{mismatches(full.polygon, simple.polygon, rng):>9} "
+              f"{mask[0]:>6.1f} -> {mask[1]:<5.1f} {lidar[0]:>7.1f} -> {lidar[1]:<5.1f}")
+
+    name, full, simple = tracks[0]
+    print(f"\nCarEnv.step on {name}, {STEPS:,} random-action steps, us/step")
+    for label, settings in CONFIGS:
+        before, end_full = step_us(full, settings)
+        after, end_simple = step_us(simple, settings)
+        same = "same trajectory" if end_full == end_simple else "trajectories differ"
+        print(f"{label:<14} {before:>7.1f} -> {after:<7.1f} ({same})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Import-to-first-step latency, measured in fresh interpreters.
+
+Each scenario runs in its own `python -c` process so nothing is already
+imported or cached. Reports the best of several runs and whether pygame got
+loaded along the way.
+
+    python benchmarks/startup.py
+"""
+import os
+import sys
+import json
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+RUNS = 5
+
+PRELUDE = "import time, sys; t0 = time.perf_counter(); sys.path.insert(0, {root!r})\n"
+REPORT = "print(__import__('json').dumps([time.perf_counter() - t0, 'pygame' in sys.modules]))\n"
+
+SCENARIOS = {
+    "env (headless)": (
+        "from env import CarEnv\n"
+        "env = CarEnv()\n"
+        "env.reset()\n"
+        "env.step(0)\n"
+    ),
+    "main.TrainingSession (headless)": (
+        "import main\n"
+        "session = main.TrainingSession(main.track)\n"
+        "session.step()\n"
+    ),
+    "env + first frame (window)": (
+        "import os; os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')\n"
+        "from env import CarEnv\n"
+        "env = CarEnv()\n"
+        "env.reset()\n"
+        "env.step(0)\n"
+        "env.render()\n"
+    ),
+}
+
+
+def run(code):
+    script = PRELUDE.format(root=ROOT) + code + REPORT
+    out = subprocess.check_output([sys.executable, "-c", script], cwd=ROOT, stderr=subprocess.DEVNULL)
+    seconds, pygame_loaded = json.loads(out.decode().strip().splitlines()[-1])
+    return seconds, pygame_loaded
+
+
+def main():
+    for name, code in SCENARIOS.items():
+        results = [run(code) for _ in range(RUNS)]
+        best = min(seconds for seconds, _ in results)
+        pygame_loaded = results[0][1]
+        print(f"{name:<34} {best * 1000:>8.1f} ms   pygame imported: {'yes' if pygame_loaded else 'no'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Micro and macro benchmarks for the simulation hot paths.
+
+Every benchmark runs on fixed, seeded inputs and reports the best of several
+repeats as microseconds per call. Results are written to a JSON file so two
+commits can be compared:
+
+    python benchmarks/suite.py -o before.json
+    ... change something ...
+    python benchmarks/suite.py -o after.json
+    python benchmarks/suite.py --compare before.json after.json
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import platform
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import main
+from env import (track, compute_heading_error, compute_distance_to_centerline,
+                  compute_future_heading_error, compute_features, discretize_state)
+from car import Car
+from track import CenterlineIndex, RoadMask
+
+SEED = 1234
+N_INPUTS = 500
+
+
+# -----------------------------
+# FIXED INPUTS
+# -----------------------------
+def road_poses(n, rng):
+    """Poses on the road: a point on the centerline pushed sideways, with a random heading."""
+    centerline = track.centerline
+    poses = []
+    for _ in range(n):
+        i = rng.randrange(len(centerline) - 1)
+        (x1, y1), (x2, y2) = centerline[i], centerline[i + 1]
+        a = rng.random()
+        off = rng.uniform(-track.width / 2, track.width / 2) * 0.8
+        angle = math.atan2(y2 - y1, x2 - x1)
+        poses.append((x1 + (x2 - x1) * a - math.sin(angle) * off,
+                      y1 + (y2 - y1) * a + math.cos(angle) * off,
+                      math.degrees(angle) + rng.uniform(-30, 30)))
+    return poses
+
+
+def measure(fn, calls, repeat=5):
+    """Best-of-`repeat` time of fn() (which makes `calls` calls), in microseconds per call."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best / calls * 1e6
+
+
+# -----------------------------
+# MICRO BENCHMARKS
+# -----------------------------
+def micro_benchmarks():
+    rng = random.Random(SEED)
+    poses = road_poses(N_INPUTS, rng)
+    actions = [rng.randint(0, 8) for _ in range(N_INPUTS)]
+    centerline = track.centerline
+    polygon = track.polygon
+    index = CenterlineIndex(centerline, margin=track.width)
+    mask = RoadMask(polygon)
+    car = Car(0, 0, font=None)
+
+    features = [(compute_heading_error(x, y, h, centerline), compute_distance_to_centerline(x, y, centerline),
+                 compute_future_heading_error(x, y, h, centerline)) for x, y, h in poses]
+    speeds = [rng.uniform(-2.5, 5) for _ in range(N_INPUTS)]
+
+    def rl_update(road_mask):
+        def run():
+            for (x, y, h), a in zip(poses, actions):
+                car.x, car.y, car.heading, car.speed = x, y, h, 2.0
+                car.rl_update(a, polygon, road_mask)
+        return run
+
+    def point_in_polygon():
+        for x, y, _ in poses:
+            car._point_in_polygon(x, y, polygon)
+
+    def heading_error():
+        for x, y, h in poses:
+            compute_heading_error(x, y, h, centerline)
+
+    def distance():
+        for x, y, _ in poses:
+            compute_distance_to_centerline(x, y, centerline)
+
+    def future_heading_error():
+        for x, y, h in poses:
+            compute_future_heading_error(x, y, h, centerline)
+
+    def fused_features():
+        for x, y, h in poses:
+            compute_features(x, y, h, index)
+
+    def discretize():
+        for speed, (he, d, fhe) in zip(speeds, features):
+            discretize_state(speed, he, d, fhe)
+
+    return {
+        "car.rl_update[polygon]": measure(rl_update(None), N_INPUTS),
+        "car.rl_update[mask]": measure(rl_update(mask), N_INPUTS),
+        "car._point_in_polygon": measure(point_in_polygon, N_INPUTS),
+        "compute_heading_error": measure(heading_error, N_INPUTS),
+        "compute_distance_to_centerline": measure(distance, N_INPUTS),
+        "compute_future_heading_error": measure(future_heading_error, N_INPUTS),
+        "compute_features[index]": measure(fused_features, N_INPUTS),
+        "discretize_state": measure(discretize, N_INPUTS),
+    }
+
+
+# -----------------------------
+# MACRO BENCHMARKS
+# -----------------------------
+def training_steps(steps, render, record=False, render_every=1):
+    """Full training steps (physics + features + reward + Q update), optionally drawing every Nth frame."""
+    session = main.TrainingSession(track, q=main.QTable(), seed=SEED)
+    if record:
+        tmp_dir = tempfile.mkdtemp()
+        session.env.start_recording(os.path.join(tmp_dir, "bench.traj"))
+    renderer = None
+    if render:
+        from render import Renderer
+        renderer = Renderer(track)
+        session.car.font = renderer.font
+
+    def run():
+        for _ in range(steps):
+            session.step()
+            if renderer is not None and session.steps % render_every == 0:
+                renderer.draw(session.env, session.tries, session.best_lap)
+                renderer.pump_events()
+
+    result = measure(run, steps, repeat=3)
+    if renderer is not None:
+        renderer.close()
+    if record:
+        session.close()
+        shutil.rmtree(tmp_dir)
+    return result
+
+
+def macro_benchmarks(render=True):
+    results = {
+        "training_step[headless]": training_steps(2000, render=False),
+        "training_step[recording]": training_steps(2000, render=False, record=True),
+    }
+    if render:
+        # no real display is needed; SDL's dummy driver still does all the drawing work
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        results["training_step[rendered]"] = training_steps(300, render=True)
+        results["training_step[rendered/16]"] = training_steps(2000, render=True, render_every=16)
+    return results
+
+
+# -----------------------------
+# REPORTING
+# -----------------------------
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{'benchmark':<34} {before.get('commit') or 'before':>10} {after.get('commit') or 'after':>10} {'change':>8}")
+    for name, new in after["results"].items():
+        old = before["results"].get(name)
+        if old is None:
+            print(f"{name:<34} {'-':>10} {new:>10.2f} {'new':>8}")
+        else:
+            print(f"{name:<34} {old:>10.2f} {new:>10.2f} {old / new:>7.2f}x")
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the simulation hot paths (us per call)")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="where to write the results")
+    parser.add_argument("--no-render", action="store_true", help="skip the rendered training step")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"),
+                        help="compare two result files instead of running")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = micro_benchmarks()
+    results.update(macro_benchmarks(render=not args.no_render))
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "seed": SEED,
+        "unit": "us_per_call",
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for name, us in results.items():
+        print(f"{name:<34} {us:>10.2f} us")
+    print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main_cli()
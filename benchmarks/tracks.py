@@ -0,0 +1,79 @@
+"""
+Loading a large set of track files: parsing and rebuilding the geometry every
+time versus reading it back from the geometry cache.
+
+Writes N random tracks (JSON and CSV) to a temporary directory, then times
+load_tracks() with no cache, with an empty cache (build + write) and with a
+warm cache, plus the first CarEnv on the set (whose collision mask and
+feature index are built for the first track only).
+
+    python benchmarks/tracks.py
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from env import CarEnv
+from tracks import load_tracks
+
+N_TRACKS = 200
+CONTROL_POINTS = 40
+
+
+def write_tracks(directory, rng):
+    for i in range(N_TRACKS):
+        x, y, heading = 0.0, 0.0, 0.0
+        points = []
+        for _ in range(CONTROL_POINTS):
+            points.append([round(x, 2), round(y, 2)])
+            heading += rng.uniform(-0.6, 0.6)
+            x += 100 * rng.uniform(0.6, 1.4) * math.cos(heading)
+            y += 100 * rng.uniform(0.6, 1.4) * math.sin(heading)
+        if i % 2:
+            with open(os.path.join(directory, f"track_{i:03d}.csv"), "w") as f:
+                f.write("# width: 120\nx,y\n" + "".join(f"{px},{py}\n" for px, py in points))
+        else:
+            with open(os.path.join(directory, f"track_{i:03d}.json"), "w") as f:
+                json.dump({"width": 120, "points": points}, f)
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - t0
+
+
+def main():
+    tmp = tempfile.mkdtemp()
+    try:
+        track_dir = os.path.join(tmp, "tracks")
+        cache_dir = os.path.join(tmp, "cache")
+        os.makedirs(track_dir)
+        write_tracks(track_dir, random.Random(0))
+
+        built, no_cache = timed(lambda: load_tracks([track_dir], cache_dir=None))
+        _, cold = timed(lambda: load_tracks([track_dir], cache_dir=cache_dir))
+        cached, warm = timed(lambda: load_tracks([track_dir], cache_dir=cache_dir))
+        assert cached == built, "cached geometry differs from the rebuilt geometry"
+        _, first_env = timed(lambda: CarEnv(cached[0]))
+
+        points = sum(len(t.centerline) for t in built)
+        print(f"{N_TRACKS} tracks, {points / N_TRACKS:.0f} centerline points each")
+        for name, seconds in [("parse + build, no cache", no_cache), ("empty cache (build + write)", cold),
+                              ("warm cache", warm)]:
+            print(f"{name:<28} {seconds * 1000:>8.1f} ms  ({seconds / N_TRACKS * 1e6:>6.0f} us/track)")
+        print(f"{'CarEnv on the first track':<28} {first_env * 1000:>8.1f} ms")
+        print(f"cache speedup: {no_cache / warm:.1f}x")
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
-import pygame
 import math
+from track import point_in_polygon
 
 
 
@@ -15,6 +15,8 @@ class Car:
         self.acceleration = 0.2
         self.turn_speed = 5 # degrees per frame
         self.font = font
+        # debug text surfaces per screen position, re-rendered only when the text changes
+        self.text_cache = {}
 
     def _get_corners(self, x=None, y=None, heading=None):
         """Return the four corner points (world coords) of the car."""
@@ -46,28 +48,23 @@ class Car:
 
     def _point_in_polygon(self, px, py, poly):
         """Ray casting point-in-polygon. poly is a list of (x,y)."""
-        inside = False
-        n = len(poly)
-        j = n - 1
-        for i in range(n):
-            xi, yi = poly[i]
-            xj, yj = poly[j]
-            intersect = ((yi > py) != (yj > py)) and \
-                        (px < (xj - xi) * (py - yi) / (yj - yi + 1e-12) + xi)
-            if intersect:
-                inside = not inside
-            j = i
-        return inside
-
-
-    def _all_corners_inside_polygon(self, poly):
+        return point_in_polygon(px, py, poly)
+
+
+    def _all_corners_inside_polygon(self, poly, road_mask=None):
         corners = self._get_corners()
         for cx, cy in corners:
-            if not self._point_in_polygon(cx, cy, poly):
+            if road_mask is not None:
+                # O(1) occupancy lookup, exact ray cast only near the road edges
+                if not road_mask.contains(cx, cy):
+                    return False
+            elif not self._point_in_polygon(cx, cy, poly):
                 return False
         return True
 
     def update(self, keys, road_polygon):
+        import pygame
+
         # store previous pose for potential revert
         self.prev_x = self.x
         self.prev_y = self.y
@@ -110,7 +107,11 @@ class Car:
             self.speed *= -0.2
 
 
-    def rl_update(self, action, road_polygon):
+    def rl_update(self, action, road_polygon, road_mask=None, dt=1.0):
+        """
+        Apply one action for dt frames (the per-frame turn, acceleration,
+        friction and movement are scaled by it; 1.0 is one nominal step).
+        """
         # store previous pose for potential revert
         self.prev_x = self.x
         self.prev_y = self.y
@@ -124,16 +125,16 @@ class Car:
         # 6: Right, 7: Right+Accel, 8: Right+Brake
 
         if action in [3,4,5]:
-            self.heading -= self.turn_speed
+            self.heading -= self.turn_speed * dt
         elif action in [6,7,8]:
-            self.heading += self.turn_speed
+            self.heading += self.turn_speed * dt
         
         if action in [1,4,7]:
-            self.speed += self.acceleration
+            self.speed += self.acceleration * dt
         elif action in [2,5,8]:
-            self.speed -= self.acceleration
+            self.speed -= self.acceleration * dt
         else:
-            self.speed *= 0.95
+            self.speed *= 0.95 ** dt
 
         # clamp speed
         if self.speed > self.max_speed:
@@ -143,14 +144,14 @@ class Car:
 
         # tentative move
         rad = math.radians(self.heading)
-        dx = self.speed * math.cos(rad)
-        dy = self.speed * math.sin(rad)
+        dx = self.speed * math.cos(rad) * dt
+        dy = self.speed * math.sin(rad) * dt
 
         self.x += dx
         self.y += dy
 
         # collision check: if any corner outside road polygon, revert and damp speed
-        if not self._all_corners_inside_polygon(road_polygon):
+        if not self._all_corners_inside_polygon(road_polygon, road_mask):
             # simple collision response: revert position and reduce speed
             self.x = self.prev_x
             self.y = self.prev_y
@@ -162,6 +163,8 @@ class Car:
 
 
     def draw_car(self, screen, x, y, heading, width, height, color=(0,0,255), debug = True):
+        import pygame
+
         # define car corners relative to center
 
         ''' (-w/2, -h/2)      (w/2, -h/2)
@@ -188,33 +191,36 @@ class Car:
             ry = px*math.sin(rad) + py*math.cos(rad)+y
             rotated_points.append((rx,ry))
     
-        pygame.draw.polygon(screen, color, rotated_points)
+        dirty = [pygame.draw.polygon(screen, color, rotated_points)]
 
         if debug:
             # draw center
-            pygame.draw.circle(screen, (0,255,0), (int(x), int(y)), 5)
+            dirty.append(pygame.draw.circle(screen, (0,255,0), (int(x), int(y)), 5))
 
             # draw vectors to all corners
             for rx, ry in rotated_points:
-                pygame.draw.line(screen, (255,0,0), (x, y), (rx, ry), 2)
+                dirty.append(pygame.draw.line(screen, (255,0,0), (x, y), (rx, ry), 2))
 
             # highlight first corner projections
             rx, ry = rotated_points[0]
-            pygame.draw.line(screen, (0,255,255), (x, y), (rx, y), 2)  # cosθ horizontal
-            pygame.draw.line(screen, (255,255,0), (rx, y), (rx, ry), 2)  # sinθ vertical
+            dirty.append(pygame.draw.line(screen, (0,255,255), (x, y), (rx, y), 2))  # cosθ horizontal
+            dirty.append(pygame.draw.line(screen, (255,255,0), (rx, y), (rx, ry), 2))  # sinθ vertical
 
             # show text
-            self.draw_text(screen, f"Heading: {heading:.1f}°", 10, 10)
-            self.draw_text(screen, f"cosθ: {cos_theta:.3f}", 10, 30)
-            self.draw_text(screen, f"sinθ: {sin_theta:.3f}", 10, 50)
-            self.draw_text(screen, f"Corner0: ({rx:.1f}, {ry:.1f})", 10, 70)
+            dirty.append(self.draw_text(screen, f"Heading: {heading:.1f}°", 10, 10))
+            dirty.append(self.draw_text(screen, f"cosθ: {cos_theta:.3f}", 10, 30))
+            dirty.append(self.draw_text(screen, f"sinθ: {sin_theta:.3f}", 10, 50))
+            dirty.append(self.draw_text(screen, f"Corner0: ({rx:.1f}, {ry:.1f})", 10, 70))
+
+        # bounding rects of everything drawn, for dirty-rect display updates
+        return dirty
 
-        
-        
     def draw(self, screen):
-        self.draw_car(screen, self.x, self.y, self.heading, self.width, self.height, debug=True)
+        return self.draw_car(screen, self.x, self.y, self.heading, self.width, self.height, debug=True)
 
 
     def draw_text(self, screen, text, x, y, color=(255,255,255)):
-        img = self.font.render(text, True, color)
-        screen.blit(img, (x, y))
\ No newline at end of file
+        cached = self.text_cache.get((x, y))
+        if cached is None or cached[0] != text:
+            cached = self.text_cache[(x, y)] = (text, self.font.render(text, True, color))
+        return screen.blit(cached[1], (x, y))
\ No newline at end of file
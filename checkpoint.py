@@ -0,0 +1,138 @@
+import json
+import queue
+import struct
+import threading
+
+import numpy as np
+
+from env import SIM_DT
+from fileio import align, atomic_write
+from qtable import N_STATES, N_ACTIONS
+
+
+# -----------------------------
+# FILE FORMAT
+# -----------------------------
+# 8-byte magic, uint32 version, uint32 header length, JSON header, zero padding
+# up to a 64-byte boundary, then the raw float64 Q-table followed by the raw
+# float64 lap times. The arrays sit at fixed offsets so they can be read
+# straight into numpy without parsing.
+MAGIC = b"RLQCKPT\0"
+VERSION = 1
+
+# The physics a Q-table was trained under (see CarEnv): a policy only means
+# something with the same tick length, substeps and action repeat. Checkpoints
+# from before these were saved were all trained with the defaults.
+DEFAULT_PHYSICS = {"sim_dt": SIM_DT, "substeps": 1, "action_repeat": 1}
+
+
+def save_checkpoint(path, q_values, epsilon, tries, lap_times, best_lap, physics=None):
+    """Atomically write a checkpoint; physics is a dict like DEFAULT_PHYSICS (CarEnv.physics())."""
+    q_values = np.ascontiguousarray(q_values, dtype=np.float64)
+    lap_times = np.ascontiguousarray(lap_times, dtype=np.float64)
+
+    header = {
+        "epsilon": epsilon,
+        "tries": tries,
+        "best_lap": best_lap,
+        "q_shape": list(q_values.shape),
+        "n_laps": len(lap_times),
+        "physics": dict(DEFAULT_PHYSICS if physics is None else physics),
+    }
+    # offsets depend on the header length, which depends on the offsets' digits,
+    # so size the header with placeholders first
+    header["q_offset"] = header["laps_offset"] = 0
+    prefix = len(MAGIC) + 8 + len(json.dumps(header).encode()) + 32
+    header["q_offset"] = align(prefix)
+    header["laps_offset"] = header["q_offset"] + q_values.nbytes
+    header_bytes = json.dumps(header).encode()
+
+    with atomic_write(path, fsync=True) as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<II", VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b"\0" * (header["q_offset"] - f.tell()))
+        f.write(q_values.tobytes())
+        f.write(lap_times.tobytes())
+
+
+def load_checkpoint(path):
+    """
+    Read a checkpoint into memory. Nothing stays mapped or open afterwards, so
+    the next save_checkpoint can replace the file (which Windows refuses while
+    a mapping of it is alive).
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a Q-table checkpoint")
+        try:
+            version, header_len = struct.unpack("<II", f.read(8))
+            if version != VERSION:
+                raise ValueError(f"{path}: unsupported checkpoint version {version}")
+            header = json.loads(f.read(header_len))
+
+            shape = tuple(header["q_shape"])
+            if shape != (N_STATES, N_ACTIONS):
+                raise ValueError(f"{path}: Q-table is {shape}, this version uses {(N_STATES, N_ACTIONS)}")
+            f.seek(header["q_offset"])
+            q = np.fromfile(f, dtype=np.float64, count=N_STATES * N_ACTIONS)
+            f.seek(header["laps_offset"])
+            lap_times = np.fromfile(f, dtype=np.float64, count=header["n_laps"])
+            checkpoint = {
+                "q": q,
+                "epsilon": float(header["epsilon"]),
+                "tries": int(header["tries"]),
+                "lap_times": lap_times.tolist(),
+                "best_lap": None if header["best_lap"] is None else float(header["best_lap"]),
+                "physics": {**DEFAULT_PHYSICS, **header.get("physics", {})},
+            }
+        except (struct.error, KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"{path}: damaged checkpoint header ({e!r})")
+    if q.size != N_STATES * N_ACTIONS or len(lap_times) != header["n_laps"]:
+        raise ValueError(f"{path} is truncated")
+    checkpoint["q"] = q.reshape(shape)
+    return checkpoint
+
+
+# -----------------------------
+# BACKGROUND WRITER
+# -----------------------------
+class CheckpointWriter:
+    """
+    Saves checkpoints on a background thread so the training loop never waits
+    on disk. submit() only copies the (tiny) Q-table and queues it; if a save
+    is still pending, the older snapshot is dropped in favour of the newer one.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._pending = queue.Queue(maxsize=1)
+        self._thread = threading.Thread(target=self._run, name="checkpoint-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, q_values, epsilon, tries, lap_times, best_lap, physics=None):
+        snapshot = (np.array(q_values, copy=True), epsilon, tries, list(lap_times), best_lap, physics)
+        while True:
+            try:
+                self._pending.put_nowait(snapshot)
+                return
+            except queue.Full:
+                try:
+                    self._pending.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def _run(self):
+        while True:
+            snapshot = self._pending.get()
+            if snapshot is None:
+                return
+            try:
+                save_checkpoint(self.path, *snapshot)
+            except OSError as e:
+                print(f"Checkpoint save to {self.path} failed: {e}")
+
+    def close(self):
+        """Write whatever is still queued and stop the thread."""
+        self._pending.put(None)
+        self._thread.join()
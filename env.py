@@ -0,0 +1,569 @@
+import math
+from collections import namedtuple
+
+from car import Car
+from track import build_track, distance_point_to_segment, CenterlineIndex, RoadMask
+from profiling import NullTimer
+from feature_field import load_feature_field
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+WIDTH, HEIGHT = 1000, 700
+ROAD_WIDTH = 120
+MARGIN = 80
+
+# Nominal length of one simulation step (the windowed loop runs at 60 steps/s).
+# Lap times are counted in steps and converted with this, never measured on the
+# wall clock, so headless and windowed runs report comparable numbers. The
+# car's per-step constants (turn rate, acceleration, friction) are per SIM_DT;
+# a CarEnv with another sim_dt scales them.
+SIM_DT = 1 / 60
+
+FINISH_RADIUS = 40    # the lap is done once the car is this close to the finish point
+FINISH_BONUS = 100    # terminal reward for finishing a lap
+
+# Why an episode ended. Besides finishing, CarEnv can cut an episode short
+# (each check is off unless its limit is set):
+#   "timeout"      the episode reached max_episode_steps ticks
+#   "no_progress"  no_progress_steps ticks without getting further along the
+#                  road towards the finish than ever before in the episode
+#   "crashed"      max_collisions collisions since the car last got further
+# The last two are failures: terminal, with END_PENALTY taken off the reward
+# of the last step. A timeout only stops the simulation; the learner should
+# still bootstrap from the last state, as the car wasn't doing anything wrong.
+END_REASONS = ("finished", "timeout", "no_progress", "crashed")
+FAILURE_ENDS = ("no_progress", "crashed")
+END_PENALTY = 100
+
+# Shaped per-step reward terms, see CarEnv.step()
+RewardWeights = namedtuple("RewardWeights", [
+    "progress",    # per pixel of progress towards the finish
+    "backwards",   # penalty for a step that moved away from the finish
+    "speed",       # bonus for moving forward, penalty otherwise
+    "heading",     # times |heading error| / 90 degrees
+    "distance",    # times distance to centerline / half the road width (capped at 1)
+    "collision",   # penalty for hitting the edge of the road
+])
+DEFAULT_REWARD_WEIGHTS = RewardWeights(progress=5.0, backwards=1.0, speed=0.1, heading=1.0, distance=1.0,
+                                       collision=10.0)
+
+# -----------------------------
+# RAW TRACK (LOGICAL SPACE)
+# -----------------------------
+raw_centerline = [
+    (0, 0),
+    (0, 200),
+    (120, 340),
+    (320, 360),
+    (520, 330),
+    (680, 200),
+    (680, 0),
+]
+
+# -----------------------------
+# UTILITIES
+# -----------------------------
+def smooth_path(points, samples=20):
+    smooth = []
+    for i in range(len(points) - 1):
+        x1, y1 = points[i]
+        x2, y2 = points[i + 1]
+        for t in range(samples):
+            a = t / samples
+            smooth.append((
+                x1 * (1 - a) + x2 * a,
+                y1 * (1 - a) + y2 * a
+            ))
+    smooth.append(points[-1])
+    return smooth
+
+
+def fit_centerline_to_screen(points, w, h, margin):
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+
+    min_x, max_x = min(xs), max(xs)
+    min_y, max_y = min(ys), max(ys)
+
+    track_w = max_x - min_x
+    track_h = max_y - min_y
+
+    scale = min(
+        (w - 2 * margin) / track_w,
+        (h - 2 * margin) / track_h
+    )
+
+    cx = (min_x + max_x) / 2
+    cy = (min_y + max_y) / 2
+
+    screen_cx = w / 2
+    screen_cy = h / 2
+
+    fitted = []
+    for x, y in points:
+        x = (x - cx) * scale + screen_cx
+        y = (y - cy) * scale + screen_cy
+        fitted.append((x, y))
+
+    return fitted
+
+def normalize_angle_deg(angle):
+    """ Normalize angle to [-180, 180] degrees. """
+    while angle>180:
+        angle-=360
+    while angle<-180:
+        angle+=360
+    return angle
+
+def compute_heading_error(car_x, car_y, car_heading_deg, centerline):
+    """
+    Returns heading error in degress between car heading
+    and direction of the closest centerline segment
+    """
+
+    min_dist = float("inf")
+    best_p1 = None
+    best_p2 = None
+
+    # find closest centerline segment (via midpoint)
+    for i in range(len(centerline)-1):
+        x1,y1 = centerline[i]
+        x2,y2 = centerline[i+1]
+
+        mx = (x1+x2)/2
+        my = (y1+y2)/2
+
+        dx = car_x-mx
+        dy = car_y-my
+
+        dist = math.hypot(dx,dy)
+
+        if dist<min_dist:
+            min_dist = dist
+            best_p1 = (x1,y1)
+            best_p2 = (x2,y2)
+
+    # Direction of the road segment
+    dx = best_p2[0]-best_p1[0]
+    dy = best_p2[1]-best_p1[1]
+
+    road_angle_rad = math.atan2(dy,dx)
+    road_angle_rad = math.degrees(road_angle_rad)
+
+    # Heading error
+    heading_error = car_heading_deg - road_angle_rad
+    heading_error = normalize_angle_deg(heading_error)
+
+    return heading_error
+
+def compute_distance_to_centerline(car_x, car_y, centerline):
+    min_dist = float("inf")
+    for i in range(len(centerline)-1):
+        x1,y1 = centerline[i]
+        x2,y2 = centerline[i+1]
+
+        dist = distance_point_to_segment(car_x, car_y, x1,y1, x2,y2)
+        if(dist<min_dist):
+            min_dist = dist
+
+    return min_dist
+
+def compute_future_heading_error(car_x, car_y, car_heading, centerline, lookahead=10):
+    min_idx = 0
+    min_dist = float("inf")
+    for i in range(len(centerline)):
+        d = math.hypot(car_x-centerline[i][0], car_y-centerline[i][1])
+        if d < min_dist:
+            min_dist = d
+            min_idx = i
+
+    i2 = min(min_idx + lookahead, len(centerline)-1)
+    dx = centerline[i2][0] - centerline[min_idx][0]
+    dy = centerline[i2][1] - centerline[min_idx][1]
+    road_angle = math.degrees(math.atan2(dy, dx))
+    return normalize_angle_deg(car_heading - road_angle)
+
+
+def compute_features(car_x, car_y, car_heading, index):
+    """
+    Heading error, distance to centerline and future heading error from one
+    CenterlineIndex query. Same values as the three compute_* functions above.
+    """
+    _, distance, road_angle, lookahead_angle = index.query(car_x, car_y)
+    heading_error = normalize_angle_deg(car_heading - road_angle)
+    future_heading_error = normalize_angle_deg(car_heading - lookahead_angle)
+    return heading_error, distance, future_heading_error
+
+
+def discretize_state(speed, heading_error, distance, future_heading_error):
+    # Speed
+    if abs(speed) < 0.5:
+        s = 0      # STOPPED
+    elif abs(speed) < 2.5:
+        s = 1      # SLOW
+    else:
+        s = 2      # FAST
+
+    # Heading (current)
+    if heading_error < -20:
+        h = 0      # HARD_LEFT
+    elif heading_error < -5:
+        h = 1      # LEFT
+    elif heading_error < 5:
+        h = 2      # STRAIGHT
+    elif heading_error < 20:
+        h = 3      # RIGHT
+    else:
+        h = 4      # HARD_RIGHT
+
+    # Distance
+    if distance < 10:
+        d = 0      # CENTER
+    elif distance < 30:
+        d = 1      # OFF
+    else:
+        d = 2      # FAR
+
+    # Future heading error (lookahead) discretized into 3 bins
+    # Negative => road turns left ahead; positive => road turns right ahead
+    if future_heading_error < -10:
+        fh = 0    # FUTURE_LEFT
+    elif future_heading_error > 10:
+        fh = 2    # FUTURE_RIGHT
+    else:
+        fh = 1    # FUTURE_STRAIGHT
+
+    # Always return a tuple (so Q dict keys are consistent)
+    return (s, h, d, fh)
+
+
+
+
+
+# -----------------------------
+# BUILD FINAL CENTERLINE
+# -----------------------------
+centerline = smooth_path(raw_centerline, samples=20)
+centerline = fit_centerline_to_screen(centerline, WIDTH, HEIGHT, MARGIN)
+track = build_track(centerline, ROAD_WIDTH)
+default_track = track   # what CarEnv drives on unless given another track
+
+# -----------------------------
+# ENVIRONMENT
+# -----------------------------
+# One record per episode (lap attempt, finished or cut short), all in simulation time.
+EpisodeStats = namedtuple("EpisodeStats", [
+    "episode",        # 1-based episode number
+    "steps",          # simulation steps (physics ticks) taken
+    "lap_time",       # steps * sim_dt, in seconds
+    "total_reward",   # sum of per-step rewards plus the finishing bonus
+    "collisions",     # steps on which the car hit the edge of the road
+    "clean",          # True if the lap had no collisions
+    "end",            # why it ended, one of END_REASONS
+])
+
+
+class CarEnv:
+    """
+    One car on one track behind a reset() / step(action) API.
+
+    step(action) returns (state, reward, done, info): the discretize_state
+    tuple, the shaped reward, whether the episode is over, and a dict with
+    "collided", "lap_finished", "ticks", "end" (None, or why the episode
+    ended: see END_REASONS), "ranges" with lidar_rays set (the Lidar's ray
+    lengths, see lidar.py) and, on the last step of an episode, "episode"
+    (its EpisodeStats). The finishing bonus is not part of the step reward;
+    it is FINISH_BONUS and up to the learner to apply. The failure penalty
+    is part of it.
+
+    Time: every physics tick advances sim_dt seconds, integrated in
+    `substeps` equal parts (each with its own collision check). One step()
+    holds the action for `action_repeat` ticks, or until the lap is finished.
+    Progress, speed and collision rewards are summed over the ticks; the
+    features, and the heading and distance terms that need them, are only
+    computed once, after the last tick, and count for every tick. With the
+    defaults (SIM_DT, 1, 1) a step is exactly one tick as before. Episode
+    steps and lap times count ticks.
+
+    Nothing here touches pygame; it is only imported if render() is called.
+    """
+
+    def __init__(self, track=None, use_road_mask=True, use_feature_field=False, reward_weights=None,
+                 sim_dt=SIM_DT, substeps=1, action_repeat=1, max_episode_steps=0, no_progress_steps=0,
+                 max_collisions=0, end_penalty=END_PENALTY, lidar_rays=0, lidar_fov=180.0, lidar_range=200.0):
+        if track is None:
+            track = default_track
+        if substeps < 1 or action_repeat < 1:
+            raise ValueError("substeps and action_repeat must be at least 1")
+        self.sim_dt = sim_dt
+        self.substeps = substeps
+        self.action_repeat = action_repeat
+        # length of one physics substep in the car's nominal steps
+        self.frame_dt = sim_dt / substeps / SIM_DT
+        self.use_road_mask = use_road_mask
+        self.use_feature_field = use_feature_field
+        self.reward_weights = DEFAULT_REWARD_WEIGHTS if reward_weights is None else reward_weights
+        # early episode ends, 0 = off (see END_REASONS)
+        self.max_episode_steps = int(max_episode_steps)
+        self.no_progress_steps = int(no_progress_steps)
+        self.max_collisions = int(max_collisions)
+        self.end_penalty = end_penalty
+        self.early_ends = bool(self.max_episode_steps or self.no_progress_steps or self.max_collisions)
+        # optional range sensor (see lidar.py); its readings are in self.ranges and
+        # info["ranges"], alongside the discrete state rather than part of it
+        self.lidar_rays = lidar_rays
+        self.lidar_fov = lidar_fov
+        self.lidar_range = lidar_range
+        self.ranges = None
+
+        # optional TrajectoryRecorder, see start_recording()
+        self.recorder = None
+        # per-track collision mask and feature index, built on a track's first use
+        self.geometry = {}
+        self.set_track(track)
+        spawn_x, spawn_y, _ = self.spawn_pose()
+        self.car = Car(spawn_x, spawn_y, font=None)
+
+        self.episode = 0
+        self.renderer = None
+        # per-phase timings; swapped for a PhaseTimer when timing is turned on
+        self.timer = NullTimer()
+
+    def set_track(self, track):
+        """
+        Drive on `track` from the next reset() on. Its collision mask and
+        feature index are built the first time it is used and kept, so
+        rotating through a set of tracks only pays for each one once.
+        """
+        geometry = self.geometry.get(id(track))
+        if geometry is None:
+            centerline = track.centerline
+            # Optional occupancy grid for collision checks (same result as the polygon ray cast)
+            road_mask = RoadMask(track.polygon) if self.use_road_mask else None
+            # Exact centerline queries, or the precomputed (cached, approximate) feature field
+            if self.use_feature_field:
+                index = load_feature_field(centerline, margin=track.width)
+            else:
+                index = CenterlineIndex(centerline, margin=track.width)
+            lidar = None
+            if self.lidar_rays:
+                from lidar import Lidar
+                lidar = Lidar(track, self.lidar_rays, self.lidar_fov, self.lidar_range)
+            # the track is kept alongside so its id() stays taken
+            geometry = self.geometry[id(track)] = (track, road_mask, index, lidar)
+        self.track, self.road_mask, self.index, self.lidar = geometry
+        if self.recorder is not None:
+            self.recorder.set_track(self.track)
+        # Define the goal
+        self.finish_line_point = track.centerline[track.finish_index]
+        # what reset() restores, filled in by the first reset() on this track
+        self.spawn = None
+
+    def physics(self):
+        """The time settings a policy trained here depends on, as saved in checkpoints."""
+        return {"sim_dt": self.sim_dt, "substeps": self.substeps, "action_repeat": self.action_repeat}
+
+    def spawn_pose(self):
+        """
+        (x, y, heading) the car starts every episode from: 40 px down the road
+        from the track's start point, facing along it.
+        """
+        centerline = self.track.centerline
+        i = min(self.track.start_index, len(centerline) - 2)
+        x0, y0 = centerline[i]
+        dx0 = centerline[i + 1][0] - x0
+        dy0 = centerline[i + 1][1] - y0
+        length = math.hypot(dx0, dy0) or 1.0
+        return x0 + 40 * dx0 / length, y0 + 40 * dy0 / length, math.degrees(math.atan2(dy0, dx0))
+
+    def observe(self):
+        """Compute the features for the car's current pose and return the discrete state."""
+        car = self.car
+        # compute_features(), keeping the segment for the progress check
+        self.segment, self.distance_to_center, road_angle, lookahead_angle = self.index.query(car.x, car.y)
+        self.heading_error = normalize_angle_deg(car.heading - road_angle)
+        future_heading_error = normalize_angle_deg(car.heading - lookahead_angle)
+        if self.lidar is not None:
+            self.ranges = self.lidar.cast(car.x, car.y, car.heading)
+        return discretize_state(car.speed, self.heading_error, self.distance_to_center, future_heading_error)
+
+    def road_left(self):
+        """Distance along the road from the car's segment to the finish."""
+        arc_length = self.track.arc_length
+        return arc_length[self.track.finish_index] - arc_length[self.segment]
+
+    def current_lap_time(self):
+        """Simulation time of the lap in progress, in seconds."""
+        return self.episode_steps * self.sim_dt
+
+    def reset(self):
+        """
+        Put the car back on the spawn pose, start a new episode and return its
+        state. The pose, its features and state are the same every time, so
+        they are computed once per track and then just copied back.
+        """
+        car = self.car
+        spawn = self.spawn
+        if spawn is None:
+            finish_line_point = self.finish_line_point
+            # Reset Physics: place the car on the spawn pose, facing along the track
+            car.x, car.y, car.heading = self.spawn_pose()
+            car.speed = 0.0
+            state = self.observe()
+            spawn = self.spawn = (
+                car.x, car.y, car.heading, state, self.segment, self.heading_error, self.distance_to_center,
+                math.hypot(car.x - finish_line_point[0], car.y - finish_line_point[1]), self.ranges,
+            )
+        (car.x, car.y, car.heading, self.state, self.segment, self.heading_error, self.distance_to_center,
+         self.prev_dist_to_finish, self.ranges) = spawn
+        car.speed = 0.0
+        car.collided = False
+
+        # Reset the lap counters
+        self.episode += 1
+        self.episode_steps = 0
+        self.episode_reward = 0.0
+        self.episode_collisions = 0
+        self.current_lap_clean = True
+
+        # Reset the early-end trackers
+        self.best_road_left = self.road_left()
+        self.progress_step = 0
+        self.collisions_since_progress = 0
+        return self.state
+
+    def step(self, action):
+        car = self.car
+        finish_line_point = self.finish_line_point
+        timer = self.timer
+        w = self.reward_weights
+        road_polygon = self.track.polygon
+        road_mask = self.road_mask
+        frame_dt = self.frame_dt
+
+        reward = 0.0
+        collisions = 0
+        ticks = 0
+        for _ in range(self.action_repeat):
+            collided = False
+            for _ in range(self.substeps):
+                car.rl_update(action=action, road_polygon=road_polygon, road_mask=road_mask, dt=frame_dt)   # <-- pass road polygon for collision checks
+                collided = collided or car.collided
+
+            curr_dist_to_finish = math.hypot(car.x - finish_line_point[0], car.y - finish_line_point[1])
+            progress = self.prev_dist_to_finish - curr_dist_to_finish
+
+            tick_reward = 0.0
+            tick_reward += max(progress, 0) * w.progress
+
+            if progress < 0:
+                tick_reward -= w.backwards
+
+            if car.speed>0:
+                tick_reward+=w.speed
+            else:
+                tick_reward-=w.speed
+
+            reward += tick_reward
+            collisions += collided
+            self.prev_dist_to_finish = curr_dist_to_finish
+            ticks += 1
+            if curr_dist_to_finish < FINISH_RADIUS:
+                break
+        timer.mark("car.rl_update")
+
+        state = self.observe()
+        timer.mark("features")
+
+        reward -= w.heading * abs(self.heading_error) / 90.0 * ticks
+        reward -= w.distance * min(self.distance_to_center / (self.track.width/2), 1.0) * ticks
+        if collisions:
+            reward-=w.collision * collisions
+            self.current_lap_clean = False
+            self.episode_collisions += collisions
+
+        self.episode_steps += ticks
+        self.episode_reward += reward
+        self.state = state
+
+        lap_finished = curr_dist_to_finish < FINISH_RADIUS
+        if lap_finished:
+            end = "finished"
+        elif self.early_ends:
+            end = self.check_early_end(collisions)
+        else:
+            end = None
+        if end in FAILURE_ENDS:
+            reward -= self.end_penalty
+            self.episode_reward -= self.end_penalty
+        if self.recorder is not None:
+            # after the end penalty, so the recording holds the reward step() returns
+            self.recorder.record(self.episode, self.episode_steps, car.x, car.y, car.heading, car.speed,
+                                 action, reward, collisions)
+        done = end is not None
+        info = {"collided": collisions > 0, "lap_finished": lap_finished, "ticks": ticks, "end": end}
+        if self.lidar is not None:
+            info["ranges"] = self.ranges
+        if done:
+            if lap_finished:
+                self.episode_reward += FINISH_BONUS
+            info["episode"] = EpisodeStats(
+                episode=self.episode,
+                steps=self.episode_steps,
+                lap_time=self.current_lap_time(),
+                total_reward=self.episode_reward,
+                collisions=self.episode_collisions,
+                clean=self.current_lap_clean,
+                end=end,
+            )
+        timer.mark("reward")
+
+        return state, reward, done, info
+
+    def check_early_end(self, collisions):
+        """After a step that didn't finish the lap: the reason to end the episode now, or None."""
+        road_left = self.road_left()
+        if road_left < self.best_road_left:
+            self.best_road_left = road_left
+            self.progress_step = self.episode_steps
+            self.collisions_since_progress = 0
+        else:
+            self.collisions_since_progress += collisions
+
+        if self.max_collisions and self.collisions_since_progress >= self.max_collisions:
+            return "crashed"
+        if self.no_progress_steps and self.episode_steps - self.progress_step >= self.no_progress_steps:
+            return "no_progress"
+        if self.max_episode_steps and self.episode_steps >= self.max_episode_steps:
+            return "timeout"
+        return None
+
+    def render(self):
+        """Draw the current frame, opening the window (and importing pygame) on first use."""
+        if self.renderer is None:
+            from render import Renderer
+            self.renderer = Renderer(self.track)
+            self.car.font = self.renderer.font
+        self.renderer.draw(self, tries=self.episode - 1, timer=self.timer)
+        self.renderer.pump_events()
+
+    def start_recording(self, path, tracks=None):
+        """
+        Record every step from now on to a trajectory file (see trajectory.py).
+        tracks lists every track set_track() may move to (default: only the current one).
+        """
+        from trajectory import TrajectoryRecorder
+        tracks = list(tracks or [])
+        if not any(t is self.track for t in tracks):
+            tracks.insert(0, self.track)
+        self.recorder = TrajectoryRecorder(path, tracks, self.sim_dt)
+        self.recorder.set_track(self.track)
+
+    def close(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        if self.renderer is not None:
+            self.renderer.close()
+            self.renderer = None
@@ -0,0 +1,265 @@
+import os
+import sys
+import csv
+import math
+import time
+import argparse
+import multiprocessing
+
+import numpy as np
+
+from env import CarEnv, FINISH_RADIUS, SIM_DT, track as default_track
+from batch import BatchCars
+from qtable import QTable, encode_states
+from checkpoint import load_checkpoint
+
+
+# -----------------------------
+# START POSES
+# -----------------------------
+def sample_starts(env, n, lateral=20.0, heading=15.0, seed=0):
+    """
+    n start poses around the env's spawn pose, shifted sideways by up to
+    `lateral` px and turned by up to `heading` degrees (both uniform).
+    Poses with a corner off the road are drawn again.
+    Returns arrays x, y, heading.
+    """
+    rng = np.random.default_rng(seed)
+    x0, y0, h0 = env.spawn_pose()
+    nx = -math.sin(math.radians(h0))
+    ny = math.cos(math.radians(h0))
+    probe = BatchCars(1, env.track, env.index, road_mask=env.road_mask, x=x0, y=y0, heading=h0)
+
+    xs, ys, hs = [], [], []
+    found = 0
+    for _ in range(100):
+        m = n - found
+        offset = rng.uniform(-lateral, lateral, m)
+        x = x0 + offset * nx
+        y = y0 + offset * ny
+        h = h0 + rng.uniform(-heading, heading, m)
+        ok = probe.on_road(x, y, h)
+        xs.append(x[ok])
+        ys.append(y[ok])
+        hs.append(h[ok])
+        found += int(ok.sum())
+        if found >= n:
+            break
+    else:
+        raise ValueError(f"could not place {n} cars on the road; try a smaller lateral offset than {lateral}")
+    return np.concatenate(xs)[:n], np.concatenate(ys)[:n], np.concatenate(hs)[:n]
+
+
+# -----------------------------
+# GREEDY ROLLOUTS
+# -----------------------------
+def rollout(q, env, x, y, heading, max_steps=3000):
+    """
+    Drive one car per start pose with the greedy policy, all in lockstep on
+    a BatchCars with the env's physics (tick length, substeps and action
+    repeat, as in CarEnv.step), until each one reaches the finish or
+    max_steps ticks run out. As in training, a car that reaches the finish
+    part way through an action repeat stops there. Finished cars are dropped
+    from the batch as they arrive, and so are cars that end a decision
+    exactly where they started it (same pose and speed): the greedy action
+    from there is the same again, so they are stuck for good.
+
+    Returns per start the ticks taken to finish (0 if it never did), the
+    number of ticks with a collision (up to the decision a stuck car got
+    stuck on) and whether the car got stuck.
+    """
+    n = len(x)
+    batch = BatchCars(n, env.track, env.index, road_mask=env.road_mask, x=x, y=y, heading=heading,
+                      frame_dt=env.frame_dt, substeps=env.substeps)
+    fx, fy = env.finish_line_point
+    ids = np.arange(n)
+    lap_steps = np.zeros(n, dtype=np.int64)
+    collisions = np.zeros(n, dtype=np.int64)
+    stuck = np.zeros(n, dtype=bool)
+
+    ticks = 0
+    while ticks < max_steps and len(ids):
+        x, y, heading, speed = batch.x, batch.y, batch.heading, batch.speed
+        actions = q.best_actions(encode_states(batch.states))
+        for _ in range(env.action_repeat):
+            batch.tick(actions)
+            ticks += 1
+            collisions[ids] += batch.collided
+            done = np.hypot(batch.x - fx, batch.y - fy) < FINISH_RADIUS
+            if done.any():
+                lap_steps[ids[done]] = ticks
+                keep = ~done
+                batch.keep(keep)
+                ids = ids[keep]
+                actions, x, y, heading, speed = actions[keep], x[keep], y[keep], heading[keep], speed[keep]
+            if ticks == max_steps or len(ids) == 0:
+                break
+        batch.observe()
+        still = (batch.x == x) & (batch.y == y) & (batch.heading == heading) & (batch.speed == speed)
+        if still.any():
+            stuck[ids[still]] = True
+            batch.keep(~still)
+            ids = ids[~still]
+    return lap_steps, collisions, stuck
+
+
+# per-process state for pool workers, set up once by _init_worker
+_worker = {}
+
+
+def _init_worker(track, q_values, physics):
+    _worker["env"] = CarEnv(track, **physics)
+    _worker["q"] = QTable(q_values)
+
+
+def _run_chunk(task):
+    start, x, y, heading, max_steps = task
+    return (start,) + rollout(_worker["q"], _worker["env"], x, y, heading, max_steps)
+
+
+def evaluate(q_values, track=None, starts=10000, max_steps=3000, lateral=20.0, heading=15.0, seed=0,
+             workers=1, chunk=2048, physics=None):
+    """
+    Greedy-policy evaluation of a Q-table from `starts` perturbed start poses,
+    split into chunks of up to `chunk` cars (fewer if that leaves a worker
+    idle) over `workers` processes. physics are the CarEnv time settings the
+    table was trained with (a checkpoint's "physics"; default: CarEnv's).
+    Returns a dict of per-start arrays: x, y, heading, lap_steps (ticks, 0
+    where the lap was not finished), collisions and stuck, plus the sim_dt
+    to turn ticks into seconds.
+    """
+    if track is None:
+        track = default_track
+    physics = dict(physics or {})
+    env = CarEnv(track, **physics)
+    x, y, h = sample_starts(env, starts, lateral, heading, seed)
+    lap_steps = np.zeros(starts, dtype=np.int64)
+    collisions = np.zeros(starts, dtype=np.int64)
+    stuck = np.zeros(starts, dtype=bool)
+
+    chunk = max(min(chunk, -(-starts // max(workers, 1))), 1)
+    tasks = [(i, x[i:i + chunk], y[i:i + chunk], h[i:i + chunk], max_steps) for i in range(0, starts, chunk)]
+    if workers <= 1:
+        _init_worker(track, q_values, physics)
+        results = map(_run_chunk, tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(min(workers, len(tasks)), initializer=_init_worker,
+                                    initargs=(track, q_values, physics))
+        results = pool.imap_unordered(_run_chunk, tasks)
+    try:
+        for i, chunk_steps, chunk_collisions, chunk_stuck in results:
+            lap_steps[i:i + len(chunk_steps)] = chunk_steps
+            collisions[i:i + len(chunk_steps)] = chunk_collisions
+            stuck[i:i + len(chunk_steps)] = chunk_stuck
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    return {"x": x, "y": y, "heading": h, "lap_steps": lap_steps, "collisions": collisions, "stuck": stuck,
+            "sim_dt": env.sim_dt}
+
+
+# -----------------------------
+# REPORT
+# -----------------------------
+def summarize(results):
+    """Completion rate, lap time distribution (in steps) and collision counts."""
+    lap_steps = results["lap_steps"]
+    collisions = results["collisions"]
+    finished = lap_steps > 0
+    laps = lap_steps[finished]
+    summary = {
+        "starts": len(lap_steps),
+        "finished": int(finished.sum()),
+        "completion_rate": float(finished.mean()) if len(lap_steps) else 0.0,
+        "collisions_mean": float(collisions.mean()) if len(collisions) else 0.0,
+        "collisions_max": int(collisions.max()) if len(collisions) else 0,
+        "clean_laps": int((finished & (collisions == 0)).sum()),
+        "stuck": int(results["stuck"].sum()),
+        "sim_dt": results.get("sim_dt", SIM_DT),
+    }
+    if len(laps):
+        for name, q in [("min", 0), ("p10", 10), ("median", 50), ("p90", 90), ("max", 100)]:
+            summary[f"lap_steps_{name}"] = float(np.percentile(laps, q))
+        summary["lap_steps_mean"] = float(laps.mean())
+    return summary
+
+
+def print_summary(summary, histogram_bins=10, lap_steps=None):
+    n = summary["starts"]
+    print(f"finished   {summary['finished']:,} / {n:,} ({summary['completion_rate']:.1%}), "
+          f"{summary['clean_laps']:,} without a collision; {summary['stuck']:,} stuck for good, "
+          f"{n - summary['finished'] - summary['stuck']:,} out of steps")
+    if summary["finished"]:
+        cols = ["min", "p10", "median", "mean", "p90", "max"]
+        print("lap steps  " + "  ".join(f"{c} {summary[f'lap_steps_{c}']:.0f}" for c in cols))
+        print("lap time s " + "  ".join(f"{c} {summary[f'lap_steps_{c}'] * summary['sim_dt']:.2f}" for c in cols))
+    print(f"collisions mean {summary['collisions_mean']:.2f} per start, max {summary['collisions_max']}")
+
+    if lap_steps is not None and summary["finished"] and histogram_bins:
+        laps = lap_steps[lap_steps > 0]
+        counts, edges = np.histogram(laps, bins=histogram_bins)
+        scale = 40 / max(counts.max(), 1)
+        for count, lo, hi in zip(counts, edges[:-1], edges[1:]):
+            print(f"  {lo:>6.0f}-{hi:<6.0f} {count:>7,} {'#' * int(round(count * scale))}")
+
+
+def write_csv(results, path):
+    columns = ["x", "y", "heading", "lap_steps", "collisions", "stuck"]
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        writer.writerows(zip(*(results[c].tolist() for c in columns)))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Evaluate the greedy policy of a saved Q-table from many perturbed start poses")
+    parser.add_argument("checkpoint", nargs="?", default="checkpoint.rlq", help="Q-table checkpoint to evaluate")
+    parser.add_argument("--track", metavar="PATH", help="track file to evaluate on (default: the built-in track)")
+    parser.add_argument("--starts", type=int, default=10000, help="number of start poses")
+    parser.add_argument("--max-steps", type=int, default=3000,
+                        help="physics ticks a car gets to reach the finish before it counts as not finished")
+    parser.add_argument("--lateral", type=float, default=20.0,
+                        help="shift each start sideways by up to this many pixels")
+    parser.add_argument("--heading", type=float, default=15.0, help="turn each start by up to this many degrees")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the start poses")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("-o", "--output", metavar="CSV", help="also write one row per start to this CSV file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        checkpoint = load_checkpoint(args.checkpoint)
+    except (OSError, ValueError) as e:
+        sys.exit(f"could not load the checkpoint: {e}")
+    q_values = np.array(checkpoint["q"])
+    physics = checkpoint["physics"]
+    track = None
+    if args.track:
+        from tracks import load_track
+        try:
+            track = load_track(args.track)
+        except (OSError, ValueError) as e:
+            sys.exit(f"could not load the track: {e}")
+
+    t0 = time.perf_counter()
+    results = evaluate(q_values, track, starts=args.starts, max_steps=args.max_steps, lateral=args.lateral,
+                       heading=args.heading, seed=args.seed, workers=args.workers, physics=physics)
+    elapsed = time.perf_counter() - t0
+    print(f"{args.starts:,} greedy starts (sideways ±{args.lateral:g} px, heading ±{args.heading:g}°) "
+          f"in {elapsed:.1f}s on {max(args.workers, 1)} worker(s)")
+    print(f"physics from the checkpoint: tick {physics['sim_dt']:.4g}s, {physics['substeps']} substep(s), "
+          f"action repeat {physics['action_repeat']}")
+    print_summary(summarize(results), lap_steps=results["lap_steps"])
+    if args.output:
+        write_csv(results, args.output)
+        print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
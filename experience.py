@@ -0,0 +1,51 @@
+import numpy as np
+
+
+# -----------------------------
+# REPLAY BUFFER
+# -----------------------------
+class ReplayBuffer:
+    """
+    Fixed-size ring buffer of (state, action, reward, next_state, done)
+    transitions, one preallocated array per field. States are stored as
+    encoded Q-table rows (qtable.encode_state), so a sampled batch can go
+    straight into QTable.td_update(). Once full, the oldest transition is
+    overwritten.
+    """
+
+    def __init__(self, capacity=100000, seed=None):
+        self.capacity = capacity
+        self.states = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity, dtype=np.float64)
+        self.next_states = np.zeros(capacity, dtype=np.int64)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.size = 0
+        self.pos = 0
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, state, action, reward, next_state, done):
+        i = self.pos
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.next_states[i] = next_state
+        self.dones[i] = done
+        self.pos = (i + 1) % self.capacity
+        if self.size < self.capacity:
+            self.size += 1
+
+    def sample(self, n):
+        """n transitions drawn uniformly with replacement, as (states, actions, rewards, next_states, dones)."""
+        idx = self.rng.integers(0, self.size, size=n)
+        return self.states[idx], self.actions[idx], self.rewards[idx], self.next_states[idx], self.dones[idx]
+
+    def replay(self, q, n, alpha, gamma):
+        """Dyna-style planning: n Q-learning updates on remembered transitions, as one batch."""
+        if self.size == 0 or n <= 0:
+            return
+        states, actions, rewards, next_states, dones = self.sample(n)
+        q.td_update_merged(states, actions, rewards, next_states, alpha, gamma, dones)
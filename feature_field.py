@@ -0,0 +1,217 @@
+import os
+import math
+import json
+import hashlib
+from array import array
+
+import numpy as np
+
+from track import CenterlineIndex
+from fileio import atomic_write
+
+# bump when the arrays stored in the cache change meaning
+FIELD_VERSION = 2
+
+
+def field_key(centerline, lookahead, cell_size, margin):
+    """Hash of everything a FeatureField depends on; names its cache file."""
+    h = hashlib.sha1()
+    h.update(json.dumps([FIELD_VERSION, lookahead, cell_size, margin]).encode())
+    h.update(np.array(centerline, dtype=np.float64).tobytes())
+    return h.hexdigest()[:16]
+
+
+# -----------------------------
+# PRECOMPUTED FEATURE FIELD
+# -----------------------------
+class FeatureField:
+    """
+    Grid over the track area storing, per cell, what the state features need
+    from the centerline, evaluated at the cell center:
+
+      - segment:         index of the segment with the nearest midpoint, as
+                         CenterlineIndex picks it (progress is measured from it)
+      - distance:        signed distance to the closest segment by distance
+                         (> 0 on the side its Track normal points to)
+      - road_angle:      direction of the segment with the nearest midpoint
+      - lookahead_angle: direction `lookahead` points ahead of the nearest
+                         centerline point
+
+    query() is then one cell lookup, with the same return value as
+    CenterlineIndex.query(), so compute_features() takes either.
+
+    Tolerance: distance is 1-Lipschitz, so the distance returned is within
+    max_distance_error (half a cell diagonal) of the exact one. The angles
+    and the segment are exact wherever the nearest midpoint / centerline
+    point is the same as at the cell center, and otherwise belong to a
+    neighbouring item. check() measures all of them against the exact
+    CenterlineIndex.
+
+    Points outside the grid (the centerline bounding box grown by `margin`)
+    are answered exactly by a CenterlineIndex, built on first use.
+    """
+
+    def __init__(self, centerline, lookahead=10, cell_size=2.0, margin=120.0, arrays=None):
+        self.centerline = tuple(tuple(p) for p in centerline)
+        self.lookahead = lookahead
+        self.cell_size = cell_size
+        self.margin = margin
+        self.max_distance_error = cell_size * math.sqrt(2) / 2
+
+        xs = [p[0] for p in self.centerline]
+        ys = [p[1] for p in self.centerline]
+        self.min_x = min(xs) - margin
+        self.min_y = min(ys) - margin
+        self.cols = int(math.ceil((max(xs) + margin - self.min_x) / cell_size)) + 1
+        self.rows = int(math.ceil((max(ys) + margin - self.min_y) / cell_size)) + 1
+
+        if arrays is None:
+            arrays = self._build()
+        elif arrays["segment"].shape != (self.rows, self.cols):
+            raise ValueError(f"field arrays are {arrays['segment'].shape}, expected {(self.rows, self.cols)}")
+        self.arrays = arrays
+
+        # array.array indexing from Python is much cheaper than indexing numpy arrays
+        self._segment = array("i", arrays["segment"].astype(np.int32).tobytes())
+        self._distance = array("d", np.abs(arrays["distance"]).astype(np.float64).tobytes())
+        self._road_angle = array("d", arrays["road_angle"].astype(np.float64).tobytes())
+        self._lookahead_angle = array("d", arrays["lookahead_angle"].astype(np.float64).tobytes())
+        self._fallback = None
+
+    def _build(self, chunk=4096):
+        pts = np.array(self.centerline, dtype=float)
+        n = len(pts)
+        x1, y1 = pts[:-1, 0], pts[:-1, 1]
+        dx = pts[1:, 0] - x1
+        dy = pts[1:, 1] - y1
+        len_sq = dx * dx + dy * dy
+        safe = np.where(len_sq == 0, 1.0, len_sq)
+        mid_x = (x1 + pts[1:, 0]) / 2
+        mid_y = (y1 + pts[1:, 1]) / 2
+
+        # same formulas as CenterlineIndex, so cell centers get identical answers
+        segment_angles = np.degrees(np.arctan2(dy, dx))
+        ahead = np.minimum(np.arange(n) + self.lookahead, n - 1)
+        lookahead_angles = np.degrees(np.arctan2(pts[ahead, 1] - pts[:, 1], pts[ahead, 0] - pts[:, 0]))
+
+        gy, gx = np.mgrid[0:self.rows, 0:self.cols]
+        cx = (self.min_x + (gx + 0.5) * self.cell_size).ravel()
+        cy = (self.min_y + (gy + 0.5) * self.cell_size).ravel()
+
+        segment = np.empty(cx.shape, dtype=np.int32)
+        distance = np.empty(cx.shape)
+        road_angle = np.empty(cx.shape)
+        lookahead_angle = np.empty(cx.shape)
+
+        for start in range(0, len(cx), chunk):
+            px = cx[start:start + chunk, None]
+            py = cy[start:start + chunk, None]
+            rows = slice(start, start + chunk)
+
+            nearest_mid = ((px - mid_x) ** 2 + (py - mid_y) ** 2).argmin(axis=1)
+            road_angle[rows] = segment_angles[nearest_mid]
+
+            nearest_pt = ((px - pts[:, 0]) ** 2 + (py - pts[:, 1]) ** 2).argmin(axis=1)
+            lookahead_angle[rows] = lookahead_angles[nearest_pt]
+
+            t = np.clip(((px - x1) * dx + (py - y1) * dy) / safe, 0.0, 1.0)
+            off_x = px - (x1 + t * dx)
+            off_y = py - (y1 + t * dy)
+            best = (off_x ** 2 + off_y ** 2).argmin(axis=1)
+            i = np.arange(len(best))
+            ox = off_x[i, best]
+            oy = off_y[i, best]
+            # sign from the cross product: > 0 on the side of the segment's normal (-dy, dx)
+            side = np.where(dx[best] * oy - dy[best] * ox >= 0, 1.0, -1.0)
+            segment[rows] = nearest_mid
+            distance[rows] = side * np.hypot(ox, oy)
+
+        shape = (self.rows, self.cols)
+        return {
+            "segment": segment.reshape(shape),
+            "distance": distance.reshape(shape),
+            "road_angle": road_angle.reshape(shape),
+            "lookahead_angle": lookahead_angle.reshape(shape),
+        }
+
+    def query(self, x, y):
+        """
+        Return (segment_index, distance, road_angle_deg, lookahead_angle_deg)
+        for a point, like CenterlineIndex.query().
+        """
+        col = int((x - self.min_x) // self.cell_size)
+        row = int((y - self.min_y) // self.cell_size)
+        if 0 <= col < self.cols and 0 <= row < self.rows:
+            i = row * self.cols + col
+            return self._segment[i], self._distance[i], self._road_angle[i], self._lookahead_angle[i]
+        if self._fallback is None:
+            self._fallback = CenterlineIndex(self.centerline, self.lookahead, margin=0.0)
+        return self._fallback.query(x, y)
+
+    def check(self, points, index=None):
+        """
+        Compare against the exact CenterlineIndex at the given (x, y) points.
+        Returns the largest distance and angle errors and how often the
+        segment and each angle differ at all.
+        """
+        if index is None:
+            index = CenterlineIndex(self.centerline, self.lookahead, margin=self.margin)
+        max_distance_error = 0.0
+        max_angle_error = 0.0
+        segment_mismatches = 0
+        road_mismatches = 0
+        lookahead_mismatches = 0
+        for x, y in points:
+            segment, distance, road_angle, lookahead_angle = self.query(x, y)
+            exact_segment, exact_distance, exact_road, exact_lookahead = index.query(x, y)
+            segment_mismatches += segment != exact_segment
+            max_distance_error = max(max_distance_error, abs(distance - exact_distance))
+            road_mismatches += road_angle != exact_road
+            lookahead_mismatches += lookahead_angle != exact_lookahead
+            for a, b in ((road_angle, exact_road), (lookahead_angle, exact_lookahead)):
+                max_angle_error = max(max_angle_error, abs((a - b + 180) % 360 - 180))
+        n = max(len(points), 1)
+        return {
+            "max_distance_error": max_distance_error,
+            "distance_tolerance": self.max_distance_error,
+            "max_angle_error": max_angle_error,
+            "segment_mismatch": segment_mismatches / n,
+            "road_angle_mismatch": road_mismatches / n,
+            "lookahead_angle_mismatch": lookahead_mismatches / n,
+        }
+
+
+# -----------------------------
+# DISK CACHE
+# -----------------------------
+def save_field(field, path):
+    """Atomically write the field arrays to an .npz."""
+    with atomic_write(path) as f:
+        np.savez(f, **field.arrays)
+
+
+def load_feature_field(centerline, lookahead=10, cell_size=2.0, margin=120.0, cache_dir=".cache"):
+    """
+    Build a FeatureField, or load it from cache_dir if one was already built
+    for the same centerline, lookahead, cell size and margin.
+    cache_dir=None disables the cache.
+    """
+    if cache_dir is None:
+        return FeatureField(centerline, lookahead, cell_size, margin)
+
+    path = os.path.join(cache_dir, f"feature_field_{field_key(centerline, lookahead, cell_size, margin)}.npz")
+    if os.path.exists(path):
+        try:
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in data.files}
+            return FeatureField(centerline, lookahead, cell_size, margin, arrays=arrays)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable feature field cache {path}: {e}")
+
+    field = FeatureField(centerline, lookahead, cell_size, margin)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        save_field(field, path)
+    except OSError as e:
+        print(f"Could not cache the feature field to {path}: {e}")
+    return field
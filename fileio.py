@@ -0,0 +1,34 @@
+import os
+import contextlib
+
+
+# -----------------------------
+# BINARY FILE HELPERS
+# -----------------------------
+# checkpoints and trajectories start their arrays at a multiple of this
+ALIGN = 64
+
+
+def align(n):
+    """n rounded up to the next multiple of ALIGN."""
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+@contextlib.contextmanager
+def atomic_write(path, fsync=False):
+    """
+    Open a temp file next to path for writing and rename it over path when the
+    block ends, so readers only ever see the old file or the whole new one.
+    """
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            yield f
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        raise
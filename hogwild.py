@@ -0,0 +1,201 @@
+import os
+import sys
+import time
+import queue
+import signal
+import multiprocessing
+
+import numpy as np
+
+from qtable import QTable, N_STATES, N_ACTIONS
+
+# per-worker counters in the shared stats array (EPSILON is the worker's current value)
+STEPS, LAPS, CLEAN_LAPS, BEST_LAP_STEPS, LAP_STEPS_TOTAL, CUT_SHORT, EPSILON = range(7)
+N_STATS = 7
+
+# how many steps a worker runs between stat updates and stop checks
+SYNC_EVERY = 256
+
+
+# -----------------------------
+# SHARED Q-TABLE
+# -----------------------------
+def shared_q_values(raw):
+    """(N_STATES, N_ACTIONS) float64 view on a RawArray, for QTable(values=...)."""
+    return np.frombuffer(raw, dtype=np.float64).reshape(N_STATES, N_ACTIONS)
+
+
+# -----------------------------
+# WORKER
+# -----------------------------
+def worker_main(worker_id, q_raw, stats_raw, laps_queue, stop, seed, max_steps, session_kwargs):
+    """
+    One car learning into the shared Q-table, Hogwild-style: reads and writes
+    go straight to shared memory with no locks, so an update can now and then
+    overwrite a concurrent one. The table is tiny and every worker keeps
+    revisiting the same entries, so that noise washes out.
+
+    The length in ticks of every finished lap goes to laps_queue, one list
+    per stat update.
+    """
+    import main
+    from env import track
+
+    # Ctrl-C reaches the whole process group; the parent stops the workers through `stop`
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    sys.stdout = open(os.devnull, "w")   # lap messages from K workers would only be noise
+    q = QTable(shared_q_values(q_raw))
+    stats = np.frombuffer(stats_raw, dtype=np.float64).reshape(-1, N_STATS)[worker_id]
+    session = main.TrainingSession(track, q=q, seed=seed, **session_kwargs)
+    stats[EPSILON] = session.epsilon
+
+    seen_laps = 0
+    while not stop.is_set() and (not max_steps or session.steps < max_steps):
+        for _ in range(SYNC_EVERY):
+            session.step()
+        if session.tries != seen_laps:
+            laps_queue.put([episode.steps for episode in session.episodes[seen_laps:]])
+            for episode in session.episodes[seen_laps:]:
+                stats[LAPS] += 1
+                stats[LAP_STEPS_TOTAL] += episode.steps
+                if episode.clean:
+                    stats[CLEAN_LAPS] += 1
+                if stats[BEST_LAP_STEPS] == 0 or episode.steps < stats[BEST_LAP_STEPS]:
+                    stats[BEST_LAP_STEPS] = episode.steps
+            seen_laps = session.tries
+        stats[CUT_SHORT] = sum(session.end_reasons.values()) - session.end_reasons["finished"]
+        stats[EPSILON] = session.epsilon
+        stats[STEPS] = session.steps
+
+
+# -----------------------------
+# COORDINATOR
+# -----------------------------
+def run_hogwild(workers, steps=0, duration=0.0, until_clean_lap=False, report_every=2.0, seed=0,
+                q_values=None, quiet=False, checkpoint_every=0, on_checkpoint=None, **session_kwargs):
+    """
+    Train with `workers` processes sharing one Q-table until `steps` total
+    steps, `duration` seconds, (with until_clean_lap) the first clean lap
+    by any worker, or Ctrl-C. The parent only aggregates: every report_every
+    seconds it prints combined steps/s and lap stats, and every
+    checkpoint_every total steps it passes the summary so far to
+    on_checkpoint.
+
+    Returns a summary dict, with the final Q-table as "q", the workers' mean
+    exploration rate as "epsilon" and every finished lap's length in ticks,
+    in the order they arrived, as "lap_steps".
+    """
+    ctx = multiprocessing.get_context()
+    q_raw = ctx.RawArray("d", N_STATES * N_ACTIONS)
+    if q_values is not None:
+        shared_q_values(q_raw)[:] = q_values
+    stats_raw = ctx.RawArray("d", workers * N_STATS)
+    stats = np.frombuffer(stats_raw, dtype=np.float64).reshape(workers, N_STATS)
+    # what a worker that has not started yet would report
+    import main
+    stats[:, EPSILON] = session_kwargs.get("epsilon", main.epsilon)
+    laps_queue = ctx.Queue()
+    stop = ctx.Event()
+
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    per_worker_steps = -(-steps // workers) if steps else 0
+    procs = [
+        ctx.Process(target=worker_main, name=f"hogwild-{i}", daemon=True,
+                    args=(i, q_raw, stats_raw, laps_queue, stop, int(seeds[i].generate_state(1)[0]), per_worker_steps,
+                          session_kwargs))
+        for i in range(workers)
+    ]
+
+    start = time.perf_counter()
+    lap_steps = []
+    first_clean_lap = None
+    last_report = start
+    last_steps = 0
+    next_checkpoint = checkpoint_every
+    try:
+        for p in procs:
+            p.start()
+        while any(p.is_alive() for p in procs):
+            time.sleep(0.01)
+            _drain(laps_queue, lap_steps)
+            now = time.perf_counter()
+            if first_clean_lap is None and stats[:, CLEAN_LAPS].sum() > 0:
+                first_clean_lap = now - start
+                if until_clean_lap:
+                    break
+            if duration and now - start >= duration:
+                break
+            if report_every and now - last_report >= report_every and not quiet:
+                total = stats[:, STEPS].sum()
+                print(f"[hogwild x{workers}] {total:,.0f} steps | {(total - last_steps) / (now - last_report):,.0f} "
+                      f"steps/s | {_lap_summary(stats)}")
+                last_report, last_steps = now, total
+            if on_checkpoint and checkpoint_every and stats[:, STEPS].sum() >= next_checkpoint:
+                on_checkpoint(_summary(stats, lap_steps, q_raw, now - start, first_clean_lap))
+                next_checkpoint = (stats[:, STEPS].sum() // checkpoint_every + 1) * checkpoint_every
+    except KeyboardInterrupt:
+        if not quiet:
+            print(f"[hogwild x{workers}] interrupted, stopping the workers")
+    finally:
+        stop.set()
+        # keep emptying the queue while the workers finish: a worker whose
+        # queued laps are not read yet cannot exit
+        deadline = time.perf_counter() + 5
+        while any(p.is_alive() for p in procs) and time.perf_counter() < deadline:
+            _drain(laps_queue, lap_steps, timeout=0.01)
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+            p.join()
+        _drain(laps_queue, lap_steps)
+    elapsed = time.perf_counter() - start
+
+    summary = _summary(stats, lap_steps, q_raw, elapsed, first_clean_lap)
+    if not quiet:
+        print(f"[hogwild x{workers}] {summary['steps']:,} steps in {elapsed:.2f}s "
+              f"({summary['steps_per_sec']:,.0f} steps/s) | {_lap_summary(stats)}")
+    return summary
+
+
+def _summary(stats, lap_steps, q_raw, elapsed, first_clean_lap):
+    total_steps = stats[:, STEPS].sum()
+    return {
+        "workers": len(stats),
+        "seconds": elapsed,
+        "steps": int(total_steps),
+        "steps_per_sec": total_steps / max(elapsed, 1e-9),
+        "laps": int(stats[:, LAPS].sum()),
+        "clean_laps": int(stats[:, CLEAN_LAPS].sum()),
+        "episodes_cut_short": int(stats[:, CUT_SHORT].sum()),
+        "best_lap_steps": _best_lap(stats),
+        "lap_steps": list(lap_steps),
+        "epsilon": float(stats[:, EPSILON].mean()),
+        "first_clean_lap_seconds": first_clean_lap,
+        "q": shared_q_values(q_raw).copy(),
+    }
+
+
+def _drain(laps_queue, lap_steps, timeout=0.0):
+    """Move whatever the workers have queued into lap_steps."""
+    try:
+        lap_steps.extend(laps_queue.get(timeout=timeout) if timeout else laps_queue.get_nowait())
+        while True:
+            lap_steps.extend(laps_queue.get_nowait())
+    except queue.Empty:
+        pass
+
+
+def _best_lap(stats):
+    finished = stats[:, BEST_LAP_STEPS][stats[:, BEST_LAP_STEPS] > 0]
+    return int(finished.min()) if len(finished) else None
+
+
+def _lap_summary(stats):
+    laps = stats[:, LAPS].sum()
+    cut_short = stats[:, CUT_SHORT].sum()
+    cut = f" | {cut_short:.0f} episodes cut short" if cut_short else ""
+    if not laps:
+        return "no laps yet" + cut
+    mean = stats[:, LAP_STEPS_TOTAL].sum() / laps
+    return (f"laps {laps:.0f} ({stats[:, CLEAN_LAPS].sum():.0f} clean) | best {_best_lap(stats)} steps "
+            f"| mean {mean:.0f} steps" + cut)
@@ -0,0 +1,173 @@
+import math
+
+import numpy as np
+
+
+# -----------------------------
+# RANGE SENSOR
+# -----------------------------
+# Distance-to-wall bins for discretize(): < 30, < 80, < 150, beyond
+RANGE_BINS = (30.0, 80.0, 150.0)
+
+# cap on cars * rays * wall vertices per NumPy pass: big batches are cast in
+# chunks whose temporaries stay in cache
+MAX_PASS_ELEMENTS = 2**16
+
+
+class Lidar:
+    """
+    Lidar-style range sensor: `rays` rays from the car's position, spread
+    evenly over `fov` degrees centred on its heading (fov=360 goes all the
+    way round), each measuring the distance to the first road edge it hits,
+    or max_range if there is none closer.
+
+    The walls are the edges of the track polygon: every segment of both road
+    edges, plus the two short ends of the road. cast() intersects every ray
+    with every wall that could be in range in one NumPy pass, for one car or
+    many. Which walls could be in range is looked up per grid cell: a wall
+    further than max_range from every point of the car's cell can't be hit,
+    so leaving it out never changes a result.
+    """
+
+    def __init__(self, track, rays=8, fov=180.0, max_range=200.0, bins=RANGE_BINS, cell_size=25.0):
+        if rays < 1:
+            raise ValueError("a lidar needs at least one ray")
+        # polygon vertices with the first repeated at the end, so wall i runs
+        # from vertex i to vertex i + 1
+        polygon = np.array(track.polygon + track.polygon[:1], dtype=float)
+        self.px = polygon[:, 0]
+        self.py = polygon[:, 1]
+
+        self.rays = rays
+        self.fov = fov
+        self.max_range = max_range
+        self.bins = np.asarray(bins, dtype=float)
+        if fov >= 360:
+            self.angles = np.arange(rays) * (360.0 / rays) - 180.0
+        elif rays == 1:
+            self.angles = np.zeros(1)
+        else:
+            self.angles = np.linspace(-fov / 2, fov / 2, rays)
+        self._build_cells(cell_size)
+
+    def _build_cells(self, cell_size):
+        """
+        Per cell of a grid over the track, the walls within max_range of the
+        cell (plus half its diagonal), as runs of consecutive polygon vertices
+        padded to one length: cell_x / cell_y (C, K) vertex coordinates and
+        cell_ex / cell_ey (C, K - 1) the vector from vertex k to k + 1 where
+        that is a wall, NaN across a gap between runs and in the padding (a
+        NaN never passes the hit test, so no separate mask is needed).
+        """
+        px, py = self.px, self.py
+        self.cell_size = cell_size
+        self.min_x = px.min()
+        self.min_y = py.min()
+        self.cols = int((px.max() - self.min_x) // cell_size) + 1
+        self.rows = int((py.max() - self.min_y) // cell_size) + 1
+        cols, rows = np.meshgrid(np.arange(self.cols), np.arange(self.rows))
+        cx = self.min_x + (cols.ravel() + 0.5) * cell_size
+        cy = self.min_y + (rows.ravel() + 0.5) * cell_size
+
+        # distance from every cell centre to every wall
+        ax, ay = px[:-1], py[:-1]
+        ex, ey = np.diff(px), np.diff(py)
+        wx = cx[:, None] - ax
+        wy = cy[:, None] - ay
+        length2 = np.maximum(ex * ex + ey * ey, 1e-12)
+        u = np.clip((wx * ex + wy * ey) / length2, 0.0, 1.0)
+        distance = np.hypot(wx - u * ex, wy - u * ey)
+        near = distance <= self.max_range + cell_size * math.sqrt(2) / 2
+
+        runs = []
+        for walls in near:
+            walls = np.flatnonzero(walls)
+            runs.append(np.union1d(walls, walls + 1) if len(walls) else np.zeros(1, dtype=np.int64))
+        k = max(len(r) for r in runs)
+        table = np.array([np.pad(r, (0, k - len(r)), mode="edge") for r in runs])
+        not_wall = np.diff(table, axis=1) != 1
+        self.cell_x = px[table]
+        self.cell_y = py[table]
+        self.cell_ex = np.diff(self.cell_x, axis=1)
+        self.cell_ey = np.diff(self.cell_y, axis=1)
+        self.cell_ex[not_wall] = np.nan
+        self.cell_ey[not_wall] = np.nan
+        self.cell_walls = k - 1
+
+    def cast(self, x, y, heading):
+        """
+        Ray lengths for a car at (x, y) facing `heading` degrees: an (M,)
+        array for scalar poses, (N, M) for arrays of N poses.
+        """
+        single = np.ndim(x) == 0
+        if single:
+            col = int((x - self.min_x) // self.cell_size)
+            row = int((y - self.min_y) // self.cell_size)
+            if 0 <= col < self.cols and 0 <= row < self.rows:
+                c = row * self.cols + col
+                return self._cast(x, y, heading, self.cell_x[c], self.cell_y[c], self.cell_ex[c], self.cell_ey[c])
+        x = np.atleast_1d(np.asarray(x, dtype=float))
+        y = np.atleast_1d(np.asarray(y, dtype=float))
+        heading = np.atleast_1d(np.asarray(heading, dtype=float))
+        col = ((x - self.min_x) // self.cell_size).astype(np.int64)
+        row = ((y - self.min_y) // self.cell_size).astype(np.int64)
+        on_grid = (col >= 0) & (col < self.cols) & (row >= 0) & (row < self.rows)
+        cell = row * self.cols + col
+
+        n = len(x)
+        ranges = np.empty((n, self.rays))
+        if on_grid.all():
+            chunk = max(1, MAX_PASS_ELEMENTS // (self.rays * (self.cell_walls + 1)))
+            for i in range(0, n, chunk):
+                s = slice(i, i + chunk)
+                c = cell[s]
+                ranges[s] = self._cast(x[s, None], y[s, None], heading[s, None], self.cell_x[c], self.cell_y[c],
+                                       self.cell_ex[c], self.cell_ey[c])
+        else:
+            # cars off the grid are outside the road: test them against every wall
+            ranges[on_grid] = self.cast(x[on_grid], y[on_grid], heading[on_grid])
+            ex = np.diff(self.px)
+            ey = np.diff(self.py)
+            for i in np.flatnonzero(~on_grid):
+                ranges[i] = self._cast(x[i], y[i], heading[i], self.px, self.py, ex, ey)
+        return ranges[0] if single else ranges
+
+    def _cast(self, x, y, heading, vx, vy, ex, ey):
+        # Ray: p + t d with |d| = 1, so t is the distance. Wall: a + u e from
+        # vertex a to vertex b = a + e. With w = a - p and 2D cross products,
+        #   t = (w x e) / (d x e)
+        # and the ray line crosses the wall iff a and b lie on different sides
+        # of it, i.e. side = d x w has different signs at a and b. Since
+        # e = w_b - w_a, d x e is side_b - side_a: one side per vertex (shared
+        # by the two walls that meet there) gives both the crossing test and
+        # the denominator, and a ray through a vertex can't slip between the
+        # two walls.
+        # Shapes for one car: rays M, vertices K (K - 1 walls); for N cars,
+        # x / y / heading are (N, 1), the vertex tables (N, K) and every
+        # intermediate gets a leading N.
+        rad = np.radians(heading + self.angles)[..., None]    # ([N,] M, 1)
+        dx = np.cos(rad)
+        dy = np.sin(rad)
+        wx = (vx - x)[..., None, :]                            # ([N,] 1, K)
+        wy = (vy - y)[..., None, :]
+        side = dx * wy - dy * wx                               # ([N,] M, K)
+        side_a = side[..., :-1]
+        side_b = side[..., 1:]
+        cross_we = wx[..., :-1] * ey[..., None, :] - wy[..., :-1] * ex[..., None, :]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = cross_we / (side_b - side_a)    # inf / NaN for rays parallel to a wall and for non-walls
+            hit = (side_a * side_b <= 0) & (t >= 0)
+        return np.minimum(np.where(hit, t, np.inf).min(axis=-1), self.max_range)
+
+    def discretize(self, ranges):
+        """Bin each range by self.bins: 0 (closest) .. len(bins) (farther than the last edge)."""
+        return np.digitize(ranges, self.bins)
+
+    def endpoints(self, x, y, heading, ranges):
+        """(x, y) where each of one car's rays ends, for drawing."""
+        points = []
+        for angle, r in zip(self.angles.tolist(), np.asarray(ranges).tolist()):
+            rad = math.radians(heading + angle)
+            points.append((x + r * math.cos(rad), y + r * math.sin(rad)))
+        return points
@@ -1,467 +1,580 @@
-import pygame
+import os
 import sys
-import math
-from car import Car
+import time
 import random
-from collections import defaultdict
-pygame.init()
+import argparse
+import subprocess
+from qtable import QTable, encode_state
+from experience import ReplayBuffer
+from env import CarEnv, FINISH_BONUS, SIM_DT, END_REASONS, END_PENALTY, FAILURE_ENDS, track
+from checkpoint import CheckpointWriter, load_checkpoint
+from profiling import PhaseTimer, StepProfiler
+from metrics import MetricsLogger
 
 # -----------------------------
 # CONFIG
 # -----------------------------
-WIDTH, HEIGHT = 1000, 700
-ROAD_WIDTH = 120
-MARGIN = 80
-
-BLACK = (0, 0, 0)
-ROAD_COLOR = (60, 60, 60)
-WHITE = (255, 255, 255)
-GREEN = (0, 200, 0)
-RED = (200, 0, 0)
-
-Q = defaultdict(lambda: [0.0] * 9)
+Q = QTable()
 alpha = 0.1     # learning rate
 gamma = 0.95    # discount factor
 epsilon = 0.4   # exploration rate
-# -----------------------------
-# RAW TRACK (LOGICAL SPACE)
-# -----------------------------
-raw_centerline = [
-    (0, 0),
-    (0, 200),
-    (120, 340),
-    (320, 360),
-    (520, 330),
-    (680, 200),
-    (680, 0),
-]
+
 
 # -----------------------------
-# UTILITIES
+# TRAINING SESSION
 # -----------------------------
-def smooth_path(points, samples=20):
-    smooth = []
-    for i in range(len(points) - 1):
-        x1, y1 = points[i]
-        x2, y2 = points[i + 1]
-        for t in range(samples):
-            a = t / samples
-            smooth.append((
-                x1 * (1 - a) + x2 * a,
-                y1 * (1 - a) + y2 * a
-            ))
-    smooth.append(points[-1])
-    return smooth
-
-
-def fit_centerline_to_screen(points, w, h, margin):
-    xs = [p[0] for p in points]
-    ys = [p[1] for p in points]
-
-    min_x, max_x = min(xs), max(xs)
-    min_y, max_y = min(ys), max(ys)
-
-    track_w = max_x - min_x
-    track_h = max_y - min_y
-
-    scale = min(
-        (w - 2 * margin) / track_w,
-        (h - 2 * margin) / track_h
-    )
-
-    cx = (min_x + max_x) / 2
-    cy = (min_y + max_y) / 2
-
-    screen_cx = w / 2
-    screen_cy = h / 2
-
-    fitted = []
-    for x, y in points:
-        x = (x - cx) * scale + screen_cx
-        y = (y - cy) * scale + screen_cy
-        fitted.append((x, y))
-
-    return fitted
-
-def normalize_angle_deg(angle):
-    """ Normalize angle to [-180, 180] degrees. """
-    while angle>180:
-        angle-=360
-    while angle<-180:
-        angle+=360
-    return angle
-
-def compute_heading_error(car_x, car_y, car_heading_deg, centerline):
-    """
-    Returns heading error in degress between car heading
-    and direction of the closest centerline segment
-    """
-
-    min_dist = float("inf")
-    best_p1 = None
-    best_p2 = None
-
-    # find closest centerline segment (via midpoint)
-    for i in range(len(centerline)-1):
-        x1,y1 = centerline[i]
-        x2,y2 = centerline[i+1]
-
-        mx = (x1+x2)/2
-        my = (y1+y2)/2
-
-        dx = car_x-mx
-        dy = car_y-my
-
-        dist = math.hypot(dx,dy)
-
-        if dist<min_dist:
-            min_dist = dist
-            best_p1 = (x1,y1)
-            best_p2 = (x2,y2)
-
-    # Direction of the road segment
-    dx = best_p2[0]-best_p1[0]
-    dy = best_p2[1]-best_p1[1]
-
-    road_angle_rad = math.atan2(dy,dx)
-    road_angle_rad = math.degrees(road_angle_rad)
-
-    # Heading error
-    heading_error = car_heading_deg - road_angle_rad
-    heading_error = normalize_angle_deg(heading_error)
-
-    return heading_error
-
-def distance_point_to_segment(px, py, x1, y1, x2, y2):
+class TrainingSession:
     """
-    Returns the shortest distance from point P(px,py)
-    to the line segment (x1,y1)-(x2,y2)
+    Q-learning agent and lap bookkeeping for one training run on a CarEnv.
+    Holds no pygame display state, so the same step() drives both
+    the windowed loop and the headless loop.
     """
 
-    dx = x2-x1
-    dy = y2-y1
-    
-    if(dx == 0 and dy==0):
-        # segment is a point
-        return math.hypot(px-x1, py-y1)
-    
-    # Projection factor t
-    t = ((px-x1)*dx + (py-y1)*dy)/(dx*dx + dy*dy)
-    t = max(0.0, min(1.0, t)) # Clamp to segment
-
-    closest_x = x1 + t*dx
-    closest_y = y1 + t*dy
-
-    return math.hypot(px-closest_x, py-closest_y)
-
-def compute_distance_to_centerline(car_x, car_y, centerline):
-    min_dist = float("inf")
-    for i in range(len(centerline)-1):
-        x1,y1 = centerline[i]
-        x2,y2 = centerline[i+1]
-
-        dist = distance_point_to_segment(car_x, car_y, x1,y1, x2,y2)
-        if(dist<min_dist):
-            min_dist = dist
-
-    return min_dist
-
-def compute_future_heading_error(car_x, car_y, car_heading, centerline, lookahead=10):
-    min_idx = 0
-    min_dist = float("inf")
-    for i in range(len(centerline)):
-        d = math.hypot(car_x-centerline[i][0], car_y-centerline[i][1])
-        if d < min_dist:
-            min_dist = d
-            min_idx = i
-
-    i2 = min(min_idx + lookahead, len(centerline)-1)
-    dx = centerline[i2][0] - centerline[min_idx][0]
-    dy = centerline[i2][1] - centerline[min_idx][1]
-    road_angle = math.degrees(math.atan2(dy, dx))
-    return normalize_angle_deg(car_heading - road_angle)
-
-
-def discretize_state(speed, heading_error, distance, future_heading_error):
-    # Speed
-    if abs(speed) < 0.5:
-        s = 0      # STOPPED
-    elif abs(speed) < 2.5:
-        s = 1      # SLOW
-    else:
-        s = 2      # FAST
-
-    # Heading (current)
-    if heading_error < -20:
-        h = 0      # HARD_LEFT
-    elif heading_error < -5:
-        h = 1      # LEFT
-    elif heading_error < 5:
-        h = 2      # STRAIGHT
-    elif heading_error < 20:
-        h = 3      # RIGHT
-    else:
-        h = 4      # HARD_RIGHT
-
-    # Distance
-    if distance < 10:
-        d = 0      # CENTER
-    elif distance < 30:
-        d = 1      # OFF
-    else:
-        d = 2      # FAR
-
-    # Future heading error (lookahead) discretized into 3 bins
-    # Negative => road turns left ahead; positive => road turns right ahead
-    if future_heading_error < -10:
-        fh = 0    # FUTURE_LEFT
-    elif future_heading_error > 10:
-        fh = 2    # FUTURE_RIGHT
-    else:
-        fh = 1    # FUTURE_STRAIGHT
-
-    # Always return a tuple (so Q dict keys are consistent)
-    return (s, h, d, fh)
-
-
+    def __init__(self, track, use_road_mask=True, use_feature_field=False, replay_updates=0,
+                 replay_every=16, replay_capacity=100000, q=None, alpha=alpha, gamma=gamma,
+                 epsilon=epsilon, epsilon_decay=0.95, epsilon_min=0.02, reward_weights=None,
+                 tracks=None, rotate_every=1, sim_dt=SIM_DT, substeps=1, action_repeat=1, seed=None,
+                 max_episode_steps=0, no_progress_steps=0, max_collisions=0, end_penalty=END_PENALTY,
+                 lidar_rays=0, lidar_fov=180.0):
+        # Exploration (and the replay buffer's sampling) draw from this
+        # generator only, so a run with the same seed and settings repeats exactly
+        self.rng = random.Random(seed)
+        # With a list of tracks, training starts on the first and moves to the
+        # next one every rotate_every finished laps (one Q-table for all of them)
+        self.tracks = list(tracks) if tracks else None
+        self.rotate_every = rotate_every
+        if self.tracks:
+            track = self.tracks[0]
+        self.track = track
+        self.env = CarEnv(track, use_road_mask=use_road_mask, use_feature_field=use_feature_field,
+                          reward_weights=reward_weights, sim_dt=sim_dt, substeps=substeps,
+                          action_repeat=action_repeat, max_episode_steps=max_episode_steps,
+                          no_progress_steps=no_progress_steps, max_collisions=max_collisions,
+                          end_penalty=end_penalty, lidar_rays=lidar_rays,
+                          lidar_fov=lidar_fov)
+        self.car = self.env.car
+
+        # Learning hyperparameters; the module-level Q and settings unless given
+        self.q = Q if q is None else q
+        self.alpha = alpha
+        self.gamma = gamma
+        self.epsilon = epsilon
+        self.epsilon_decay = epsilon_decay
+        self.epsilon_min = epsilon_min
+
+        self.steps = 0
+        self.tries = 0
+        self.lap_times = []
+        self.best_lap = None
+        self.episodes = []   # finished laps
+        # how many episodes ended for each of END_REASONS
+        self.end_reasons = dict.fromkeys(END_REASONS, 0)
+
+        # Initialize state before loop
+        self.state = self.env.reset()
+
+        self.checkpoint_writer = None
+        self.checkpoint_every = 0
+
+        # optional MetricsLogger, see enable_metrics()
+        self.metrics = None
+        self.metrics_every = 0
+
+        # Experience replay: replay_updates remembered transitions per real step
+        # also get a Q-learning update. A batch costs ~25 us however small, so
+        # they are applied every replay_every steps as one batch of
+        # replay_updates * replay_every.
+        self.replay_updates = replay_updates
+        self.replay_every = replay_every
+        self.replay = None
+        if replay_updates:
+            self.replay = ReplayBuffer(replay_capacity, seed=self.rng.getrandbits(32))
+
+    @property
+    def timer(self):
+        """Per-phase timings (a NullTimer until timing is turned on), shared with the env."""
+        return self.env.timer
+
+    @timer.setter
+    def timer(self, timer):
+        self.env.timer = timer
+
+    # --- checkpoints ---
+    def enable_checkpoints(self, path, every):
+        """Save every `every` steps (0: only on close) to path, off the training thread."""
+        self.checkpoint_writer = CheckpointWriter(path)
+        self.checkpoint_every = every
+
+    # --- metrics ---
+    def enable_metrics(self, path, every=1000, **logger_kwargs):
+        """Log a progress record every `every` steps and a record per episode to path (see metrics.py)."""
+        self.metrics = MetricsLogger(path, **logger_kwargs)
+        self.metrics_every = every
+        self._metrics_start = self._metrics_last = time.perf_counter()
+        self._metrics_last_steps = self.steps
+
+    def log_progress(self):
+        now = time.perf_counter()
+        elapsed = now - self._metrics_last
+        self.metrics.log({
+            "kind": "progress",
+            "time": time.time(),
+            "elapsed": now - self._metrics_start,
+            "steps": self.steps,
+            "steps_per_sec": (self.steps - self._metrics_last_steps) / elapsed if elapsed > 0 else None,
+            "epsilon": self.epsilon,
+            "laps": self.tries,
+            "best_lap": self.best_lap,
+            # share of states whose Q-table row has been updated (is not all zeros)
+            "q_coverage": float(self.q.values.any(axis=1).mean()),
+        })
+        self._metrics_last = now
+        self._metrics_last_steps = self.steps
+
+    def save_checkpoint(self):
+        if self.checkpoint_writer is not None:
+            self.checkpoint_writer.submit(self.q.values, self.epsilon, self.tries, self.lap_times, self.best_lap,
+                                          self.env.physics())
+
+    def restore(self, checkpoint):
+        """Continue from a loaded checkpoint (see checkpoint.load_checkpoint)."""
+        self.q.values = checkpoint["q"]
+        self.epsilon = checkpoint["epsilon"]
+        self.tries = checkpoint["tries"]
+        self.lap_times = list(checkpoint["lap_times"])
+        self.best_lap = checkpoint["best_lap"]
+
+    def close(self):
+        """Write the final checkpoint and metrics and wait for them to hit the disk, then flush any recording."""
+        if self.checkpoint_writer is not None:
+            self.save_checkpoint()
+            self.checkpoint_writer.close()
+            self.checkpoint_writer = None
+        if self.metrics is not None:
+            if self.steps != self._metrics_last_steps:
+                self.log_progress()
+            self.metrics.close()
+            self.metrics = None
+        self.env.close()
+
+    def step(self):
+        """
+        Run one action selection, physics update and Q-learning update. With
+        action repeat k the action is held for k ticks and the next state's
+        value is discounted by gamma ** k. A step that fails the episode (see
+        env.FAILURE_ENDS) is terminal: its target is the (penalized) reward
+        alone. A timeout still bootstraps from the state it stopped in.
+        """
+        state = self.state
+        timer = self.timer
+        q = self.q
+        alpha = self.alpha
+        gamma = self.gamma ** self.env.action_repeat
+        rng = self.rng
+        timer.begin()
+
+        if rng.random() < self.epsilon:
+            action = rng.randint(0,8)   # explore
+        else:
+            action = q.best_action(state)  # exploit
 
+        prev_state = state
+        timer.mark("action selection")
 
+        next_state, reward, done, info = self.env.step(action)
 
-# -----------------------------
-# BUILD FINAL CENTERLINE
-# -----------------------------
-centerline = smooth_path(raw_centerline, samples=20)
-centerline = fit_centerline_to_screen(centerline, WIDTH, HEIGHT, MARGIN)
+        best_next = q.max_value(next_state)
 
-# -----------------------------
-# ROAD DRAWING
-# -----------------------------
-def draw_road(screen, centerline, width):
-    half = width / 2
-    left_edge = []
-    right_edge = []
-    normals = []
-
-    for i in range(len(centerline) - 1):
-        x1, y1 = centerline[i]
-        x2, y2 = centerline[i + 1]
-        dx, dy = x2 - x1, y2 - y1
-        length = math.hypot(dx, dy)
-        if length == 0:
-            dx, dy = 1, 0
-            length = 1
-        dx /= length
-        dy /= length
-        normals.append((-dy, dx))
-
-    for i in range(len(centerline)):
-        x, y = centerline[i]
-        if i == 0:
-            nx, ny = normals[0]
-        elif i == len(centerline) - 1:
-            nx, ny = normals[-1]
+        failed = info["end"] in FAILURE_ENDS
+        if failed:
+            q.update(prev_state, action, reward, alpha)
         else:
-            nx = normals[i - 1][0] + normals[i][0]
-            ny = normals[i - 1][1] + normals[i][1]
-            length = math.hypot(nx, ny)
-            if length == 0:
-                nx, ny = normals[i]
+            q.update(prev_state, action, reward + gamma * best_next, alpha)
+        timer.mark("q update")
+
+        self.state = next_state
+        if done:
+            self._end_episode(prev_state, action, info["episode"])
+
+        if self.replay is not None:
+            # a finishing step is remembered with the finishing bonus as its (terminal) target
+            if info["lap_finished"]:
+                self.replay.add(encode_state(prev_state), action, FINISH_BONUS, 0, True)
+            elif failed:
+                self.replay.add(encode_state(prev_state), action, reward, 0, True)
             else:
-                nx /= length
-                ny /= length
+                self.replay.add(encode_state(prev_state), action, reward, encode_state(next_state), False)
+            if self.steps % self.replay_every == 0:
+                self.replay.replay(q, self.replay_updates * self.replay_every, alpha, gamma)
+            timer.mark("replay")
+
+        # Decay epsilon
+        self.epsilon = max(self.epsilon_min, self.epsilon * self.epsilon_decay)
+        self.steps += 1
+
+        if self.checkpoint_every and self.steps % self.checkpoint_every == 0:
+            self.save_checkpoint()
+        if self.metrics_every and self.steps % self.metrics_every == 0:
+            self.log_progress()
+        timer.mark("bookkeeping")
+
+    def _end_episode(self, prev_state, action, episode):
+        self.end_reasons[episode.end] += 1
+        if episode.end == "finished":
+            self._finish_lap(prev_state, action, episode)
+
+        if self.metrics is not None:
+            self.metrics.log({
+                "kind": "episode",
+                "time": time.time(),
+                "steps": self.steps,
+                "epsilon": self.epsilon,
+                "episode": episode.episode,
+                "end": episode.end,
+                "lap_steps": episode.steps,
+                "lap_time": episode.lap_time,
+                "reward": episode.total_reward,
+                "collisions": episode.collisions,
+                "clean": episode.clean,
+            })
+
+        if episode.end == "finished" and self.tracks and len(self.tracks) > 1 and self.tries % self.rotate_every == 0:
+            self.env.set_track(self.tracks[self.tries // self.rotate_every % len(self.tracks)])
+
+        # Reset the car and the brain state too
+        self.state = self.env.reset()
+
+    def _finish_lap(self, prev_state, action, episode):
+        print(f"Lap Finished!")
+        lap_time_sec = episode.lap_time
+        self.lap_times.append(lap_time_sec)
 
-        left_edge.append((x + nx * half, y + ny * half))
-        right_edge.append((x - nx * half, y - ny * half))
+        if self.best_lap is None or self.best_lap>lap_time_sec:
+            self.best_lap = lap_time_sec
 
-    road_polygon = left_edge + right_edge[::-1]
+        clean = " (clean)" if episode.clean else f" ({episode.collisions} collisions)"
+        print(f"Lap {self.tries + 1} finished in {lap_time_sec:.2f}s / {episode.steps} steps{clean} | Best: {self.best_lap:.2f}s")
 
-    pygame.draw.polygon(screen, ROAD_COLOR, road_polygon)
-    pygame.draw.lines(screen, WHITE, False, left_edge, 4)
-    pygame.draw.lines(screen, WHITE, False, right_edge, 4)
+        # Extra reward for finishing
+        self.q.update(prev_state, action, FINISH_BONUS + self.gamma * 0, self.alpha)
 
-    return left_edge, right_edge, road_polygon
+        self.episodes.append(episode)
+        self.tries += 1
 
 
 # -----------------------------
-# START / FINISH
+# WINDOWED LOOP
 # -----------------------------
-def draw_gate(screen, p1, p2, color, label):
-    pygame.draw.line(screen, color, p1, p2, 6)
-    font = pygame.font.SysFont("Arial", 20)
-    text = font.render(label, True, color)
-    mx = (p1[0] + p2[0]) / 2
-    my = (p1[1] + p2[1]) / 2
-    screen.blit(text, (mx - 30, my - 30))
+RENDER_EVERY_CHOICES = (1, 4, 16, 64)   # cycled with F
+
+def run_window(session, profiler=None, render_every=1):
+    """
+    Train with the window open, drawing every `render_every`-th step (physics
+    and learning still run every step). Hotkeys: F cycles how often to draw
+    (1, 4, 16, 64 steps), T toggles the phase timing overlay (turning timing
+    on if it was off), P profiles the next N steps with cProfile, L toggles
+    the lidar rays (with --lidar).
+    """
+    import pygame
+    from render import Renderer
+
+    renderer = Renderer(session.track)
+    renderer.render_every = render_every
+    renderer.show_rays = session.env.lidar is not None
+    session.car.font = renderer.font
+    clock = pygame.time.Clock()
+    if profiler is None:
+        profiler = StepProfiler(1000)
+
+    running = True
+    while running:
+        session.step()
+        profiler.tick()
+        if session.steps % renderer.render_every:
+            continue
+
+        renderer.draw(session.env, session.tries, session.best_lap)
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_f:
+                choices = RENDER_EVERY_CHOICES
+                if renderer.render_every in choices:
+                    renderer.render_every = choices[(choices.index(renderer.render_every) + 1) % len(choices)]
+                else:
+                    renderer.render_every = choices[0]
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_t:
+                if not session.timer.enabled:
+                    session.timer = PhaseTimer()
+                renderer.show_timings = not renderer.show_timings
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_p:
+                profiler.start()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_l:
+                renderer.show_rays = not renderer.show_rays
+        session.timer.mark("events")
+
+        clock.tick(60)
+
+    profiler.stop()
+    renderer.close()
 
 
 # -----------------------------
-# PYGAME SETUP
+# HEADLESS LOOP
 # -----------------------------
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("RL Car Simulation")
-
-clock = pygame.time.Clock()
-font = pygame.font.SysFont("Arial", 18)
-
-car = Car(centerline[0][0], centerline[0][1] + 40, font=font)
-
-# Initialize state before loop
-heading_error = compute_heading_error(car.x, car.y, car.heading, centerline)
-distance_to_center = compute_distance_to_centerline(car.x, car.y, centerline)
-future_heading_error = compute_future_heading_error(car_heading=car.heading, car_x=car.x, car_y=car.y, centerline=centerline)
-
-state = discretize_state(car.speed, heading_error, distance_to_center,future_heading_error)
+def run_headless(session, steps, report_every=10000, profiler=None, snapshot=None):
+    """
+    Train without a display or frame cap. Runs the same TrainingSession.step()
+    as the windowed loop and returns the measured steps per second. With a
+    SnapshotWriter, the state is published every snapshot.every steps for a
+    viewer process.
+    """
 
-# Define the goal
-finish_line_point = centerline[-4]
+    start = time.perf_counter()
+    for i in range(1, steps + 1):
+        session.step()
+        if profiler is not None:
+            profiler.tick()
+        if snapshot is not None and i % snapshot.every == 0:
+            snapshot.steps_per_sec = i / (time.perf_counter() - start)
+            snapshot.publish(session, session.q.values)
+        if report_every and i % report_every == 0:
+            elapsed = time.perf_counter() - start
+            print(f"[headless] step {i}/{steps} | {i / elapsed:.0f} steps/s | laps {session.tries}")
+
+    if profiler is not None:
+        profiler.stop()
+    elapsed = time.perf_counter() - start
+    steps_per_sec = steps / elapsed if elapsed > 0 else float("inf")
+    best = f"{session.best_lap:.2f}s" if session.best_lap is not None else "-"
+    print(f"[headless] {steps} steps in {elapsed:.2f}s ({steps_per_sec:.0f} steps/s) | laps {session.tries} | best lap {best}")
+    early = {end: n for end, n in session.end_reasons.items() if n and end != "finished"}
+    if early:
+        print("[headless] episodes cut short: " + ", ".join(f"{end} {n}" for end, n in early.items()))
+    return steps_per_sec
 
-prev_dist_to_finish = math.hypot(car.x - finish_line_point[0], car.y-finish_line_point[1])
 
 # -----------------------------
-# MAIN LOOP
+# SEPARATE VIEWER PROCESS
 # -----------------------------
-running = True
-tries = 0;
-current_lap_clean = True
-lap_times = []
-best_lap = None
-lap_start_time = pygame.time.get_ticks()
-
-while running:
-    screen.fill(BLACK)
-
-    left_edge, right_edge, road_polygon = draw_road(screen, centerline, ROAD_WIDTH)
-
-    # Debug centerline (remove later for RL)
-    pygame.draw.lines(screen, (100, 100, 255), False, centerline, 1)
-
-    # Start & finish
-    draw_gate(screen, left_edge[3], right_edge[3], GREEN, "START")
-    draw_gate(screen, left_edge[-4], right_edge[-4], RED, "FINISH")
-
-    #  Lap timings
-    current_time = (pygame.time.get_ticks() - lap_start_time) / 1000.0
-    lap_text = font.render(f"Lap Time: {current_time:.1f}s", True, (200, 200, 255))
-    lap_text_x = WIDTH - lap_text.get_width() - MARGIN
-    screen.blit(lap_text, (lap_text_x, 50))
-
-    if best_lap is not None:
-        best_text = font.render(f"Best Lap: {best_lap:.2f}s", True, (100, 255, 100))
-        best_text_x = WIDTH - best_text.get_width() - MARGIN
-        screen.blit(best_text, (best_text_x, 70))
-
-    #keys = pygame.key.get_pressed()
-    if random.random() < epsilon:
-        action = random.randint(0,8)   # explore
-    else:
-        action = max(range(9), key=lambda a: Q[state][a])  # exploit
-
-    prev_state = state
-
-    car.rl_update(action=action, road_polygon=road_polygon)   # <-- pass road polygon for collision checks
-    #car.update(keys, road_polygon)
-    heading_error = compute_heading_error(car.x,car.y,car.heading,centerline)
-    text = font.render(f"Heading error: {heading_error:.1f}°", True, (255, 255, 0))
-    screen.blit(text, (10, 90))
-
-    distance_to_center = compute_distance_to_centerline(car.x,car.y,centerline)
-    text = font.render(f"Distance to centerline: {distance_to_center:.1f}",True,(255, 200, 0))
-    screen.blit(text, (10, 120))
-    
-    future_heading_error = compute_future_heading_error(car.x, car.y, car.heading, centerline)
-    next_state = discretize_state(car.speed,heading_error,distance_to_center, future_heading_error)
-    text = font.render(f"State: {next_state}", True, (0, 255, 255))
-    screen.blit(text, (10, 150))
-
-    tries_text = f"Total Tries: {tries}"
-    text_surface = font.render(tries_text, True, (255, 255, 255))
-    tries_x = WIDTH - text_surface.get_width() - MARGIN
-    screen.blit(text_surface, (tries_x, 10))
-
-    curr_dist_to_finish = math.hypot(car.x - finish_line_point[0], car.y-finish_line_point[1])
-    progress = prev_dist_to_finish - curr_dist_to_finish
-
-    reward = 0.0
-    reward += max(progress, 0) * 5.0
-    
-    if progress < 0:
-        reward -= 1.0
-
-
-    if car.speed>0:
-        reward+=0.1
-    else:
-        reward-=0.1
-
-    reward -= abs(heading_error) / 90.0
-    reward -= min(distance_to_center / (ROAD_WIDTH/2), 1.0)
-    if car.collided:
-        reward-=10
-        current_lap_clean = False
-
-    prev_dist_to_finish = curr_dist_to_finish
-    best_next = max(Q[next_state])
-
-    Q[prev_state][action] += alpha * (
-        reward + gamma * best_next - Q[prev_state][action]
-        )
-    
-
-    state = next_state
-    if curr_dist_to_finish < 40:
-        print(f"Lap Finished!")
-        lap_end_time = pygame.time.get_ticks()
-        lap_time_sec = (lap_end_time-lap_start_time)/1000.0
-        lap_times.append(lap_time_sec)
-
-        if best_lap is None or best_lap>lap_time_sec:
-            best_lap = lap_time_sec
-        
-        print(f"Lap {tries + 1} finished in {lap_time_sec:.2f}s | Best: {best_lap:.2f}s")
-
-        # Extra reward for finishing
-        Q[prev_state][action] += alpha * (100 + gamma * 0 - Q[prev_state][action])
-
-        tries += 1
-
-        # Reset Physics: place the car exactly where it was spawned initially
-        car.x = centerline[0][0]
-        car.y = centerline[0][1] + 40   # <-- IMPORTANT: same offset used at initial creation
-        car.speed = 0.0
-
-
-        # Align heading with the first centerline segment so it faces the track
-        dx0 = centerline[1][0] - centerline[0][0]
-        dy0 = centerline[1][1] - centerline[0][1]
-        car.heading = math.degrees(math.atan2(dy0, dx0))
-
-        car.collided = False
-        current_lap_clean = True
-
-        # Reset Distance Tracker
-        prev_dist_to_finish = math.hypot(car.x - finish_line_point[0], car.y - finish_line_point[1])
-
-        # Reset the brain state too
-        heading_error = compute_heading_error(car.x, car.y, car.heading, centerline)
-        distance_to_center = compute_distance_to_centerline(car.x, car.y, centerline)
-        future_heading_error = compute_future_heading_error(car.x, car.y, car.heading, centerline)
-        state = discretize_state(car.speed, heading_error, distance_to_center, future_heading_error)
-        prev_state = state
-
-        # Reset the timer
-        lap_start_time = pygame.time.get_ticks()
-
+def run_with_viewer(session, steps, report_every=10000, profiler=None):
+    """
+    Train headless in this process while viewer.py draws the published
+    snapshots in its own process. The trainer never waits on the viewer.
+    """
+    from snapshot import SnapshotWriter
+
+    snapshot = SnapshotWriter(session.track, tracks=session.tracks)
+    snapshot.publish(session, session.q.values)
+    viewer_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "viewer.py")
+    subprocess.Popen([sys.executable, viewer_path, snapshot.name])
+    print(f"Publishing snapshots to shared memory block {snapshot.name}")
+    try:
+        return run_headless(session, steps, report_every=report_every, profiler=profiler, snapshot=snapshot)
+    finally:
+        snapshot.close(session)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Q-learning car simulation")
+    parser.add_argument("--headless", action="store_true",
+                        help="train without a window or frame cap and report steps/s")
+    parser.add_argument("--workers", type=int, default=1, metavar="K",
+                        help="train headless with K processes sharing one lock-free Q-table")
+    parser.add_argument("--viewer", action="store_true",
+                        help="train headless and watch in a separate viewer process, which never slows training")
+    parser.add_argument("--steps", type=int, default=100000,
+                        help="number of training steps in headless mode")
+    parser.add_argument("--report-every", type=int, default=10000,
+                        help="print progress every N headless steps (0 to disable)")
+    parser.add_argument("--render-every", type=int, default=1, metavar="N",
+                        help="with the window open, draw every Nth step (F cycles this at runtime)")
+    parser.add_argument("--track", dest="tracks", action="append", metavar="PATH",
+                        help="train on a track file (.json / .csv) or every track file in a directory; "
+                             "repeat to rotate through several (default: the built-in track)")
+    parser.add_argument("--rotate-every", type=int, default=1, metavar="N",
+                        help="with several tracks, move to the next one every N finished laps")
+    parser.add_argument("--sim-dt", type=float, default=SIM_DT, metavar="SECONDS",
+                        help="simulated time per physics tick (the car is tuned for 1/60)")
+    parser.add_argument("--substeps", type=int, default=1, metavar="N",
+                        help="integrate every physics tick in N smaller steps, each with a collision check")
+    parser.add_argument("--action-repeat", type=int, default=1, metavar="K",
+                        help="hold each chosen action for K ticks; features and the Q update run once per K")
+    parser.add_argument("--seed", type=int, help="seed exploration so a run can be repeated exactly")
+    parser.add_argument("--max-episode-steps", type=int, default=0, metavar="N",
+                        help="end an episode after N ticks (0: never); the learner still bootstraps from there")
+    parser.add_argument("--no-progress-steps", type=int, default=0, metavar="N",
+                        help="end an episode as failed after N ticks without getting further along the road")
+    parser.add_argument("--max-collisions", type=int, default=0, metavar="N",
+                        help="end an episode as failed after N collisions without getting further along the road")
+    parser.add_argument("--end-penalty", type=float, default=END_PENALTY,
+                        help="reward taken off the last step of a failed episode")
+    parser.add_argument("--lidar", type=int, default=0, metavar="M",
+                        help="cast M range-sensor rays from the car every step and draw them (L toggles); "
+                             "the readings are not part of the Q-learning state")
+    parser.add_argument("--lidar-fov", type=float, default=180.0, metavar="DEG",
+                        help="angle the --lidar rays are spread over, centred on the heading (360 = all round)")
+    parser.add_argument("--no-road-mask", dest="road_mask", action="store_false",
+                        help="ray cast every collision check against the road polygon")
+    parser.add_argument("--feature-field", action="store_true",
+                        help="look state features up in a precomputed grid (cached in .cache/) "
+                             "instead of querying the centerline exactly")
+    parser.add_argument("--replay", type=int, default=0, metavar="K",
+                        help="after every step, also replay K remembered transitions (experience replay)")
+    parser.add_argument("--replay-every", type=int, default=16, metavar="N",
+                        help="apply the replayed updates every N steps, as one batch of K * N")
+    parser.add_argument("--replay-capacity", type=int, default=100000,
+                        help="how many transitions the replay buffer remembers")
+    parser.add_argument("--record", metavar="PATH",
+                        help="record every step (pose, action, reward) to a trajectory file for replay.py")
+    parser.add_argument("--checkpoint", default="checkpoint.rlq",
+                        help="Q-table checkpoint file, saved periodically and on exit ('' to disable)")
+    parser.add_argument("--checkpoint-every", type=int, default=10000,
+                        help="save a checkpoint every N steps (0: only on exit)")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue from the checkpoint file instead of an empty Q-table")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="log steps/s, epsilon, Q coverage and per-episode stats to a .jsonl or .csv "
+                             "file, written in the background (see metrics.py)")
+    parser.add_argument("--metrics-every", type=int, default=1000, metavar="N",
+                        help="log a progress record every N steps")
+    parser.add_argument("--metrics-max-mb", type=float, default=50,
+                        help="start a new metrics file once the current one reaches this size")
+    parser.add_argument("--timing", action="store_true", default=os.environ.get("RL_TIMING") == "1",
+                        help="keep rolling per-phase timings and dump them on exit (or set RL_TIMING=1)")
+    parser.add_argument("--timing-output", default="phase_timings.json",
+                        help="where --timing writes its per-phase mean/p99 summary")
+    parser.add_argument("--profile-steps", type=int, default=int(os.environ.get("RL_PROFILE_STEPS", 0)),
+                        help="cProfile the first N steps (or set RL_PROFILE_STEPS=N); "
+                             "in the window, P profiles the next 1000 steps")
+    parser.add_argument("--profile-output", default="profile.pstats",
+                        help="where the cProfile window writes its .pstats file")
+    args = parser.parse_args(argv)
+    if args.workers > 1:
+        # the workers train headless and only share the Q-table and lap stats
+        unsupported = [flag for flag, used in (("--record", args.record), ("--viewer", args.viewer),
+                                               ("--lidar", args.lidar), ("--metrics", args.metrics),
+                                               ("--timing (or RL_TIMING=1)", args.timing))
+                       if used]
+        if unsupported:
+            parser.error(f"{', '.join(unsupported)} cannot be combined with --workers")
+    return args
 
-    # Decay epsilon
-    epsilon = max(0.02, epsilon * 0.95)
-    car.draw(screen)    
 
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
+# -----------------------------
+# PARALLEL WORKERS
+# -----------------------------
+def run_workers(args):
+    """Headless training with args.workers processes sharing one Q-table (see hogwild.py)."""
+    from hogwild import run_hogwild
+
+    checkpoint = {"q": None, "epsilon": epsilon, "tries": 0, "lap_times": [], "best_lap": None}
+    if args.resume:
+        checkpoint = load_resume(args)
+        print(f"Resumed from {args.checkpoint}: {checkpoint['tries']} laps, epsilon {checkpoint['epsilon']:.3f}")
+    tracks = load_track_args(args)
+    physics = {"sim_dt": args.sim_dt, "substeps": args.substeps, "action_repeat": args.action_repeat}
+    writer = CheckpointWriter(args.checkpoint) if args.checkpoint else None
+
+    def save(summary):
+        # lap lengths come back from the workers in ticks
+        lap_times = list(checkpoint["lap_times"]) + [steps * args.sim_dt for steps in summary["lap_steps"]]
+        # older --workers checkpoints kept a best lap but no lap times
+        candidates = lap_times + ([checkpoint["best_lap"]] if checkpoint["best_lap"] is not None else [])
+        writer.submit(summary["q"], summary["epsilon"], checkpoint["tries"] + summary["laps"], lap_times,
+                      min(candidates) if candidates else None, physics)
+
+    summary = run_hogwild(args.workers, steps=args.steps, q_values=checkpoint["q"], seed=args.seed or 0,
+                          checkpoint_every=args.checkpoint_every, on_checkpoint=save if writer else None,
+                          epsilon=checkpoint["epsilon"],
+                          tracks=tracks, rotate_every=max(args.rotate_every, 1),
+                          sim_dt=args.sim_dt, substeps=args.substeps, action_repeat=args.action_repeat,
+                          **episode_limit_args(args), use_road_mask=args.road_mask, use_feature_field=args.feature_field,
+                          replay_updates=args.replay, replay_every=args.replay_every,
+                          replay_capacity=args.replay_capacity)
+    if writer is not None:
+        save(summary)
+        writer.close()
+        print(f"Saved the shared Q-table to {args.checkpoint}")
+
+
+def episode_limit_args(args):
+    return {"max_episode_steps": args.max_episode_steps, "no_progress_steps": args.no_progress_steps,
+            "max_collisions": args.max_collisions, "end_penalty": args.end_penalty}
+
+
+def load_resume(args):
+    """The --resume checkpoint, or exit with a message if it is missing or damaged."""
+    try:
+        return load_checkpoint(args.checkpoint)
+    except (OSError, ValueError) as e:
+        sys.exit(f"could not resume: {e}")
+
+
+def load_track_args(args):
+    """The --track files, loaded through the geometry cache, or None for the built-in track."""
+    if not args.tracks:
+        return None
+    from tracks import load_tracks
+    try:
+        tracks = load_tracks(args.tracks)
+    except (OSError, ValueError) as e:
+        sys.exit(f"could not load the tracks: {e}")
+    if not tracks:
+        sys.exit(f"no track files found in {', '.join(args.tracks)}")
+    return tracks
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.workers > 1:
+        run_workers(args)
+        return
+
+    session = TrainingSession(track, use_road_mask=args.road_mask, use_feature_field=args.feature_field,
+                              replay_updates=args.replay, replay_every=args.replay_every,
+                              replay_capacity=args.replay_capacity,
+                              tracks=load_track_args(args), rotate_every=max(args.rotate_every, 1),
+                              sim_dt=args.sim_dt, substeps=args.substeps, action_repeat=args.action_repeat,
+                              seed=args.seed, lidar_rays=args.lidar, lidar_fov=args.lidar_fov,
+                              **episode_limit_args(args))
+
+    if args.resume:
+        checkpoint = load_resume(args)
+        session.restore(checkpoint)
+        print(f"Resumed from {args.checkpoint}: {session.tries} laps, epsilon {session.epsilon:.3f}")
+        if checkpoint["physics"] != session.env.physics():
+            print(f"Note: the checkpoint was trained with {checkpoint['physics']}, "
+                  f"this run uses {session.env.physics()}")
+    if args.checkpoint:
+        session.enable_checkpoints(args.checkpoint, args.checkpoint_every)
+    if args.metrics:
+        session.enable_metrics(args.metrics, max(args.metrics_every, 1),
+                               max_bytes=int(args.metrics_max_mb * 2**20))
+    if args.record:
+        session.env.start_recording(args.record, session.tracks)
+    if args.timing:
+        session.timer = PhaseTimer()
+
+    profiler = StepProfiler(args.profile_steps or 1000, args.profile_output)
+    if args.profile_steps:
+        profiler.start()
+
+    try:
+        if args.viewer:
+            run_with_viewer(session, args.steps, report_every=args.report_every, profiler=profiler)
+        elif args.headless:
+            run_headless(session, args.steps, report_every=args.report_every, profiler=profiler)
+        else:
+            run_window(session, profiler=profiler, render_every=max(args.render_every, 1))
+    finally:
+        session.close()
+        if session.timer.enabled:
+            session.timer.dump(args.timing_output)
+            print(f"Wrote per-phase timings to {args.timing_output}")
 
-    pygame.display.flip()
-    clock.tick(60)
 
-pygame.quit()
-sys.exit()
+if __name__ == "__main__":
+    main()
+    sys.exit()
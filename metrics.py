@@ -0,0 +1,330 @@
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import statistics
+import threading
+from collections import deque
+
+
+# -----------------------------
+# RECORDS
+# -----------------------------
+# Two kinds of record, both flat dicts:
+#
+#   "progress"  every N training steps: steps/s since the last one, epsilon,
+#               laps so far, best lap and the share of states whose Q-table
+#               row has been updated at least once (q_coverage)
+#   "episode"   every episode: why it ended (a lap, or cut short, see
+#               env.END_REASONS), its length, time, reward and collisions,
+#               plus the global step and epsilon at the end
+#
+# JSONL files keep whatever keys a record has; CSV files have one fixed set
+# of columns (FIELDS) with the ones a record kind doesn't use left empty.
+FIELDS = [
+    "kind", "time", "elapsed", "steps", "steps_per_sec", "epsilon", "laps", "best_lap", "q_coverage",
+    "episode", "end", "lap_steps", "lap_time", "reward", "collisions", "clean",
+]
+FORMATS = (".jsonl", ".csv")
+
+
+def _format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in FORMATS:
+        raise ValueError(f"{path}: metrics files must be {' or '.join(FORMATS)}")
+    return ext
+
+
+def rotated_paths(path):
+    """The rotated files of a metrics file, oldest first: run.1.jsonl, run.2.jsonl, ..."""
+    root, ext = os.path.splitext(path)
+    directory = os.path.dirname(path) or "."
+    prefix = os.path.basename(root) + "."
+    numbered = []
+    for name in os.listdir(directory) if os.path.isdir(directory) else []:
+        middle = name[len(prefix):-len(ext)] if name.startswith(prefix) and name.endswith(ext) else ""
+        if middle.isdigit():
+            numbered.append((int(middle), os.path.join(directory, name)))
+    return [p for _, p in sorted(numbered)]
+
+
+# -----------------------------
+# LOGGER
+# -----------------------------
+class MetricsLogger:
+    """
+    Buffered metrics sink for long runs. log() only appends the record to an
+    in-memory deque, so the training loop never waits on the disk; a
+    background thread drains it every flush_every seconds and appends the
+    batch to `path` (.jsonl or .csv).
+
+    Once the file passes max_bytes it is renamed to run.1.jsonl,
+    run.2.jsonl, ... (higher is newer) and a fresh one started; with `keep`
+    set only that many rotated files are kept. If the disk falls so far
+    behind that max_pending records are waiting, the oldest are dropped and
+    counted in `dropped`.
+    """
+
+    def __init__(self, path, flush_every=2.0, max_bytes=50 * 2**20, keep=None, max_pending=1000000):
+        self.path = path
+        self.format = _format(path)
+        self.flush_every = flush_every
+        self.max_bytes = max_bytes
+        self.keep = keep
+        self.max_pending = max_pending
+        self.dropped = 0
+        self.written = 0
+        rotated = rotated_paths(path)
+        self._next_rotation = int(os.path.basename(rotated[-1]).split(".")[-2]) + 1 if rotated else 1
+
+        # deque.append / popleft are thread-safe, so the two threads share no lock
+        self._pending = deque()
+        self._file = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+        self._thread.start()
+
+    def log(self, record):
+        if len(self._pending) >= self.max_pending:
+            self._pending.popleft()
+            self.dropped += 1
+        self._pending.append(record)
+
+    # --- writer thread ---
+    def _run(self):
+        while not self._stop.wait(self.flush_every):
+            self._flush()
+        self._flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _flush(self):
+        pending = self._pending
+        if not pending:
+            return
+        lines = []
+        try:
+            while True:
+                lines.append(self._encode(pending.popleft()))
+        except IndexError:
+            pass
+        try:
+            f = self._open()
+            f.write("".join(lines))
+            f.flush()
+            self.written += len(lines)
+            if f.tell() >= self.max_bytes:
+                self._rotate()
+        except OSError as e:
+            print(f"Writing metrics to {self.path} failed, {len(lines)} records lost: {e}")
+            self._file = None
+
+    def _encode(self, record):
+        if self.format == ".jsonl":
+            return json.dumps(record, separators=(",", ":")) + "\n"
+        return ",".join("" if record.get(k) is None else str(record[k]) for k in FIELDS) + "\n"
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, "a", newline="")
+            if self.format == ".csv" and self._file.tell() == 0:
+                self._file.write(",".join(FIELDS) + "\n")
+        return self._file
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        root, ext = os.path.splitext(self.path)
+        os.replace(self.path, f"{root}.{self._next_rotation}{ext}")
+        self._next_rotation += 1
+        if self.keep is not None:
+            rotated = rotated_paths(self.path)
+            for old in rotated[:max(len(rotated) - self.keep, 0)]:
+                os.remove(old)
+
+    def close(self):
+        """Write everything still buffered and stop the thread."""
+        self._stop.set()
+        self._thread.join()
+
+
+# -----------------------------
+# READING
+# -----------------------------
+def _parse_value(text):
+    if text == "":
+        return None
+    if text in ("True", "False"):
+        return text == "True"
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def read_file(path):
+    """Yield the records of one metrics file (a half-written last line is skipped)."""
+    fmt = _format(path)
+    with open(path, newline="") as f:
+        if fmt == ".jsonl":
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+        else:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            for row in reader:
+                if header and len(row) == len(header):
+                    yield {k: _parse_value(v) for k, v in zip(header, row) if v != ""}
+
+
+def read_metrics(path):
+    """Yield every record of a run in order: the rotated files, then the current one."""
+    for p in rotated_paths(path) + ([path] if os.path.exists(path) else []):
+        yield from read_file(p)
+
+
+def summarize(records, window=100):
+    """Headline numbers of a run; episode stats are over all episodes and the last `window`."""
+    progress = [r for r in records if r.get("kind") == "progress"]
+    episodes = [r for r in records if r.get("kind") == "episode"]
+    summary = {"records": len(records), "episodes": len(episodes)}
+    if progress:
+        last = progress[-1]
+        rates = [r["steps_per_sec"] for r in progress if r.get("steps_per_sec")]
+        summary.update({
+            "steps": last.get("steps"),
+            "elapsed": last.get("elapsed"),
+            "epsilon": last.get("epsilon"),
+            "q_coverage": last.get("q_coverage"),
+            "best_lap": last.get("best_lap"),
+            "steps_per_sec_median": statistics.median(rates) if rates else None,
+            "steps_per_sec_last": rates[-1] if rates else None,
+        })
+    ends = {}
+    for r in episodes:
+        end = r.get("end", "finished")
+        ends[end] = ends.get(end, 0) + 1
+    summary["ends"] = ends
+    for name, chunk in [("all", episodes), ("last", episodes[-window:])]:
+        if chunk:
+            # lap stats over the finished ones only
+            laps = [r for r in chunk if r.get("end", "finished") == "finished"]
+            summary[f"{name}_reward_mean"] = statistics.fmean(r["reward"] for r in chunk)
+            summary[f"{name}_lap_steps_median"] = statistics.median(r["lap_steps"] for r in laps) if laps else None
+            summary[f"{name}_collisions_mean"] = statistics.fmean(r["collisions"] for r in chunk)
+            summary[f"{name}_clean"] = sum(1 for r in laps if r.get("clean")) / len(chunk)
+    return summary
+
+
+def print_summary(summary, window=100):
+    def num(key, fmt="{:,.0f}"):
+        value = summary.get(key)
+        return "-" if value is None else fmt.format(value)
+
+    print(f"{summary['records']:,} records, {summary['episodes']:,} episodes")
+    if set(summary["ends"]) - {"finished"}:
+        print("ended by  " + ", ".join(f"{end} {n:,}" for end, n in summary["ends"].items()))
+    if "steps" in summary:
+        print(f"steps      {num('steps')} in {num('elapsed', '{:,.0f}')}s | steps/s median "
+              f"{num('steps_per_sec_median')}, last {num('steps_per_sec_last')}")
+        print(f"epsilon    {num('epsilon', '{:.3f}')} | Q coverage {num('q_coverage', '{:.1%}')} of states "
+              f"| best lap {num('best_lap', '{:.2f}')}s")
+    for name, label in [("all", "all episodes"), ("last", f"last {window}")]:
+        if f"{name}_reward_mean" in summary:
+            print(f"{label:<14} reward mean {num(f'{name}_reward_mean', '{:,.1f}')} | lap steps median "
+                  f"{num(f'{name}_lap_steps_median')} | collisions mean "
+                  f"{num(f'{name}_collisions_mean', '{:.2f}')} | clean {num(f'{name}_clean', '{:.0%}')}")
+
+
+def format_record(record):
+    parts = []
+    for k, v in record.items():
+        if v is None:
+            continue
+        if k == "time":
+            parts.append(time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(v)))
+        elif isinstance(v, float):
+            parts.append(f"{k}={v:.4g}")
+        else:
+            parts.append(f"{k}={v}")
+    return " ".join(parts)
+
+
+def tail(path, lines=20, follow=False, poll=1.0):
+    """Print the last `lines` records; with follow, keep printing new ones (across rotations)."""
+    for record in deque(read_metrics(path), maxlen=lines):
+        print(format_record(record))
+    if not follow:
+        return
+    seen = os.path.getsize(path) if os.path.exists(path) else 0
+    rotations = len(rotated_paths(path))
+    while True:
+        time.sleep(poll)
+        rotated = rotated_paths(path)
+        # the file we were following was rotated away (maybe more than once):
+        # finish it, print any rotated files after it, then start on the new one
+        for old in rotated[rotations:]:
+            _print_from(old, seen)
+            seen = 0
+        rotations = len(rotated)
+        if os.path.exists(path):
+            seen = _print_from(path, seen)
+
+
+def _print_from(path, offset):
+    """Print the whole records written to path after byte `offset`; returns the new offset."""
+    with open(path, newline="") as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind("\n") + 1
+    if end == 0:
+        return offset
+    if _format(path) == ".jsonl":
+        records = [json.loads(line) for line in data[:end].splitlines() if line]
+    else:
+        with open(path, newline="") as f:
+            header = next(csv.reader(f), [])
+        rows = csv.reader(data[:end].splitlines())
+        records = [{k: _parse_value(v) for k, v in zip(header, row) if v != ""}
+                   for row in rows if len(row) == len(header) and row != header]
+    for record in records:
+        print(format_record(record))
+    return offset + len(data[:end].encode())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize or tail a training run's metrics file")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("summary", help="headline numbers of a run")
+    p.add_argument("path", help="metrics file (.jsonl or .csv) the run wrote; rotated parts are included")
+    p.add_argument("--window", type=int, default=100, help="also summarize the last N episodes")
+    p = sub.add_parser("tail", help="print the latest records")
+    p.add_argument("path", help="metrics file (.jsonl or .csv)")
+    p.add_argument("-n", "--lines", type=int, default=20, help="how many records to print")
+    p.add_argument("-f", "--follow", action="store_true", help="keep printing records as they are written")
+    args = parser.parse_args(argv)
+
+    following = args.command == "tail" and args.follow
+    if not os.path.exists(args.path) and not rotated_paths(args.path) and not following:
+        sys.exit(f"no metrics found at {args.path}")
+    try:
+        if args.command == "summary":
+            print_summary(summarize(list(read_metrics(args.path)), args.window), args.window)
+        else:
+            tail(args.path, args.lines, args.follow)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
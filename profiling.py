@@ -0,0 +1,111 @@
+import json
+import time
+import cProfile
+from collections import deque
+
+
+# -----------------------------
+# PER-PHASE TIMING
+# -----------------------------
+class PhaseTimer:
+    """
+    Rolling wall-clock timings for the phases of the main loop.
+
+    Call begin() at the start of a step and mark("phase") after each phase:
+    every mark records the time since the previous one. The last `window`
+    samples per phase are kept for mean / p99 reporting.
+    """
+
+    enabled = True
+
+    def __init__(self, window=1000):
+        self.window = window
+        self.samples = {}   # phase name -> deque of seconds, in first-seen order
+        self._last = time.perf_counter()
+
+    def begin(self):
+        self._last = time.perf_counter()
+
+    def mark(self, name):
+        now = time.perf_counter()
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=self.window)
+        samples.append(now - self._last)
+        self._last = now
+
+    def stats(self):
+        """{phase: {"mean_ms", "p99_ms", "samples"}} over the rolling window."""
+        out = {}
+        for name, samples in self.samples.items():
+            ordered = sorted(samples)
+            p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+            out[name] = {
+                "mean_ms": sum(ordered) / len(ordered) * 1000,
+                "p99_ms": p99 * 1000,
+                "samples": len(ordered),
+            }
+        return out
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            json.dump({"window": self.window, "phases": self.stats()}, f, indent=2)
+
+
+class NullTimer:
+    """Stand-in for PhaseTimer when timing is off, so the hot path needs no checks."""
+
+    enabled = False
+    samples = {}
+
+    def begin(self):
+        pass
+
+    def mark(self, name):
+        pass
+
+    def stats(self):
+        return {}
+
+
+# -----------------------------
+# BOUNDED cProfile WINDOW
+# -----------------------------
+class StepProfiler:
+    """
+    Runs cProfile for the next `steps` calls to tick() and then writes a
+    .pstats file (open it with `python -m pstats` or snakeviz).
+    """
+
+    def __init__(self, steps, path="profile.pstats"):
+        self.steps = steps
+        self.path = path
+        self.profile = None
+        self.remaining = 0
+
+    @property
+    def active(self):
+        return self.profile is not None
+
+    def start(self):
+        if self.active:
+            return
+        self.profile = cProfile.Profile()
+        self.remaining = self.steps
+        print(f"Profiling the next {self.steps} steps...")
+        self.profile.enable()
+
+    def tick(self):
+        if self.profile is None:
+            return
+        self.remaining -= 1
+        if self.remaining <= 0:
+            self.stop()
+
+    def stop(self):
+        if self.profile is None:
+            return
+        self.profile.disable()
+        self.profile.dump_stats(self.path)
+        print(f"Wrote {self.path}")
+        self.profile = None
@@ -0,0 +1,105 @@
+import numpy as np
+
+
+# -----------------------------
+# STATE / ACTION SPACE
+# -----------------------------
+# discretize_state returns (speed, heading, distance, future heading) with
+# 3 x 5 x 3 x 3 bins, and the car has 9 discrete actions.
+STATE_SHAPE = (3, 5, 3, 3)
+N_STATES = 3 * 5 * 3 * 3
+N_ACTIONS = 9
+
+
+def encode_state(state):
+    """Map a discretize_state tuple to its row in the Q-table."""
+    s, h, d, fh = state
+    return ((s * 5 + h) * 3 + d) * 3 + fh
+
+
+def encode_states(states):
+    """Vectorized encode_state for an (N, 4) array of state rows."""
+    states = np.asarray(states)
+    return np.ravel_multi_index(tuple(states.T), STATE_SHAPE)
+
+
+def decode_state(index):
+    """Inverse of encode_state."""
+    return tuple(int(v) for v in np.unravel_index(index, STATE_SHAPE))
+
+
+# -----------------------------
+# Q-TABLE
+# -----------------------------
+class QTable:
+    """
+    Dense Q-table: one contiguous float64 array of shape (N_STATES, N_ACTIONS).
+
+    The scalar methods take a discretize_state tuple and are what the
+    single-car training loop calls; the *_many / td_update methods take
+    arrays of encoded state indices for batched engines.
+    """
+
+    def __init__(self, values=None):
+        if values is None:
+            values = np.zeros((N_STATES, N_ACTIONS))
+        # may be a view on shared memory or a memory-mapped checkpoint
+        self.values = values
+
+    def __getitem__(self, state):
+        return self.values[encode_state(state)]
+
+    # --- single state ---
+    def best_action(self, state):
+        """Greedy action; ties go to the lowest action id."""
+        return int(self.values[encode_state(state)].argmax())
+
+    def max_value(self, state):
+        return float(self.values[encode_state(state)].max())
+
+    def update(self, state, action, target, alpha):
+        """Move Q[state][action] a step of size alpha towards target."""
+        row = self.values[encode_state(state)]
+        row[action] += alpha * (target - row[action])
+
+    # --- batches of encoded states ---
+    def best_actions(self, indices):
+        return self.values[indices].argmax(axis=1)
+
+    def max_values(self, indices):
+        return self.values[indices].max(axis=1)
+
+    def td_update(self, states, actions, rewards, next_states, alpha, gamma, dones=None):
+        """
+        One Q-learning update for a batch of transitions (encoded state arrays).
+
+        All TD errors are computed from the table as it was before the batch,
+        and updates that hit the same (state, action) are summed.
+        """
+        targets = rewards + gamma * self.max_values(next_states)
+        if dones is not None:
+            targets = np.where(dones, rewards, targets)
+        errors = targets - self.values[states, actions]
+        np.add.at(self.values, (states, actions), alpha * errors)
+        return errors
+
+    def td_update_merged(self, states, actions, rewards, next_states, alpha, gamma, dones=None):
+        """
+        Like td_update(), but transitions that hit the same (state, action)
+        are merged: the entry moves towards their mean target by
+        1 - (1 - alpha) ** count, the step that many sequential updates would
+        take. Stays stable for batches much larger than the table, where
+        summed updates would overshoot.
+        """
+        targets = rewards + gamma * self.max_values(next_states)
+        if dones is not None:
+            targets = np.where(dones, rewards, targets)
+        flat = states * N_ACTIONS + actions
+        size = self.values.size
+        counts = np.bincount(flat, minlength=size)
+        sums = np.bincount(flat, weights=targets, minlength=size)
+        hit = np.nonzero(counts)[0]
+        rows, cols = np.divmod(hit, N_ACTIONS)
+        step = 1.0 - (1.0 - alpha) ** counts[hit]
+        current = self.values[rows, cols]
+        self.values[rows, cols] = current + step * (sums[hit] / counts[hit] - current)
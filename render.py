@@ -0,0 +1,208 @@
+import pygame
+
+from env import WIDTH, HEIGHT, MARGIN
+
+BLACK = (0, 0, 0)
+ROAD_COLOR = (60, 60, 60)
+WHITE = (255, 255, 255)
+GREEN = (0, 200, 0)
+RED = (200, 0, 0)
+RAY_COLOR = (120, 220, 120)     # lidar ray that reached max range
+RAY_HIT_COLOR = (255, 140, 0)   # lidar ray that hit a wall
+
+
+# -----------------------------
+# ROAD DRAWING
+# -----------------------------
+def draw_road(screen, track):
+    pygame.draw.polygon(screen, ROAD_COLOR, track.polygon)
+    pygame.draw.lines(screen, WHITE, False, track.left_edge, 4)
+    pygame.draw.lines(screen, WHITE, False, track.right_edge, 4)
+
+
+# -----------------------------
+# START / FINISH
+# -----------------------------
+def draw_gate(screen, p1, p2, color, label, font):
+    pygame.draw.line(screen, color, p1, p2, 6)
+    text = font.render(label, True, color)
+    mx = (p1[0] + p2[0]) / 2
+    my = (p1[1] + p2[1]) / 2
+    screen.blit(text, (mx - 30, my - 30))
+
+
+# -----------------------------
+# RENDERER
+# -----------------------------
+def build_background(track):
+    """Pre-render everything static (road, centerline, gates) into one Surface."""
+    background = pygame.Surface((WIDTH, HEIGHT))
+    background.fill(BLACK)
+
+    draw_road(background, track)
+
+    # Debug centerline (remove later for RL)
+    pygame.draw.lines(background, (100, 100, 255), False, track.centerline, 1)
+
+    # Start & finish
+    gate_font = pygame.font.SysFont("Arial", 20)
+    start = min(track.start_index + 3, len(track.centerline) - 1)
+    finish = track.finish_index
+    draw_gate(background, track.left_edge[start], track.right_edge[start], GREEN, "START", gate_font)
+    draw_gate(background, track.left_edge[finish], track.right_edge[finish], RED, "FINISH", gate_font)
+    return background
+
+
+class TextCache:
+    """Rendered text per HUD slot; font.render only runs when a slot's text changes."""
+
+    def __init__(self, font):
+        self.font = font
+        self.slots = {}
+
+    def render(self, slot, text, color):
+        cached = self.slots.get(slot)
+        if cached is None or cached[0] != text:
+            cached = self.slots[slot] = (text, self.font.render(text, True, color))
+        return cached[1]
+
+
+def blit_right_aligned(screen, surface, y):
+    x = WIDTH - surface.get_width() - MARGIN
+    return screen.blit(surface, (x, y))
+
+
+class Renderer:
+    """
+    Opens the window and draws the training view. The static scene is drawn
+    once into a background Surface; each frame only the regions covered by the
+    car and the HUD last frame and this frame are restored and pushed to the
+    display.
+    """
+
+    def __init__(self, track):
+        pygame.init()
+        self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
+        pygame.display.set_caption("RL Car Simulation")
+        self.font = pygame.font.SysFont("Arial", 18)
+        self.text = TextCache(self.font)
+
+        self.set_track(track)
+
+        # phase timing overlay, toggled with T; text refreshed a few times a second
+        self.show_timings = False
+        self.timing_lines = []
+        self.frames = 0
+
+        # only for the HUD; the training loop decides which steps get drawn
+        self.render_every = 1
+
+        # lidar rays of envs that have a sensor, toggled with L
+        self.show_rays = False
+
+    def set_track(self, track):
+        """Redraw the static scene for another track and repaint the whole window."""
+        self.track = track
+        self.background = build_background(track)
+        self.screen.blit(self.background, (0, 0))
+        pygame.display.flip()
+        self.prev_dirty = []
+
+    def draw(self, env, tries=0, best_lap=None, timer=None, extra_lines=()):
+        """
+        Draw the car and HUD for a CarEnv (pose, features, lap clock) plus
+        run-level stats, and any extra_lines of text in the bottom-right corner.
+        """
+        screen = self.screen
+        if timer is None:
+            timer = env.timer
+        if env.track is not self.track:
+            self.set_track(env.track)   # the env rotated to another track
+        for rect in self.prev_dirty:
+            screen.blit(self.background, rect, rect)
+        dirty = []
+        timer.mark("road drawing")
+
+        # HUD labels come from the text cache and are only re-rendered when their text changes
+        text = self.text
+
+        #  Lap timings
+        current_time = env.current_lap_time()
+        lap_text = text.render("lap", f"Lap Time: {current_time:.1f}s", (200, 200, 255))
+        dirty.append(blit_right_aligned(screen, lap_text, 50))
+
+        if best_lap is not None:
+            best_text = text.render("best", f"Best Lap: {best_lap:.2f}s", (100, 255, 100))
+            dirty.append(blit_right_aligned(screen, best_text, 70))
+
+        surface = text.render("heading", f"Heading error: {env.heading_error:.1f}°", (255, 255, 0))
+        dirty.append(screen.blit(surface, (10, 90)))
+
+        surface = text.render("distance", f"Distance to centerline: {env.distance_to_center:.1f}", (255, 200, 0))
+        dirty.append(screen.blit(surface, (10, 120)))
+
+        surface = text.render("state", f"State: {env.state}", (0, 255, 255))
+        dirty.append(screen.blit(surface, (10, 150)))
+
+        tries_text = f"Total Tries: {tries}"
+        text_surface = text.render("tries", tries_text, (255, 255, 255))
+        dirty.append(blit_right_aligned(screen, text_surface, 10))
+
+        if self.render_every > 1:
+            surface = text.render("render every", f"Drawing every {self.render_every} steps", (180, 180, 180))
+            dirty.append(blit_right_aligned(screen, surface, 90))
+
+        for i, line in enumerate(extra_lines):
+            surface = text.render(("extra", i), line, (200, 200, 200))
+            dirty.append(blit_right_aligned(screen, surface, HEIGHT - 10 - 20 * (len(extra_lines) - i)))
+
+        if self.show_timings and timer.enabled:
+            dirty.extend(self.draw_timings(timer))
+        timer.mark("hud text")
+
+        if self.show_rays and env.lidar is not None and env.ranges is not None:
+            dirty.extend(self.draw_rays(env))
+
+        dirty.extend(env.car.draw(screen))
+        timer.mark("car draw")
+
+        pygame.display.update(self.prev_dirty + dirty)
+        self.prev_dirty = dirty
+        timer.mark("display update")
+        self.frames += 1
+
+    def draw_rays(self, env):
+        """The env's lidar rays from the car to where each one stopped, with a dot on every hit."""
+        car = env.car
+        lidar = env.lidar
+        rects = []
+        for (x, y), r in zip(lidar.endpoints(car.x, car.y, car.heading, env.ranges), env.ranges.tolist()):
+            hit = r < lidar.max_range
+            rects.append(pygame.draw.line(self.screen, RAY_HIT_COLOR if hit else RAY_COLOR, (car.x, car.y), (x, y), 1))
+            if hit:
+                rects.append(pygame.draw.circle(self.screen, RAY_HIT_COLOR, (x, y), 3))
+        return rects
+
+    def draw_timings(self, timer):
+        """Per-phase mean / p99 in the bottom-left corner."""
+        if self.frames % 15 == 0 or not self.timing_lines:
+            rows = [("phase", "mean ms", "p99 ms")]
+            for name, s in timer.stats().items():
+                rows.append((name, f"{s['mean_ms']:.3f}", f"{s['p99_ms']:.3f}"))
+            color = (180, 180, 180)
+            self.timing_lines = [[self.font.render(cell, True, color) for cell in row] for row in rows]
+
+        rects = []
+        y = HEIGHT - 10 - 18 * len(self.timing_lines)
+        for row in self.timing_lines:
+            for surface, x in zip(row, (10, 150, 230)):
+                rects.append(self.screen.blit(surface, (x, y)))
+            y += 18
+        return rects
+
+    def pump_events(self):
+        """Keep the window responsive when nobody else reads the event queue."""
+        pygame.event.pump()
+
+    def close(self):
+        pygame.quit()
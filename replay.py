@@ -0,0 +1,145 @@
+import sys
+import argparse
+
+import numpy as np
+
+from trajectory import load_trajectory, episode_starts, record_ticks
+from track import build_track
+
+
+# -----------------------------
+# LAP LISTING
+# -----------------------------
+def list_episodes(header, records):
+    """One line per episode; steps are physics ticks, read from the recorded step of its last record."""
+    starts, episodes = episode_starts(records)
+    ends = np.append(starts[1:], len(records))
+    rewards = np.add.reduceat(records["reward"].astype(np.float64), starts) if len(starts) else []
+    collisions = np.add.reduceat(records["collisions"].astype(np.int64), starts) if len(starts) else []
+    # with several tracks, also which one each episode was driven on
+    several = len(header["tracks"]) > 1
+    print(f"{'episode':>8} {'steps':>8} {'time s':>8} {'reward':>10} {'collisions':>11}"
+          + (f" {'track':>6}" if several else ""))
+    for episode, start, end, reward, hits in zip(episodes, starts, ends, rewards, collisions):
+        steps = int(records["step"][end - 1])
+        print(f"{episode:>8} {steps:>8} {steps * header['sim_dt']:>8.2f} {reward:>10.1f} {hits:>11}"
+              + (f" {records['track'][start]:>6}" if several else ""))
+
+
+# -----------------------------
+# VIEWER
+# -----------------------------
+def run_viewer(header, records, speed=1.0, episode=None):
+    """
+    Play a recording back with the training view's road and car drawing; no
+    physics or learning runs. Playback runs in physics ticks (`speed` per
+    frame), so a record that covers several ticks (action repeat) stays on
+    screen for that many. Hotkeys: space pauses, up / down double or halve
+    the playback speed, left / right jump to the previous / next episode.
+    """
+    import pygame
+    from render import Renderer, blit_right_aligned
+    from car import Car
+
+    tracks = [build_track([tuple(p) for p in info["centerline"]], info["width"],
+                          info["start_index"], info["finish_index"])
+              for info in header["tracks"]]
+    starts, episodes = episode_starts(records)
+    # the cursor counts ticks from the start of the recording: record i covers
+    # the ticks up to (not including) ends[i], episode k starts at tick start_ticks[k]
+    ticks = record_ticks(records)
+    ends = np.cumsum(ticks)
+    start_ticks = ends[starts] - ticks[starts]
+
+    renderer = Renderer(tracks[0])
+    pygame.display.set_caption("RL Car Replay")
+    screen = renderer.screen
+    car = Car(0, 0, font=renderer.font)
+    clock = pygame.time.Clock()
+
+    cursor = 0.0
+    if episode is not None:
+        matches = np.flatnonzero(episodes == episode)
+        if len(matches) == 0:
+            raise SystemExit(f"episode {episode} is not in the recording")
+        cursor = float(start_ticks[matches[0]])
+    paused = False
+
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                current = int(np.searchsorted(start_ticks, cursor, side="right")) - 1
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key == pygame.K_UP:
+                    speed *= 2
+                elif event.key == pygame.K_DOWN:
+                    speed /= 2
+                elif event.key == pygame.K_RIGHT and current + 1 < len(starts):
+                    cursor = float(start_ticks[current + 1])
+                elif event.key == pygame.K_LEFT:
+                    # back to the start of this episode, or the previous one if already there
+                    if int(cursor) == start_ticks[current] and current > 0:
+                        current -= 1
+                    cursor = float(start_ticks[current])
+
+        row = records[min(int(np.searchsorted(ends, cursor, side="right")), len(records) - 1)]
+        if tracks[row["track"]] is not renderer.track:
+            renderer.set_track(tracks[row["track"]])
+        for rect in renderer.prev_dirty:
+            screen.blit(renderer.background, rect, rect)
+        car.x, car.y, car.heading = float(row["x"]), float(row["y"]), float(row["heading"])
+        dirty = car.draw_car(screen, car.x, car.y, car.heading, car.width, car.height, debug=False)
+
+        lines = [
+            f"Episode {row['episode']}  step {row['step']}  ({row['step'] * header['sim_dt']:.2f}s)",
+            f"Speed {row['speed']:.2f}  action {row['action']}  reward {row['reward']:.2f}"
+            + (f"  COLLIDED x{row['collisions']}" if row["collisions"] else ""),
+            f"Playback {speed:g}x" + ("  (paused)" if paused else ""),
+        ]
+        for i, line in enumerate(lines):
+            surface = renderer.text.render(i, line, (255, 255, 255))
+            dirty.append(blit_right_aligned(screen, surface, 10 + 20 * i))
+
+        pygame.display.update(renderer.prev_dirty + dirty)
+        renderer.prev_dirty = dirty
+
+        if not paused:
+            cursor += speed
+            if cursor >= ends[-1]:
+                cursor = float(ends[-1] - 1)
+                paused = True
+        clock.tick(60)
+
+    renderer.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a trajectory recorded with main.py --record")
+    parser.add_argument("path", help="trajectory file")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="physics ticks per displayed frame (0.5 = half speed, 10 = ten times)")
+    parser.add_argument("--episode", type=int, help="start at this episode (lap attempt)")
+    parser.add_argument("--list", action="store_true", help="list the recorded episodes and exit")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        header, records = load_trajectory(args.path)
+    except (OSError, ValueError) as e:
+        sys.exit(f"could not load the recording: {e}")
+    if len(records) == 0:
+        sys.exit(f"{args.path} has no recorded steps")
+    if args.list:
+        list_episodes(header, records)
+        return
+    run_viewer(header, records, speed=args.speed, episode=args.episode)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+import sys
+import math
+import struct
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from qtable import N_STATES
+
+
+# -----------------------------
+# BLOCK LAYOUT
+# -----------------------------
+# One shared-memory block per training run:
+#
+#   track header    magic, version, road width, number of centerline points,
+#                   start and finish index, track number
+#   sequence        uint64, odd while the trainer is writing (a seqlock)
+#   snapshot        car pose and HUD stats, see SNAPSHOT
+#   Q summary       per-state max Q and greedy action, rewritten only when refreshed
+#   centerline      float64 (x, y) pairs, room for the longest track of the run
+#
+# The trainer never waits on a reader: it bumps the sequence to odd, writes,
+# and bumps it to even. A reader copies the snapshot and keeps the copy only
+# if the sequence was even and unchanged around it. When the env moves to
+# another track, the next publish() rewrites the track header and centerline
+# inside the same window and bumps the track number, which tells readers to
+# copy the new road.
+MAGIC = b"RLSNAP\0\0"
+VERSION = 3
+HEADER = struct.Struct("<8sIdIIII")
+SEQUENCE = struct.Struct("<Q")
+SNAPSHOT = struct.Struct("<QIIdddddddddBBBBdBQ")
+Q_SUMMARY = struct.Struct(f"<{N_STATES}d{N_STATES}B")
+SNAPSHOT_FIELDS = [
+    "steps", "episode", "tries",
+    "x", "y", "heading", "speed",
+    "lap_time", "best_lap", "epsilon", "heading_error", "distance",
+    "s", "h", "d", "fh",
+    "steps_per_sec", "finished", "q_steps",
+]
+SEQUENCE_OFFSET = HEADER.size
+SNAPSHOT_OFFSET = SEQUENCE_OFFSET + SEQUENCE.size
+Q_SUMMARY_OFFSET = SNAPSHOT_OFFSET + SNAPSHOT.size
+CENTERLINE_OFFSET = Q_SUMMARY_OFFSET + Q_SUMMARY.size
+
+# blocks created by this process; attaching to one of those must leave its tracking alone
+_created = set()
+
+
+def _attach(name):
+    """
+    Open an existing block without letting this process's resource tracker
+    unlink it on exit (before Python 3.13 attaching registers it too).
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    shm = shared_memory.SharedMemory(name=name)
+    if name in _created:
+        return shm
+    try:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:
+        pass
+    return shm
+
+
+# -----------------------------
+# TRAINER SIDE
+# -----------------------------
+class SnapshotWriter:
+    """
+    Publishes the training state to shared memory for a viewer process.
+    publish() is a handful of struct writes and never blocks; the Q-table
+    summary (per-state max value and greedy action) is only refreshed every
+    `q_every` steps, the road only when the env's track changed. `tracks`
+    lists every track the run may rotate to, so the block has room for the
+    longest.
+    """
+
+    def __init__(self, track, every=32, q_every=5000, tracks=None):
+        self.every = every
+        self.q_every = q_every
+        max_points = max(len(t.centerline) for t in [track] + list(tracks or []))
+        self.shm = shared_memory.SharedMemory(create=True, size=CENTERLINE_OFFSET + 16 * max_points)
+        self.name = self.shm.name
+        _created.add(self.name)
+        self.track = None
+        self.track_number = 0
+        self._write_track(track)
+
+        self.seq = 0
+        self.q_steps = 0
+        self.finished = False
+        self.steps_per_sec = 0.0
+
+    def _write_track(self, track):
+        centerline = np.array(track.centerline, dtype=np.float64)
+        buf = self.shm.buf
+        if CENTERLINE_OFFSET + centerline.nbytes > len(buf):
+            raise ValueError("track is longer than any the snapshot block was sized for (pass it in tracks=)")
+        self.track = track
+        self.track_number += 1
+        HEADER.pack_into(buf, 0, MAGIC, VERSION, float(track.width), len(centerline),
+                         track.start_index, track.finish_index, self.track_number)
+        buf[CENTERLINE_OFFSET:CENTERLINE_OFFSET + centerline.nbytes] = centerline.tobytes()
+
+    def publish(self, session, q_values=None):
+        refresh_q = q_values is not None and (self.q_steps == 0 or session.steps - self.q_steps >= self.q_every)
+        env = session.env
+        car = env.car
+        buf = self.shm.buf
+        self.seq += 1
+        SEQUENCE.pack_into(buf, SEQUENCE_OFFSET, self.seq)
+        if env.track is not self.track:
+            self._write_track(env.track)   # the env rotated to another track
+        if refresh_q:
+            self.q_steps = max(session.steps, 1)
+            Q_SUMMARY.pack_into(buf, Q_SUMMARY_OFFSET, *q_values.max(axis=1).tolist(),
+                                *q_values.argmax(axis=1).tolist())
+        SNAPSHOT.pack_into(
+            buf, SNAPSHOT_OFFSET,
+            session.steps, env.episode, session.tries,
+            car.x, car.y, car.heading, car.speed,
+            env.current_lap_time(), math.nan if session.best_lap is None else session.best_lap,
+            session.epsilon, env.heading_error, env.distance_to_center,
+            *env.state,
+            self.steps_per_sec, self.finished, self.q_steps,
+        )
+        self.seq += 1
+        SEQUENCE.pack_into(buf, SEQUENCE_OFFSET, self.seq)
+
+    def close(self, session=None):
+        """Mark the run finished (so viewers can say so) and remove the block."""
+        if self.shm is None:
+            return
+        if session is not None:
+            self.finished = True
+            self.publish(session)
+        self.shm.close()
+        self.shm.unlink()
+        _created.discard(self.name)
+        self.shm = None
+
+
+# -----------------------------
+# VIEWER SIDE
+# -----------------------------
+class SnapshotReader:
+    """
+    Reads the latest consistent snapshot from a SnapshotWriter's block. The
+    road is in width, centerline, start_index and finish_index; a read()
+    that finds a new track number copies the new road and bumps
+    track_number.
+    """
+
+    def __init__(self, name):
+        self.shm = _attach(name)
+        magic, version = HEADER.unpack_from(self.shm.buf, 0)[:2]
+        if magic != MAGIC or version != VERSION:
+            self.shm.close()
+            raise ValueError(f"shared memory block {name} is not a training snapshot")
+        buf = self.shm.buf
+        while True:
+            (before,) = SEQUENCE.unpack_from(buf, SEQUENCE_OFFSET)
+            if before % 2:
+                continue
+            road = self._copy_road(HEADER.unpack_from(buf, 0))
+            (after,) = SEQUENCE.unpack_from(buf, SEQUENCE_OFFSET)
+            if before == after:
+                break
+        self.width, self.centerline, self.start_index, self.finish_index, self.track_number = road
+        self.last_seq = None
+
+    def _copy_road(self, header):
+        """(width, centerline, start_index, finish_index, track number) as the header describes them."""
+        _, _, width, n_points, start_index, finish_index, track_number = header
+        # a torn header can hold any count; the copy is thrown away then, it just has to fit
+        n_points = min(n_points, (len(self.shm.buf) - CENTERLINE_OFFSET) // 16)
+        points = np.frombuffer(self.shm.buf, dtype=np.float64, count=2 * n_points, offset=CENTERLINE_OFFSET)
+        centerline = [tuple(p) for p in points.reshape(-1, 2).tolist()]
+        del points   # release the export so close() can unmap the block
+        return width, centerline, start_index, finish_index, track_number
+
+    def read(self, retries=100):
+        """
+        Return the snapshot as a dict (q_max / q_greedy as tuples), or None if
+        nothing consistent could be read (nothing published yet, or the trainer
+        kept writing through every retry).
+        """
+        buf = self.shm.buf
+        for _ in range(retries):
+            (before,) = SEQUENCE.unpack_from(buf, SEQUENCE_OFFSET)
+            if before == 0 or before % 2:
+                continue
+            values = SNAPSHOT.unpack_from(buf, SNAPSHOT_OFFSET)
+            q_summary = Q_SUMMARY.unpack_from(buf, Q_SUMMARY_OFFSET)
+            header = HEADER.unpack_from(buf, 0)
+            road = self._copy_road(header) if header[-1] != self.track_number else None
+            (after,) = SEQUENCE.unpack_from(buf, SEQUENCE_OFFSET)
+            if before == after:
+                if road is not None:
+                    self.width, self.centerline, self.start_index, self.finish_index, self.track_number = road
+                self.last_seq = after
+                snapshot = dict(zip(SNAPSHOT_FIELDS, values))
+                snapshot["best_lap"] = None if math.isnan(snapshot["best_lap"]) else snapshot["best_lap"]
+                snapshot["state"] = (snapshot["s"], snapshot["h"], snapshot["d"], snapshot["fh"])
+                snapshot["finished"] = bool(snapshot["finished"])
+                snapshot["q_max"] = q_summary[:N_STATES]
+                snapshot["q_greedy"] = q_summary[N_STATES:]
+                return snapshot
+        return None
+
+    def close(self):
+        self.shm.close()
@@ -0,0 +1,201 @@
+import io
+import os
+import csv
+import sys
+import time
+import random
+import argparse
+import itertools
+import contextlib
+import multiprocessing
+
+import numpy as np
+
+
+# -----------------------------
+# SEARCH SPACE
+# -----------------------------
+# Everything a sweep can vary, with the value main.py trains with today.
+LEARNING_PARAMS = {"alpha": 0.1, "gamma": 0.95, "epsilon": 0.4, "epsilon_decay": 0.95, "epsilon_min": 0.02}
+REWARD_PARAMS = {"progress": 5.0, "backwards": 1.0, "speed": 0.1, "heading": 1.0, "distance": 1.0,
+                 "collision": 10.0}
+TRACK_PARAMS = {"road_width": 120}
+EPISODE_PARAMS = {"max_episode_steps": 0, "no_progress_steps": 0, "max_collisions": 0, "end_penalty": 100}
+DEFAULTS = {**LEARNING_PARAMS, **REWARD_PARAMS, **TRACK_PARAMS, **EPISODE_PARAMS}
+
+
+def parse_param(text):
+    """
+    "name=v1,v2,..." -> (name, [values]) for a grid, or
+    "name=lo:hi"     -> (name, (lo, hi)) for a uniform random range.
+    """
+    name, sep, values = text.partition("=")
+    name = name.strip()
+    if not sep or name not in DEFAULTS:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUES with NAME one of {', '.join(DEFAULTS)}")
+    try:
+        if ":" in values:
+            lo, hi = values.split(":")
+            return name, (float(lo), float(hi))
+        return name, [float(v) for v in values.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"bad values for {name}: {values!r}")
+
+
+def grid_configs(params):
+    """Every combination of the listed values."""
+    names = [name for name, _ in params]
+    for name, values in params:
+        if isinstance(values, tuple):
+            raise ValueError(f"{name}: ranges (lo:hi) need --random N; list values for a grid")
+    return [dict(zip(names, combo)) for combo in itertools.product(*(values for _, values in params))]
+
+
+def random_configs(params, n, rng):
+    """n configs with each parameter drawn uniformly from its range, or from its list of values."""
+    configs = []
+    for _ in range(n):
+        config = {}
+        for name, values in params:
+            if isinstance(values, tuple):
+                config[name] = rng.uniform(*values)
+            else:
+                config[name] = rng.choice(values)
+        configs.append(config)
+    return configs
+
+
+# -----------------------------
+# ONE RUN
+# -----------------------------
+def run_config(task):
+    """
+    Train one config headless from an empty Q-table and return its metrics.
+    Runs in a pool worker; everything it needs comes in `task`.
+    """
+    run_id, config, seed, steps = task
+    import main
+    from env import RewardWeights, centerline
+    from track import build_track
+    from qtable import QTable
+
+    params = {**DEFAULTS, **config}
+    track = build_track(centerline, params["road_width"])
+    session = main.TrainingSession(
+        track, q=QTable(), seed=seed,
+        reward_weights=RewardWeights(**{name: params[name] for name in REWARD_PARAMS}),
+        **{name: params[name] for name in LEARNING_PARAMS},
+        **{name: params[name] for name in EPISODE_PARAMS},
+    )
+
+    first_lap_step = None
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(steps):
+            session.step()
+            if first_lap_step is None and session.tries:
+                first_lap_step = session.steps
+    elapsed = time.perf_counter() - t0
+
+    episodes = session.episodes
+    return {
+        "run": run_id,
+        "seed": seed,
+        **config,
+        "laps": len(episodes),
+        "first_lap_step": first_lap_step,
+        "best_lap_steps": min((e.steps for e in episodes), default=None),
+        "collisions_per_lap": (sum(e.collisions for e in episodes) / len(episodes)) if episodes else None,
+        "cut_short": sum(session.end_reasons.values()) - session.end_reasons["finished"],
+        "steps_per_sec": steps / elapsed,
+    }
+
+
+# -----------------------------
+# RESULTS
+# -----------------------------
+def sort_key(row):
+    """Best lap first; runs that never finished last."""
+    best = row["best_lap_steps"]
+    return (best is None, best if best is not None else 0, row["run"])
+
+
+def print_table(rows, param_names):
+    columns = ["run", "seed"] + param_names + ["laps", "first_lap_step", "best_lap_steps", "collisions_per_lap",
+                                               "cut_short"]
+    cells = [[_format(row.get(c)) for c in columns] for row in rows]
+    widths = [max(len(c), *(len(r[i]) for r in cells)) if cells else len(c) for i, c in enumerate(columns)]
+    print("  ".join(c.rjust(w) for c, w in zip(columns, widths)))
+    for r in cells:
+        print("  ".join(v.rjust(w) for v, w in zip(r, widths)))
+
+
+def _format(value):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    return str(value)
+
+
+def write_csv(rows, path):
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Train many configs headless in parallel and tabulate the results",
+        epilog=f"parameters: {', '.join(DEFAULTS)}. Example: "
+               "python sweep.py -p alpha=0.05,0.1,0.2 -p gamma=0.9,0.95 --seeds 3")
+    parser.add_argument("-p", "--param", dest="params", action="append", type=parse_param, default=[],
+                        metavar="NAME=VALUES", help="values to try: v1,v2,... (grid) or lo:hi (with --random)")
+    parser.add_argument("--random", type=int, metavar="N",
+                        help="sample N random configs instead of the full grid")
+    parser.add_argument("--seeds", type=int, default=1, help="independent seeds per config")
+    parser.add_argument("--seed", type=int, default=0, help="base seed the per-run seeds are derived from")
+    parser.add_argument("--steps", type=int, default=50000, help="training steps per run")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("-o", "--output", default="sweep_results.csv", help="CSV file for the results table")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+    try:
+        configs = random_configs(args.params, args.random, rng) if args.random else grid_configs(args.params)
+    except ValueError as e:
+        sys.exit(str(e))
+
+    # one independent stream per run, derived from the base seed
+    seed_seqs = np.random.SeedSequence(args.seed).spawn(len(configs) * args.seeds)
+    tasks = []
+    for i, config in enumerate(configs):
+        for j in range(args.seeds):
+            seed = int(seed_seqs[i * args.seeds + j].generate_state(1)[0])
+            tasks.append((len(tasks), config, seed, args.steps))
+
+    workers = max(1, min(args.workers, len(tasks)))
+    print(f"{len(configs)} configs x {args.seeds} seeds = {len(tasks)} runs of {args.steps} steps "
+          f"on {workers} workers")
+    t0 = time.perf_counter()
+    rows = []
+    with multiprocessing.Pool(workers) as pool:
+        for row in pool.imap_unordered(run_config, tasks):
+            rows.append(row)
+            print(f"\r{len(rows)}/{len(tasks)} runs done", end="", flush=True)
+    elapsed = time.perf_counter() - t0
+    print(f"\r{len(tasks)} runs in {elapsed:.1f}s ({len(tasks) * args.steps / elapsed:,.0f} steps/s overall)")
+
+    rows.sort(key=sort_key)
+    print_table(rows, [name for name, _ in args.params])
+    write_csv(rows, args.output)
+    print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
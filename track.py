@@ -0,0 +1,498 @@
+import math
+from collections import namedtuple
+
+import numpy as np
+
+
+# -----------------------------
+# TRACK GEOMETRY
+# -----------------------------
+# Everything derived from a centerline and a road width. Built once per
+# track and never mutated, so the physics, the features and the renderer
+# can all share it instead of recomputing edges every frame.
+Track = namedtuple("Track", [
+    "centerline",   # tuple of (x, y) points
+    "width",        # road width in pixels
+    "normals",      # unit normal per centerline segment
+    "left_edge",    # tuple of (x, y), one per centerline point
+    "right_edge",   # tuple of (x, y), one per centerline point
+    "polygon",      # left_edge + reversed right_edge, simplified (see road_polygon)
+    "arc_length",   # distance along the centerline to each point, from the first
+    "start_index",  # centerline index the car spawns at
+    "finish_index", # centerline index of the finish point
+])
+
+# How far (in px) the simplified road polygon may stray from the edges it is
+# built from. The centerline and edges keep one point per sample, because
+# the features are defined on those samples; only the polygon, which every
+# collision check, the road mask and the lidar walk, drops the points that
+# lie on a straight stretch of edge.
+EDGE_TOLERANCE = 0.1
+
+
+def build_track(centerline, width, start_index=0, finish_index=-4, tolerance=EDGE_TOLERANCE):
+    """
+    Compute segment normals, both road edges, the road polygon and the
+    cumulative arc length once. Negative indices count from the end, like
+    list indexing. tolerance=0 keeps every edge point in the polygon.
+    """
+    n = len(centerline)
+    if not (-n <= start_index < n and -n <= finish_index < n):
+        raise ValueError(f"start/finish index {start_index}/{finish_index} outside a {n}-point centerline")
+    half = width / 2
+    left_edge = []
+    right_edge = []
+    normals = []
+
+    for i in range(len(centerline) - 1):
+        x1, y1 = centerline[i]
+        x2, y2 = centerline[i + 1]
+        dx, dy = x2 - x1, y2 - y1
+        length = math.hypot(dx, dy)
+        if length == 0:
+            dx, dy = 1, 0
+            length = 1
+        dx /= length
+        dy /= length
+        normals.append((-dy, dx))
+
+    for i in range(len(centerline)):
+        x, y = centerline[i]
+        if i == 0:
+            nx, ny = normals[0]
+        elif i == len(centerline) - 1:
+            nx, ny = normals[-1]
+        else:
+            nx = normals[i - 1][0] + normals[i][0]
+            ny = normals[i - 1][1] + normals[i][1]
+            length = math.hypot(nx, ny)
+            if length == 0:
+                nx, ny = normals[i]
+            else:
+                nx /= length
+                ny /= length
+
+        left_edge.append((x + nx * half, y + ny * half))
+        right_edge.append((x - nx * half, y - ny * half))
+
+    arc_length = [0.0]
+    for i in range(1, len(centerline)):
+        x1, y1 = centerline[i - 1]
+        x2, y2 = centerline[i]
+        arc_length.append(arc_length[-1] + math.hypot(x2 - x1, y2 - y1))
+
+    return Track(
+        centerline=tuple(tuple(p) for p in centerline),
+        width=width,
+        normals=tuple(normals),
+        left_edge=tuple(left_edge),
+        right_edge=tuple(right_edge),
+        polygon=road_polygon(left_edge, right_edge, tolerance),
+        arc_length=tuple(arc_length),
+        start_index=start_index % n,
+        finish_index=finish_index % n,
+    )
+
+
+def simplify_polyline(points, tolerance):
+    """
+    Ramer-Douglas-Peucker: the fewest of `points` (always keeping both ends)
+    such that every dropped point is within `tolerance` of the segment
+    between the kept points around it. Points on a straight run all go, and
+    bends keep as many as they need.
+    """
+    points = [tuple(p) for p in points]
+    if tolerance <= 0 or len(points) < 3:
+        return points
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        (x1, y1), (x2, y2) = points[first], points[last]
+        worst, worst_i = -1.0, None
+        for i in range(first + 1, last):
+            d = distance_point_to_segment(points[i][0], points[i][1], x1, y1, x2, y2)
+            if d > worst:
+                worst, worst_i = d, i
+        if worst > tolerance:
+            keep[worst_i] = True
+            stack.append((first, worst_i))
+            stack.append((worst_i, last))
+    return [p for p, k in zip(points, keep) if k]
+
+
+def road_polygon(left_edge, right_edge, tolerance=EDGE_TOLERANCE):
+    """Left edge then right edge backwards, each simplified to within tolerance px."""
+    return tuple(simplify_polyline(left_edge, tolerance) + simplify_polyline(right_edge, tolerance)[::-1])
+
+
+def distance_point_to_segment(px, py, x1, y1, x2, y2):
+    """
+    Returns the shortest distance from point P(px,py)
+    to the line segment (x1,y1)-(x2,y2)
+    """
+
+    dx = x2-x1
+    dy = y2-y1
+    
+    if(dx == 0 and dy==0):
+        # segment is a point
+        return math.hypot(px-x1, py-y1)
+    
+    # Projection factor t
+    t = ((px-x1)*dx + (py-y1)*dy)/(dx*dx + dy*dy)
+    t = max(0.0, min(1.0, t)) # Clamp to segment
+
+    closest_x = x1 + t*dx
+    closest_y = y1 + t*dy
+
+    return math.hypot(px-closest_x, py-closest_y)
+
+
+# -----------------------------
+# ROAD OCCUPANCY MASK
+# -----------------------------
+def point_in_polygon(px, py, poly):
+    """Ray casting point-in-polygon. poly is a list of (x,y)."""
+    inside = False
+    n = len(poly)
+    j = n - 1
+    for i in range(n):
+        xi, yi = poly[i]
+        xj, yj = poly[j]
+        intersect = ((yi > py) != (yj > py)) and \
+                    (px < (xj - xi) * (py - yi) / (yj - yi + 1e-12) + xi)
+        if intersect:
+            inside = not inside
+        j = i
+    return inside
+
+
+def points_in_polygon(xs, ys, poly):
+    """Vectorized point_in_polygon() for arrays of points, same crossing rule."""
+    px = np.asarray(xs, dtype=float)
+    py = np.asarray(ys, dtype=float)
+    inside = np.zeros(px.shape, dtype=bool)
+    n = len(poly)
+    j = n - 1
+    for i in range(n):
+        xi, yi = poly[i]
+        xj, yj = poly[j]
+        inside ^= ((yi > py) != (yj > py)) & \
+                  (px < (xj - xi) * (py - yi) / (yj - yi + 1e-12) + xi)
+        j = i
+    return inside
+
+
+class RoadMask:
+    """
+    Precomputed occupancy grid of the drivable area, so a collision check is
+    one lookup per point instead of a ray cast over the whole road polygon.
+
+    Each cell is OUTSIDE, INSIDE or EDGE. A cell is only marked INSIDE/OUTSIDE
+    when its center is farther from the polygon boundary than the cell's half
+    diagonal, so every point in it is on the same side; points in EDGE cells
+    (and only those) fall back to the exact ray cast. Results are therefore
+    identical to point_in_polygon().
+    """
+
+    OUTSIDE = 0
+    INSIDE = 1
+    EDGE = 2
+
+    def __init__(self, polygon, cell_size=4.0):
+        self.polygon = tuple(tuple(p) for p in polygon)
+        self.cell_size = cell_size
+
+        xs = [p[0] for p in self.polygon]
+        ys = [p[1] for p in self.polygon]
+        self.min_x = min(xs)
+        self.min_y = min(ys)
+        self.cols = int(math.ceil((max(xs) - self.min_x) / cell_size)) + 1
+        self.rows = int(math.ceil((max(ys) - self.min_y) / cell_size)) + 1
+
+        self.cells = self._build_cells()
+        self._build_row_edges()
+
+    def _build_cells(self):
+        cs = self.cell_size
+        col_x = self.min_x + (np.arange(self.cols) + 0.5) * cs
+        row_y = self.min_y + (np.arange(self.rows) + 0.5) * cs
+
+        # points_in_polygon() over the cell centers, done as a scanline: all
+        # centers in a row share one y, so each edge only touches the rows it crosses
+        inside = np.zeros((self.rows, self.cols), dtype=bool)
+        n = len(self.polygon)
+        j = n - 1
+        for i in range(n):
+            xi, yi = self.polygon[i]
+            xj, yj = self.polygon[j]
+            rows = np.nonzero((yi > row_y) != (yj > row_y))[0]
+            if len(rows):
+                cross_x = (xj - xi) * (row_y[rows] - yi) / (yj - yi + 1e-12) + xi
+                inside[rows] ^= col_x < cross_x[:, None]
+            j = i
+        state = np.where(inside, self.INSIDE, self.OUTSIDE).astype(np.uint8)
+
+        # A cell is EDGE when its center is within half a diagonal of some edge,
+        # so each edge only needs checking against the cells around its bounding box.
+        half_diag = cs * math.sqrt(2) / 2
+        limit_sq = (half_diag + 1e-6) ** 2
+        poly = np.array(self.polygon, dtype=float)
+        for (xi, yi), (xj, yj) in zip(poly, np.roll(poly, 1, axis=0)):
+            c0 = max(int((min(xi, xj) - half_diag - self.min_x) // cs), 0)
+            c1 = min(int((max(xi, xj) + half_diag - self.min_x) // cs) + 1, self.cols)
+            r0 = max(int((min(yi, yj) - half_diag - self.min_y) // cs), 0)
+            r1 = min(int((max(yi, yj) + half_diag - self.min_y) // cs) + 1, self.rows)
+            if c0 >= c1 or r0 >= r1:
+                continue
+            cx = self.min_x + (np.arange(c0, c1) + 0.5) * cs
+            cy = (self.min_y + (np.arange(r0, r1) + 0.5) * cs)[:, None]
+            dx = xj - xi
+            dy = yj - yi
+            len_sq = dx * dx + dy * dy
+            if len_sq == 0:
+                t = 0.0
+            else:
+                t = np.clip(((cx - xi) * dx + (cy - yi) * dy) / len_sq, 0.0, 1.0)
+            dist_sq = (cx - (xi + t * dx)) ** 2 + (cy - (yi + t * dy)) ** 2
+            block = state[r0:r1, c0:c1]
+            block[dist_sq <= limit_sq] = self.EDGE
+
+        self.grid = state
+        # bytes indexing from Python is much cheaper than indexing a numpy array
+        return state.tobytes()
+
+    def _build_row_edges(self):
+        """
+        For contains_many(): per grid row, the polygon edges whose y range
+        overlaps the row, padded with a dummy edge that crosses nothing. Only
+        those edges can cross a horizontal ray from a point in that row, so the
+        ray cast for EDGE cells checks a handful of edges instead of all.
+        """
+        cs = self.cell_size
+        n = len(self.polygon)
+        rows = [[] for _ in range(self.rows)]
+        for i in range(n):
+            yi, yj = self.polygon[i][1], self.polygon[i - 1][1]
+            r0 = max(int((min(yi, yj) - self.min_y) // cs), 0)
+            r1 = min(int((max(yi, yj) - self.min_y) // cs), self.rows - 1)
+            for r in range(r0, r1 + 1):
+                rows[r].append(i)
+        width = max(len(r) for r in rows)
+        table = np.full((self.rows, width), n, dtype=np.int64)
+        for r, edges in enumerate(rows):
+            table[r, :len(edges)] = edges
+        poly = np.array(self.polygon, dtype=float)
+        dummy = np.array([[0.0, 1e18]])
+        self.row_edges = table
+        self.edge_start = np.vstack([poly, dummy])                     # (xi, yi) of edge i
+        self.edge_end = np.vstack([np.roll(poly, 1, axis=0), dummy])   # (xj, yj), the previous vertex
+
+    def contains(self, x, y):
+        col = int((x - self.min_x) // self.cell_size)
+        row = int((y - self.min_y) // self.cell_size)
+        if not (0 <= col < self.cols and 0 <= row < self.rows):
+            return False  # outside the polygon's bounding box
+        cell = self.cells[row * self.cols + col]
+        if cell == self.EDGE:
+            return point_in_polygon(x, y, self.polygon)
+        return cell == self.INSIDE
+
+    def contains_many(self, xs, ys):
+        """Vectorized contains() for arrays of points."""
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float)
+        col = np.floor((xs - self.min_x) / self.cell_size).astype(np.int64)
+        row = np.floor((ys - self.min_y) / self.cell_size).astype(np.int64)
+        in_box = (col >= 0) & (col < self.cols) & (row >= 0) & (row < self.rows)
+
+        cell = np.full(xs.shape, self.OUTSIDE, dtype=np.uint8)
+        cell[in_box] = self.grid[row[in_box], col[in_box]]
+
+        result = cell == self.INSIDE
+        edge = cell == self.EDGE
+        if edge.any():
+            # point_in_polygon()'s crossing rule, over the edges spanning each point's row
+            px = xs[edge][:, None]
+            py = ys[edge][:, None]
+            edges = self.row_edges[row[edge]]
+            xi, yi = self.edge_start[edges, 0], self.edge_start[edges, 1]
+            xj, yj = self.edge_end[edges, 0], self.edge_end[edges, 1]
+            crossings = ((yi > py) != (yj > py)) & (px < (xj - xi) * (py - yi) / (yj - yi + 1e-12) + xi)
+            result[edge] = np.bitwise_xor.reduce(crossings, axis=1)
+        return result
+
+
+# -----------------------------
+# CENTERLINE SPATIAL INDEX
+# -----------------------------
+class CenterlineIndex:
+    """
+    Uniform grid over the centerline that answers the three nearest-centerline
+    queries used for the state features in one pass:
+
+      - nearest segment by midpoint   -> road direction (heading error)
+      - nearest segment by distance   -> distance to centerline
+      - nearest centerline point      -> lookahead direction (future heading error)
+
+    Along the road the nearest item changes in order as you move along the
+    track, so each cell only keeps the run of indices between the nearest items
+    at its four corners (padded by one). The cell size follows the point
+    spacing, which keeps those runs a few items long however dense the track is.
+    Cells where the run is long (e.g. across the middle of a U-turn, off the
+    road) keep every item that could be nearest by a distance bound instead.
+    Points outside the grid (the centerline bounding box grown by `margin`)
+    fall back to scanning everything.
+    """
+
+    def __init__(self, centerline, lookahead=10, cell_size=None, margin=120.0):
+        self.centerline = tuple(tuple(p) for p in centerline)
+        self.lookahead = lookahead
+
+        pts = self.centerline
+        n = len(pts)
+        self.segments = tuple((pts[i][0], pts[i][1], pts[i + 1][0], pts[i + 1][1]) for i in range(n - 1))
+        self.midpoints = tuple(((x1 + x2) / 2, (y1 + y2) / 2) for x1, y1, x2, y2 in self.segments)
+        self.segment_angles = tuple(math.degrees(math.atan2(y2 - y1, x2 - x1)) for x1, y1, x2, y2 in self.segments)
+
+        lookahead_angles = []
+        for i in range(n):
+            i2 = min(i + lookahead, n - 1)
+            dx = pts[i2][0] - pts[i][0]
+            dy = pts[i2][1] - pts[i][1]
+            lookahead_angles.append(math.degrees(math.atan2(dy, dx)))
+        self.lookahead_angles = tuple(lookahead_angles)
+
+        lengths = sorted(math.hypot(x2 - x1, y2 - y1) for x1, y1, x2, y2 in self.segments)
+        spacing = max(lengths[len(lengths) // 2], 1e-6)
+        if cell_size is None:
+            cell_size = min(max(2 * spacing, 4.0), 20.0)
+        self.cell_size = cell_size
+        self.max_run = int(2 * cell_size * math.sqrt(2) / spacing) + 4
+
+        xs = [p[0] for p in pts]
+        ys = [p[1] for p in pts]
+        self.min_x = min(xs) - margin
+        self.min_y = min(ys) - margin
+        self.cols = int(math.ceil((max(xs) + margin - self.min_x) / cell_size)) + 1
+        self.rows = int(math.ceil((max(ys) + margin - self.min_y) / cell_size)) + 1
+
+        self._all = (range(n - 1), range(n - 1), range(n))
+        self.cells = self._build_cells()
+
+    def _build_cells(self):
+        seg = np.array(self.segments, dtype=float).reshape(-1, 4)
+        item_sets = [
+            ("point", np.array(self.midpoints, dtype=float)),
+            ("segment", seg),
+            ("point", np.array(self.centerline, dtype=float)),
+        ]
+
+        def sq_distances(px, py, kind, items):
+            """|P| x |items| squared distance matrix for query points px, py."""
+            px = px[:, None]
+            py = py[:, None]
+            if kind == "point":
+                return (px - items[:, 0]) ** 2 + (py - items[:, 1]) ** 2
+            x1, y1, x2, y2 = items[:, 0], items[:, 1], items[:, 2], items[:, 3]
+            dx = x2 - x1
+            dy = y2 - y1
+            len_sq = dx * dx + dy * dy
+            safe = np.where(len_sq == 0, 1.0, len_sq)
+            t = np.clip(((px - x1) * dx + (py - y1) * dy) / safe, 0.0, 1.0)
+            return (px - (x1 + t * dx)) ** 2 + (py - (y1 + t * dy)) ** 2
+
+        gy, gx = np.mgrid[0:self.rows + 1, 0:self.cols + 1]
+
+        def nearest_at_corners(kind, items, block=16):
+            """Nearest item at every grid corner, shape (rows + 1, cols + 1)."""
+            out = np.empty(gx.shape, dtype=np.int64)
+            block_radius = block * self.cell_size * math.sqrt(2) / 2
+            for r0 in range(0, self.rows + 1, block):
+                for c0 in range(0, self.cols + 1, block):
+                    bx = self.min_x + gx[r0:r0 + block, c0:c0 + block] * self.cell_size
+                    by = self.min_y + gy[r0:r0 + block, c0:c0 + block] * self.cell_size
+                    # only items that can be nearest somewhere in this block of corners
+                    center_x = np.array([bx.mean()])
+                    center_y = np.array([by.mean()])
+                    d = np.sqrt(sq_distances(center_x, center_y, kind, items)[0])
+                    near = np.nonzero(d <= d.min() + 2 * block_radius + 1e-6)[0]
+                    sub = sq_distances(bx.ravel(), by.ravel(), kind, items[near])
+                    out[r0:r0 + block, c0:c0 + block] = near[sub.argmin(axis=1)].reshape(bx.shape)
+            return out
+
+        corner_nearest = [nearest_at_corners(kind, items) for kind, items in item_sets]
+
+        # run of indices between the nearest items at each cell's four corners
+        half_diag = self.cell_size * math.sqrt(2) / 2
+        cx = (self.min_x + (gx[:-1, :-1] + 0.5) * self.cell_size).ravel()
+        cy = (self.min_y + (gy[:-1, :-1] + 0.5) * self.cell_size).ravel()
+        per_set = []
+        for (kind, items), grid in zip(item_sets, corner_nearest):
+            quad = np.stack([grid[:-1, :-1], grid[:-1, 1:], grid[1:, :-1], grid[1:, 1:]])
+            lo = np.maximum(quad.min(axis=0).ravel() - 1, 0)
+            hi = np.minimum(quad.max(axis=0).ravel() + 1, len(items) - 1)
+
+            cands = [range(a, b + 1) for a, b in zip(lo.tolist(), hi.tolist())]
+
+            # Any point in the cell is within half_diag of its center, so an item
+            # can only be nearest if its distance from the center minus half_diag
+            # does not exceed the best distance from the center plus half_diag.
+            wide = np.nonzero(hi - lo > self.max_run)[0]
+            for start in range(0, len(wide), 256):
+                batch = wide[start:start + 256]
+                d = np.sqrt(sq_distances(cx[batch], cy[batch], kind, items))
+                keep = d <= d.min(axis=1, keepdims=True) + 2 * half_diag + 1e-6
+                for cell, mask in zip(batch.tolist(), keep):
+                    cands[cell] = tuple(np.nonzero(mask)[0].tolist())
+            per_set.append(cands)
+
+        interned = {}
+        cells = []
+        for entry in zip(*per_set):
+            cells.append(interned.setdefault(entry, entry))
+        return cells
+
+    def _cell(self, x, y):
+        col = int((x - self.min_x) // self.cell_size)
+        row = int((y - self.min_y) // self.cell_size)
+        if 0 <= col < self.cols and 0 <= row < self.rows:
+            return self.cells[row * self.cols + col]
+        return self._all
+
+    def query(self, x, y):
+        """
+        Return (segment_index, distance, road_angle_deg, lookahead_angle_deg) for
+        a point: the midpoint-nearest segment, the distance to the closest segment,
+        that segment's direction and the direction `lookahead` points ahead of the
+        closest centerline point.
+        """
+        mid_cands, seg_cands, pt_cands = self._cell(x, y)
+
+        best_seg = 0
+        min_dist = float("inf")
+        for i in mid_cands:
+            mx, my = self.midpoints[i]
+            d = math.hypot(x - mx, y - my)
+            if d < min_dist:
+                min_dist = d
+                best_seg = i
+
+        distance = float("inf")
+        for i in seg_cands:
+            d = distance_point_to_segment(x, y, *self.segments[i])
+            if d < distance:
+                distance = d
+
+        best_pt = 0
+        min_dist = float("inf")
+        for i in pt_cands:
+            px, py = self.centerline[i]
+            d = math.hypot(x - px, y - py)
+            if d < min_dist:
+                min_dist = d
+                best_pt = i
+
+        return best_seg, distance, self.segment_angles[best_seg], self.lookahead_angles[best_pt]
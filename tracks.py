@@ -0,0 +1,240 @@
+import os
+import csv
+import json
+import struct
+import hashlib
+
+import numpy as np
+
+from env import WIDTH, HEIGHT, MARGIN, ROAD_WIDTH, smooth_path, fit_centerline_to_screen
+from track import Track, build_track, EDGE_TOLERANCE
+from fileio import atomic_write
+
+# bundled track files
+TRACK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tracks")
+TRACK_EXTENSIONS = (".json", ".csv")
+
+
+# -----------------------------
+# TRACK FILES
+# -----------------------------
+# A track file lists the control points in logical space plus a few settings;
+# everything else is derived exactly like the built-in track in env.py
+# (smooth_path, then fit_centerline_to_screen, then build_track).
+#
+#   JSON: {"width": 120, "samples": 20, "start": 0, "finish": 5.85,
+#          "points": [[0, 0], [0, 200], ...]}
+#
+#   CSV:  "# key: value" lines for the settings, then an "x,y" header and
+#         one control point per row.
+#
+# Every setting is optional. start and finish are control point indices; a
+# fraction picks a point part way along the segment after it (5.85 is 0.85
+# of the way from point 5 to point 6). Without a finish, the finish is three
+# samples before the last point, like the built-in track.
+def parse_track_file(path):
+    """Read a .json or .csv track file into a dict of points and settings."""
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, newline="") as f:
+        if ext == ".json":
+            spec = json.load(f)
+            if not isinstance(spec, dict):
+                raise ValueError("expected a JSON object with the points and settings")
+        elif ext == ".csv":
+            spec = {}
+            rows = []
+            for row in csv.reader(f):
+                if not row or not row[0].strip():
+                    continue
+                if row[0].lstrip().startswith("#"):
+                    key, sep, value = ",".join(row).lstrip("# ").partition(":")
+                    if sep:
+                        spec[key.strip()] = json.loads(value)
+                    continue
+                rows.append(row)
+            if rows and not _is_number(rows[0][0]):
+                rows = rows[1:]   # x,y header
+            if any(len(row) < 2 for row in rows):
+                raise ValueError("every control point row needs an x and a y")
+            spec["points"] = [[float(x), float(y)] for x, y, *_ in rows]
+        else:
+            raise ValueError(f"track files must be {' or '.join(TRACK_EXTENSIONS)}")
+    return spec
+
+
+def _is_number(text):
+    try:
+        float(text)
+    except ValueError:
+        return False
+    return True
+
+
+def _number(spec, key, default):
+    value = spec.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{key} must be a number, not {value!r}")
+    return value
+
+
+def build_track_from_spec(spec):
+    """
+    Smooth, fit to the screen and build the Track for a parsed track file.
+    Raises ValueError for a spec that cannot make a road.
+    """
+    try:
+        points = np.array(spec.get("points") or [], dtype=np.float64)
+    except (TypeError, ValueError):
+        raise ValueError("points must be a list of [x, y] pairs of numbers") from None
+    if points.ndim != 2 or points.shape[1] != 2 or not np.isfinite(points).all():
+        raise ValueError("points must be a list of [x, y] pairs of numbers")
+    if len(points) < 3 or np.linalg.matrix_rank(points - points[0]) < 2:
+        raise ValueError("a track needs at least three control points, not all on one line")
+    samples = _number(spec, "samples", 20)
+    if samples != int(samples) or samples < 1:
+        raise ValueError(f"samples must be a whole number >= 1, not {samples!r}")
+    samples = int(samples)
+    width = _number(spec, "width", ROAD_WIDTH)
+    if not width > 0:
+        raise ValueError(f"width must be positive, not {width!r}")
+
+    points = [tuple(p) for p in points.tolist()]
+    centerline = smooth_path(points, samples=samples)
+    centerline = fit_centerline_to_screen(centerline, WIDTH, HEIGHT, MARGIN)
+
+    def to_index(key):
+        position = _number(spec, key, 0)
+        if not 0 <= position <= len(points) - 1:
+            raise ValueError(f"{key} {position} is not between 0 and {len(points) - 1}")
+        return round(position * samples)
+
+    start = to_index("start")
+    finish = to_index("finish") if "finish" in spec else -4
+    return build_track(centerline, width, start, finish)
+
+
+# -----------------------------
+# GEOMETRY CACHE
+# -----------------------------
+# The derived geometry of each track file is kept in cache_dir under a hash of
+# the file's bytes (plus the screen size it was fitted to, the default road
+# width and the polygon simplification tolerance), so loading a track
+# that was loaded before reads one small binary file and never parses or
+# rebuilds anything:
+#
+#   header      magic, version, number of centerline points, road width,
+#               start index, finish index, number of polygon vertices
+#   arrays      float64: centerline (n, 2), normals (n - 1, 2),
+#               left edge (n, 2), right edge (n, 2), arc length (n),
+#               polygon (m, 2)
+#
+# The polygon is stored as built_track() simplified it, so a cache hit never
+# runs the simplification again. VERSION is part of track_key(), so cache
+# files of an older version are never read, just rebuilt under a new name.
+MAGIC = b"RLTRACK\0"
+VERSION = 2
+HEADER = struct.Struct("<8sIIdIII")
+
+
+def track_key(data):
+    """Hash of a track file's contents and everything its geometry depends on; names its cache file."""
+    h = hashlib.sha1()
+    h.update(json.dumps([VERSION, WIDTH, HEIGHT, MARGIN, ROAD_WIDTH, EDGE_TOLERANCE]).encode())
+    h.update(data)
+    return h.hexdigest()[:16]
+
+
+def save_geometry(track, path):
+    """Atomically write a Track's geometry for load_geometry()."""
+    arrays = [
+        np.array(track.centerline, dtype=np.float64),
+        np.array(track.normals, dtype=np.float64),
+        np.array(track.left_edge, dtype=np.float64),
+        np.array(track.right_edge, dtype=np.float64),
+        np.array(track.arc_length, dtype=np.float64),
+        np.array(track.polygon, dtype=np.float64),
+    ]
+    with atomic_write(path) as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(track.centerline), float(track.width),
+                            track.start_index, track.finish_index, len(track.polygon)))
+        for a in arrays:
+            f.write(a.tobytes())
+
+
+def load_geometry(path):
+    """Read a Track written by save_geometry()."""
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, version, n, width, start_index, finish_index, m = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a track geometry file of this version")
+    values = np.frombuffer(data, dtype=np.float64, offset=HEADER.size).tolist()
+    if len(values) != 9 * n - 2 + 2 * m:
+        raise ValueError(f"expected {9 * n - 2 + 2 * m} values, found {len(values)}")
+
+    def points(start, count):
+        end = start + 2 * count
+        return tuple(zip(values[start:end:2], values[start + 1:end:2]))
+
+    centerline = points(0, n)
+    normals = points(2 * n, n - 1)
+    left_edge = points(4 * n - 2, n)
+    right_edge = points(6 * n - 2, n)
+    arc_length = tuple(values[8 * n - 2:9 * n - 2])
+    polygon = points(9 * n - 2, m)
+    return Track(
+        centerline=centerline,
+        width=width,
+        normals=normals,
+        left_edge=left_edge,
+        right_edge=right_edge,
+        polygon=polygon,
+        arc_length=arc_length,
+        start_index=start_index,
+        finish_index=finish_index,
+    )
+
+
+def load_track(path, cache_dir=".cache"):
+    """
+    Load a track file, from the geometry cache if this exact file was loaded
+    before. cache_dir=None disables the cache.
+    """
+    if cache_dir is None:
+        return _build_track_file(path)
+
+    with open(path, "rb") as f:
+        data = f.read()
+    cache_path = os.path.join(cache_dir, f"track_{track_key(data)}.bin")
+    if os.path.exists(cache_path):
+        try:
+            return load_geometry(cache_path)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"Ignoring unreadable track cache {cache_path}: {e}")
+
+    track = _build_track_file(path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        save_geometry(track, cache_path)
+    except OSError as e:
+        print(f"Could not cache the track geometry to {cache_path}: {e}")
+    return track
+
+
+def _build_track_file(path):
+    try:
+        return build_track_from_spec(parse_track_file(path))
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}") from None
+
+
+def load_tracks(paths, cache_dir=".cache"):
+    """Load track files in order; a directory stands for every track file in it, sorted by name."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                if name.lower().endswith(TRACK_EXTENSIONS)))
+        else:
+            files.append(path)
+    return [load_track(path, cache_dir) for path in files]
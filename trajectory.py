@@ -0,0 +1,152 @@
+import os
+import json
+import struct
+
+import numpy as np
+
+from fileio import align
+
+
+# -----------------------------
+# FILE FORMAT
+# -----------------------------
+# 8-byte magic, uint32 version, uint32 header length, JSON header (record
+# layout, SIM_DT and the geometry of every track the run may drive on), zero
+# padding up to a 64-byte boundary, then
+# packed fixed-size records, one per env step. With action repeat a step
+# covers several physics ticks: `step` counts ticks, so the durations come
+# from it rather than from the number of records. A file cut short by a crash
+# is still readable up to its last whole record.
+#
+# Each record names the track it was driven on (an index into the header's
+# "tracks"), so a run that rotates tracks replays on the right road.
+MAGIC = b"RLTRAJ\0\0"
+VERSION = 3
+
+# (name, struct code, numpy type) per field, packed with no padding
+FIELDS = [
+    ("episode", "I", "<u4"),
+    ("step", "I", "<u4"),      # ticks into the episode at the end of this step, 1-based
+    ("x", "f", "<f4"),
+    ("y", "f", "<f4"),
+    ("heading", "f", "<f4"),
+    ("speed", "f", "<f4"),
+    ("action", "B", "u1"),
+    ("reward", "f", "<f4"),
+    ("collisions", "B", "u1"),  # ticks of this step on which the car hit the edge
+    ("track", "B", "u1"),       # index into the header's "tracks"
+]
+RECORD = struct.Struct("<" + "".join(code for _, code, _ in FIELDS))
+RECORD_DTYPE = np.dtype([(name, np_type) for name, _, np_type in FIELDS])
+assert RECORD.size == RECORD_DTYPE.itemsize
+
+
+# -----------------------------
+# RECORDER
+# -----------------------------
+class TrajectoryRecorder:
+    """
+    Streams per-step records into a preallocated buffer of `capacity` packed
+    records and appends the whole buffer to the file whenever it fills up,
+    so a step costs one struct.pack_into and the disk sees large writes.
+
+    `tracks` are all the tracks the run may drive on, starting on the first;
+    call set_track() when the env moves to another one.
+    """
+
+    def __init__(self, path, tracks, sim_dt, capacity=8192):
+        self.path = path
+        self.capacity = capacity
+        self.buffer = bytearray(RECORD.size * capacity)
+        self.count = 0
+        self.written = 0
+        self._pack = RECORD.pack_into
+        self.tracks = list(tracks)
+        if not 1 <= len(self.tracks) <= 256:
+            raise ValueError("a recording holds 1 to 256 tracks")
+        self.track_index = 0
+
+        header = json.dumps({
+            "fields": [[name, np_type] for name, _, np_type in FIELDS],
+            "sim_dt": sim_dt,
+            "tracks": [{"centerline": [list(p) for p in track.centerline], "width": track.width,
+                        "start_index": track.start_index, "finish_index": track.finish_index}
+                       for track in self.tracks],
+        }).encode()
+        prefix = len(MAGIC) + 8 + len(header)
+        self.file = open(path, "wb")
+        self.file.write(MAGIC)
+        self.file.write(struct.pack("<II", VERSION, len(header)))
+        self.file.write(header)
+        self.file.write(b"\0" * (align(prefix) - prefix))
+
+    def set_track(self, track):
+        """Tag the records from now on with `track`, which must be one of self.tracks."""
+        for i, t in enumerate(self.tracks):
+            if t is track:
+                self.track_index = i
+                return
+        raise ValueError("the recording was not started with this track")
+
+    def record(self, episode, step, x, y, heading, speed, action, reward, collisions):
+        self._pack(self.buffer, self.count * RECORD.size,
+                   episode, step, x, y, heading, speed, action, reward, min(collisions, 255), self.track_index)
+        self.count += 1
+        if self.count == self.capacity:
+            self.flush()
+
+    def flush(self):
+        if self.count:
+            self.file.write(memoryview(self.buffer)[:self.count * RECORD.size])
+            self.written += self.count
+            self.count = 0
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+
+# -----------------------------
+# READER
+# -----------------------------
+def load_trajectory(path):
+    """
+    Open a recording. Returns (header, records): the JSON header and a
+    read-only memory-mapped structured array of RECORD_DTYPE.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a trajectory recording")
+        version, header_len = struct.unpack("<II", f.read(8))
+        if version != VERSION:
+            raise ValueError(f"{path}: unsupported trajectory version {version}")
+        header = json.loads(f.read(header_len))
+
+    offset = align(len(MAGIC) + 8 + header_len)
+    count = (os.path.getsize(path) - offset) // RECORD_DTYPE.itemsize
+    if count <= 0:
+        return header, np.zeros(0, dtype=RECORD_DTYPE)
+    records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=offset, shape=(count,))
+    return header, records
+
+
+def episode_starts(records):
+    """Index of the first record of each episode, and the episode numbers."""
+    episodes = records["episode"]
+    if len(episodes) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint32)
+    starts = np.concatenate(([0], np.flatnonzero(episodes[1:] != episodes[:-1]) + 1))
+    return starts, episodes[starts]
+
+
+def record_ticks(records):
+    """Physics ticks each record covers (1 per record without action repeat)."""
+    steps = records["step"].astype(np.int64)
+    ticks = steps.copy()
+    if len(steps) > 1:
+        same_episode = records["episode"][1:] == records["episode"][:-1]
+        ticks[1:] = np.where(same_episode, steps[1:] - steps[:-1], steps[1:])
+    return ticks
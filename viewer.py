@@ -0,0 +1,109 @@
+import sys
+import argparse
+
+from snapshot import SnapshotReader
+from track import build_track
+from profiling import NullTimer
+
+
+# -----------------------------
+# SNAPSHOT AS AN ENV
+# -----------------------------
+class SnapshotEnv:
+    """Just enough of CarEnv for Renderer.draw(), filled in from a training snapshot."""
+
+    def __init__(self, car, track):
+        self.car = car
+        self.track = track
+        self.timer = NullTimer()
+        self.lap_time = 0.0
+        self.heading_error = 0.0
+        self.distance_to_center = 0.0
+        self.state = (0, 0, 0, 0)
+
+    def update(self, snapshot):
+        car = self.car
+        car.x, car.y, car.heading, car.speed = snapshot["x"], snapshot["y"], snapshot["heading"], snapshot["speed"]
+        self.lap_time = snapshot["lap_time"]
+        self.heading_error = snapshot["heading_error"]
+        self.distance_to_center = snapshot["distance"]
+        self.state = snapshot["state"]
+
+    def current_lap_time(self):
+        return self.lap_time
+
+
+def summary_lines(snapshot):
+    q_max = snapshot["q_max"]
+    learned = sum(1 for v in q_max if v != 0.0)
+    lines = [
+        f"Step {snapshot['steps']:,}  ({snapshot['steps_per_sec']:,.0f} steps/s)  epsilon {snapshot['epsilon']:.3f}",
+        f"Q-table: {learned}/{len(q_max)} states learned, best value {max(q_max):.1f} "
+        f"(as of step {snapshot['q_steps']:,})",
+    ]
+    if snapshot["finished"]:
+        lines.append("Training finished")
+    return lines
+
+
+# -----------------------------
+# VIEWER LOOP
+# -----------------------------
+def run_viewer(name, fps=30):
+    """
+    Draw the latest snapshot of a training run at `fps`, until the window is
+    closed. Only reads shared memory, so it can lag, freeze or be closed
+    without the trainer noticing.
+    """
+    import pygame
+    from render import Renderer
+    from car import Car
+
+    reader = SnapshotReader(name)
+    track = build_track(reader.centerline, reader.width, reader.start_index, reader.finish_index)
+    track_number = reader.track_number
+    renderer = Renderer(track)
+    pygame.display.set_caption("RL Car Simulation (viewer)")
+    env = SnapshotEnv(Car(0, 0, font=renderer.font), track)
+    clock = pygame.time.Clock()
+
+    snapshot = None
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+
+        latest = reader.read()
+        if latest is not None:
+            snapshot = latest
+        if reader.track_number != track_number:
+            # the trainer rotated to another track; Renderer.draw() redraws the road
+            env.track = build_track(reader.centerline, reader.width, reader.start_index, reader.finish_index)
+            track_number = reader.track_number
+        if snapshot is not None:
+            env.update(snapshot)
+            renderer.draw(env, snapshot["tries"], snapshot["best_lap"], extra_lines=summary_lines(snapshot))
+        clock.tick(fps)
+
+    renderer.close()
+    reader.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Watch a training run started with main.py --viewer")
+    parser.add_argument("name", help="shared memory block printed by the trainer")
+    parser.add_argument("--fps", type=int, default=30, help="frames per second to draw")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        run_viewer(args.name, fps=args.fps)
+    except FileNotFoundError:
+        sys.exit(f"no training snapshot named {args.name} (has the trainer exited?)")
+
+
+if __name__ == "__main__":
+    main()